@@ -0,0 +1,233 @@
+import os, json, time, asyncio, bisect, sqlite3, threading
+from collections import deque, OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+ALERT_HISTORY_SIZE = int(os.getenv("ALERT_HISTORY_SIZE", "1000"))
+ALERT_SUBSCRIBER_BUFFER = int(os.getenv("ALERT_SUBSCRIBER_BUFFER", "256"))
+ALERT_SLOW_POLICY = os.getenv("ALERT_SLOW_POLICY", "drop")
+ALERT_KEEPALIVE_SECONDS = float(os.getenv("ALERT_KEEPALIVE_SECONDS", "15"))
+ALERT_DEDUP_TTL = float(os.getenv("ALERT_DEDUP_TTL", "86400"))
+ALERT_DEDUP_PATH = os.getenv("ALERT_DEDUP_PATH", "/tmp/ara_alert_dedup.db")
+ALERT_BATCH = os.getenv("ALERT_BATCH", "0") == "1"
+
+def extract_alerts(top: pd.DataFrame, threshold: float, **fields) -> List[Dict]:
+    proba = top["proba_ARA_t1"].to_numpy(dtype=np.float64)
+    hit = np.flatnonzero(proba >= threshold)
+    if not len(hit):
+        return []
+    tickers = top["Ticker"].to_numpy()[hit] if "Ticker" in top.columns else [""] * len(hit)
+    stamp = datetime.now().isoformat()
+    return [{"ticker": t, "proba": float(p), "timestamp": stamp, "type": "ara_candidate", **fields}
+            for t, p in zip(tickers, proba[hit])]
+
+class AlertDeduper:
+    def __init__(self, ttl: float = ALERT_DEDUP_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.seen: "OrderedDict[tuple, float]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, alerts: List[Dict], model_version: str, scope: Optional[str] = None) -> List[Dict]:
+        # scope keeps each schedule's run apart from ad-hoc scoring of the same day
+        if self.ttl <= 0 or not alerts:
+            return alerts
+        keys = [(a.get("market"), a.get("asof"), a.get("ticker"), model_version, scope) for a in alerts]
+        fresh = [a for a, first in zip(alerts, self.claim(keys)) if first]
+        with self.lock:
+            self.suppressed += len(alerts) - len(fresh)
+        return fresh
+
+    def claim(self, keys: List[tuple]) -> List[bool]:
+        now = self.clock()
+        claimed = []
+        with self.lock:
+            # a constant ttl keeps insertion order equal to expiry order
+            while self.seen:
+                key, expires = next(iter(self.seen.items()))
+                if expires > now:
+                    break
+                self.seen.popitem(last=False)
+            for key in keys:
+                claimed.append(key not in self.seen)
+                self.seen.setdefault(key, now + self.ttl)
+        return claimed
+
+class SqliteAlertDeduper(AlertDeduper):
+    # workers on one host share the file; whichever inserts a key first publishes it
+    def __init__(self, path: Optional[str] = None, ttl: float = ALERT_DEDUP_TTL, clock: Callable[[], float] = time.time):
+        super().__init__(ttl, clock)
+        self.path = path
+        self.db: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # opened on first use, so importing the app never touches the file and ALERT_DEDUP_PATH is read late
+        if self.db is None:
+            self.db = sqlite3.connect(self.path or os.getenv("ALERT_DEDUP_PATH", ALERT_DEDUP_PATH),
+                                      check_same_thread=False, isolation_level=None, timeout=30)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY, expires REAL NOT NULL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_seen_expires ON seen(expires)")
+        return self.db
+
+    def claim(self, keys: List[tuple]) -> List[bool]:
+        now = self.clock()
+        with self.lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM seen WHERE expires <= ?", (now,))
+                claimed = [db.execute("INSERT OR IGNORE INTO seen VALUES (?, ?)",
+                                      (json.dumps(key, default=str), now + self.ttl)).rowcount == 1 for key in keys]
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        return claimed
+
+class RedisAlertDeduper(AlertDeduper):
+    # SET NX with an expiry is the cross-host equivalent of the sqlite insert
+    def __init__(self, url: str, ttl: float = ALERT_DEDUP_TTL, prefix: str = "ara:dedup:"):
+        import redis
+        super().__init__(ttl)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def claim(self, keys: List[tuple]) -> List[bool]:
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(self.prefix + json.dumps(key, default=str), 1, nx=True, ex=max(1, int(self.ttl)))
+        return [bool(r) for r in pipe.execute()]
+
+def create_deduper(url: str) -> AlertDeduper:
+    # dedup has to happen where every worker's alerts meet, which is wherever the bus lives
+    if url.startswith(("redis://", "rediss://", "unix+redis://")):
+        return RedisAlertDeduper(url.replace("unix+redis://", "unix://"))
+    if url == "unix" or url.startswith("unix:"):
+        return SqliteAlertDeduper()
+    return AlertDeduper()
+
+def package_alerts(alerts: List[Dict], batch: bool = ALERT_BATCH) -> List[Dict]:
+    if not batch or not alerts:
+        return alerts
+    first = alerts[0]
+    return [{
+        "type": "ara_batch",
+        "market": first.get("market"),
+        "asof": first.get("asof"),
+        "timestamp": first.get("timestamp"),
+        "count": len(alerts),
+        "alerts": alerts
+    }]
+
+class Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxlen: int, policy: str):
+        self.loop = loop
+        self.buf: deque = deque(maxlen=maxlen)
+        self.event = asyncio.Event()
+        self.policy = policy
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, item):
+        if self.closed:
+            return
+        if len(self.buf) == self.buf.maxlen:
+            self.dropped += 1
+            if self.policy == "disconnect":
+                self.closed = True
+        self.buf.append(item)
+        if not self.event.is_set():
+            try:
+                self.loop.call_soon_threadsafe(self.event.set)
+            except RuntimeError:
+                self.closed = True
+
+    async def drain(self, timeout: Optional[float]) -> Optional[List]:
+        if not self.buf and not self.closed:
+            try:
+                await asyncio.wait_for(self.event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        self.event.clear()
+        items = []
+        while self.buf:
+            items.append(self.buf.popleft())
+        return items
+
+class AlertBroker:
+    def __init__(self, history_size: int = ALERT_HISTORY_SIZE, buffer_size: int = ALERT_SUBSCRIBER_BUFFER,
+                 policy: str = ALERT_SLOW_POLICY):
+        self.history: deque = deque(maxlen=history_size)
+        self.buffer_size = buffer_size
+        self.policy = policy
+        self.subscribers: set = set()
+        self.next_id = 1
+        self.published = 0
+        self.lock = threading.Lock()
+
+    def publish(self, payload: Dict, event_id: Optional[int] = None) -> int:
+        return self.publish_raw(event_id, json.dumps(payload, default=str))
+
+    def publish_raw(self, event_id: Optional[int], data: str) -> int:
+        with self.lock:
+            if event_id is None:
+                event_id = self.next_id
+            self.next_id = max(self.next_id, event_id + 1)
+            item = (event_id, data)
+            self.history.append(item)
+            self.published += 1
+            for sub in self.subscribers:
+                sub.offer(item)
+        return event_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscriber:
+        sub = Subscriber(asyncio.get_running_loop(), self.buffer_size, self.policy)
+        with self.lock:
+            if last_event_id is not None:
+                ids = [i for i, _ in self.history]
+                start = bisect.bisect_right(ids, last_event_id)
+                for item in list(self.history)[start:]:
+                    sub.buf.append(item)
+                if sub.buf:
+                    sub.event.set()
+            self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "published": self.published,
+                "last_event_id": self.next_id - 1,
+                "dropped": sum(s.dropped for s in self.subscribers)
+            }
+
+    async def stream(self, sub: Subscriber, keepalive: float = ALERT_KEEPALIVE_SECONDS):
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                items = await sub.drain(keepalive)
+                if items is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if items:
+                    yield "".join(f"id: {i}\ndata: {data}\n\n" for i, data in items)
+                if sub.closed:
+                    yield f"event: overflow\ndata: {json.dumps({'dropped': sub.dropped})}\n\n"
+                    break
+        finally:
+            self.unsubscribe(sub)
+
+def parse_last_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
@@ -1,22 +1,41 @@
-import os, io, json, pandas as pd, numpy as np
-from fastapi import FastAPI, File, UploadFile, Form, Query, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+import time
+IMPORT_STARTED = time.perf_counter()
+import os, io, pandas as pd, numpy as np
+from fastapi import FastAPI, File, UploadFile, Form, Query, HTTPException, Header, Response
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from model_loader import download_bundle, load_bundle_flex
-from utils import predict_mean, enrich_vol_rank, screen
+from model_loader import download_bundle
+from model_registry import ModelRegistry, ModelBundle, DEFAULT_MARKET
+from utils import feature_block, predict_mean, contributions_mean, enrich_vol_rank, enrich_screen_features, screen
+from features import can_derive, derive_latest, compute_features, spec_lookback, scrape_period, RAW_COLS
+from feature_state import get_state
+from cache import datasets as dataset_cache, panels as panel_cache, backtests as backtest_cache, explanations as explain_cache, matrices as matrix_cache
 from ingest import (
     ingest_csv, ingest_excel, ingest_pdf, ingest_image, ingest_docx,
-    ingest_audio, ingest_paste, ingest_scrape, validate_dataset, MAX_FILE_SIZE
+    ingest_audio, ingest_paste, ingest_scrape, validate_dataset, MAX_FILE_SIZE, INGESTORS, ingestor_status
 )
 from db import (
-    save_dataset, get_dataset, get_latest_dataset, get_datasets_by_date,
-    create_alert_schedule, get_pending_alerts, update_alert_last_run
+    save_dataset, get_dataset, get_dataset_notes, get_latest_dataset_info, get_datasets_by_date, get_dataset_index,
+    create_alert_schedule, get_active_alert_schedules, update_alert_last_run
 )
 from calendar_utils import (
-    get_trading_days, get_next_trading_day, calculate_next_run
+    get_trading_days, get_next_trading_day, calculate_next_run, calendar_version
 )
+from backtest import build_panel, run_backtest
+from monitoring import get_monitor
+from score_store import get_store
+from drift import sketch_frame, drift_scores
+from http_cache import CompressionMiddleware, make_etag, etag_matches, not_modified, tag, SCORE_CACHE_CONTROL, STATIC_CACHE_CONTROL
+from telemetry import registry, span, RequestTimingMiddleware
+from profiling import Sampler, ProfilingMiddleware, authorized, profile_path
+from serialize import select_fields, records, frame_response, FORMATS, ARROW_AVAILABLE, IDENTITY_FIELDS, SCORE_FIELDS
+from concurrent.futures import ThreadPoolExecutor
+from scheduler import AlertScheduler
+from alerts import AlertBroker, create_deduper, extract_alerts, package_alerts, parse_last_event_id, ALERT_BATCH
+from eventbus import create_bus, EVENT_BUS
+from webhook import WebhookOutbox, webhook_targets, valid_channel, WEBHOOK_URLS
 import asyncio
-import time
+from contextlib import asynccontextmanager
 import logging
 from datetime import datetime, date, timedelta
 from typing import Dict, List, Optional
@@ -25,29 +44,70 @@ from pydantic import BaseModel
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+logger.info(f"Module imports took {IMPORT_SECONDS:.2f}s")
+
 GITHUB_REPO = os.getenv("GITHUB_REPO", "allamrf865/ara-models")
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN", "")
 ARTIFACT_TAG = os.getenv("ARTIFACT_TAG", "")
 ARTIFACT_ZIP_URL = os.getenv("ARTIFACT_ZIP_URL", "")
 ALERT_THRESHOLD = float(os.getenv("ALERT_THRESHOLD", "0.75"))
-
-try:
-    bundle_bytes = download_bundle(GITHUB_REPO, token=GITHUB_TOKEN or None,
-                                   tag=ARTIFACT_TAG or None,
-                                   direct_url=ARTIFACT_ZIP_URL or None)
-except Exception as e:
-    logger.warning(f"Failed to download bundle from GitHub: {e}. Trying local bundle...")
-    local_bundle = os.path.join(os.path.dirname(__file__), "../incoming/ara_model_bundle_20251016_040813.zip")
-    if os.path.exists(local_bundle):
-        with open(local_bundle, "rb") as f:
-            bundle_bytes = f.read()
-        logger.info(f"Loaded local bundle: {local_bundle}")
-    else:
+ALERT_SCHEDULER = os.getenv("ALERT_SCHEDULER", "1") == "1"
+BACKTEST_DAYS = int(os.getenv("BACKTEST_DAYS", "756"))
+EXPLAIN_TOP_N = int(os.getenv("EXPLAIN_TOP_N", "8"))
+PROFILE_STARTUP = os.getenv("PROFILE_STARTUP", "0") == "1"
+
+startup_sampler = Sampler().start() if PROFILE_STARTUP else None
+
+def fetch_bundle(market: str) -> bytes:
+    # ARTIFACT_TAG_<MARKET> / ARTIFACT_ZIP_URL_<MARKET> pin a market; otherwise releases are searched by asset name
+    default = market == DEFAULT_MARKET
+    tag = os.getenv(f"ARTIFACT_TAG_{market}") or (ARTIFACT_TAG if default else "")
+    direct_url = os.getenv(f"ARTIFACT_ZIP_URL_{market}") or (ARTIFACT_ZIP_URL if default else "")
+    if not default:
+        return download_bundle(GITHUB_REPO, token=GITHUB_TOKEN or None, tag=tag or None,
+                               direct_url=direct_url or None, market=market)
+    try:
+        try:
+            return download_bundle(GITHUB_REPO, token=GITHUB_TOKEN or None, tag=tag or None,
+                                   direct_url=direct_url or None, market=market)
+        except RuntimeError:
+            # releases that predate per-market naming carry a single unlabelled bundle
+            return download_bundle(GITHUB_REPO, token=GITHUB_TOKEN or None, tag=tag or None,
+                                   exclude=sorted(model_registry.markets - {market}))
+    except Exception as e:
+        logger.warning(f"Failed to download bundle from GitHub: {e}. Trying local bundle...")
+        local_bundle = os.path.join(os.path.dirname(__file__), "../incoming/ara_model_bundle_20251016_040813.zip")
+        if os.path.exists(local_bundle):
+            with open(local_bundle, "rb") as f:
+                logger.info(f"Loaded local bundle: {local_bundle}")
+                return f.read()
         raise RuntimeError("No model bundle available. Please ensure bundle is in incoming/ or GitHub Releases.")
 
-EXTRACT_DIR, MODEL_CARD, CALIB, MODELS, FEAT_FROM_BUNDLE = load_bundle_flex(bundle_bytes)
+model_registry = ModelRegistry(fetch_bundle)
+DEFAULT_BUNDLE = model_registry.get(DEFAULT_MARKET)
+
+if startup_sampler is not None:
+    logger.info(f"Bundle load profile written to {startup_sampler.stop().save('startup_bundle_load')}")
 
-app = FastAPI(title="ARA Radar API", version="2.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = None
+    webhook_task = asyncio.create_task(webhook_outbox.run_forever())
+    try:
+        await asyncio.to_thread(event_bus.start)
+    except Exception as e:
+        logger.warning(f"Event bus unavailable, alerts stay in this worker: {e}")
+    if ALERT_SCHEDULER:
+        task = asyncio.create_task(scheduler.lead())
+    yield
+    if task is not None:
+        task.cancel()
+    webhook_task.cancel()
+    await webhook_outbox.close()
+    event_bus.stop()
+
+app = FastAPI(title="ARA Radar API", version="2.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -55,9 +115,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Profile-Id"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestTimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
-alert_queue: List[Dict] = []
+alert_broker = AlertBroker()
+event_bus = create_bus(alert_broker.publish_raw)
+alert_deduper = create_deduper(EVENT_BUS)
+webhook_outbox = WebhookOutbox()
 
 class AlertScheduleCreate(BaseModel):
     market: str = "ID"
@@ -68,47 +135,422 @@ class AlertScheduleCreate(BaseModel):
     exclude_pemantauan: bool = True
     channels: List[str] = ["sse"]
 
+def bundle_for(market: str) -> ModelBundle:
+    try:
+        return model_registry.get(market)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+
+def market_bundle(market: str) -> Optional[ModelBundle]:
+    # ingest keeps working for markets without a model; scoring is what needs one
+    try:
+        return model_registry.get(market)
+    except LookupError as e:
+        logger.warning(str(e))
+        return None
+
+def update_feature_state(df: pd.DataFrame, market: str, status: str, bundle: Optional[ModelBundle]):
+    if bundle is None or not bundle.feature_spec or status == "error" or any(c not in df.columns for c in RAW_COLS):
+        return
+    try:
+        state = get_state(bundle.feature_spec, market)
+        state.commit(df)
+    except Exception as e:
+        logger.warning(f"Feature state update failed: {e}")
+
+def load_dataset(dataset_id: str) -> Optional[pd.DataFrame]:
+    df = dataset_cache.get(dataset_id)
+    if df is None:
+        df = get_dataset(dataset_id)
+        if df is None:
+            return None
+        with span("dataset_enrich"):
+            df = dataset_cache.put(dataset_id, enrich_screen_features(df))
+    return df
+
+def feature_drift(df: pd.DataFrame, bundle: Optional[ModelBundle]) -> Optional[Dict]:
+    if bundle is None or not bundle.reference_sketch or not bundle.feature_cols:
+        return None
+    cols = [c for c in bundle.feature_cols if c in df.columns and c in bundle.reference_sketch]
+    if not cols:
+        return None
+    return drift_scores(sketch_frame(df, cols), bundle.reference_sketch)
+
+def check_dataset(df: pd.DataFrame, market: str):
+    status, notes = validate_dataset(df)
+    if status != "error":
+        try:
+            drift = feature_drift(df, market_bundle(market))
+            if drift is not None:
+                notes["drift"] = drift
+                if drift["drifted"]:
+                    notes["warnings"].append(f"Feature drift vs training data: {', '.join(drift['drifted'][:10])}")
+                    status = "warning" if status == "valid" else status
+        except Exception as e:
+            logger.warning(f"Drift sketch failed: {e}")
+    return status, notes
+
+def update_live_metrics(df: pd.DataFrame, market: str, status: str, bundle: Optional[ModelBundle], dataset_id: str):
+    if bundle is None or status == "error" or "Close" not in df.columns or "Date" not in df.columns:
+        return
+    try:
+        scored = score_frame(df, market, bundle, dataset_id, ["Date", "Ticker", "Close"])
+        dates = pd.to_datetime(scored["Date"])
+        latest = scored[dates == dates.max()]
+        with get_monitor(market, bundle.version).exclusive() as monitor:
+            monitor.label(df, lambda d: get_next_trading_day(market, d))
+            monitor.snapshot(dates.max().date(), latest["Ticker"], latest["proba_ARA_t1"], latest["Close"])
+    except Exception as e:
+        logger.warning(f"Live metrics update failed: {e}")
+
+def after_ingest(df: pd.DataFrame, dataset_id: str, market: str, status: str):
+    # scoring the enriched frame here leaves its feature block cached for the first score request
+    df = dataset_cache.put(dataset_id, enrich_screen_features(df))
+    bundle = market_bundle(market)
+    update_feature_state(df, market, status, bundle)
+    update_live_metrics(df, market, status, bundle, dataset_id)
+
+def latest_features(df: pd.DataFrame, market: str, spec: List[Dict]) -> pd.DataFrame:
+    dates = pd.to_datetime(df["Date"])
+    asof = dates.max().date()
+    state = get_state(spec, market)
+    names = [f["name"] for f in spec]
+    if state is None or state.asof != asof:
+        out = derive_latest(df, spec)
+    else:
+        base = df[dates.dt.date == asof].drop(columns=[c for c in names if c in df.columns])
+        out = base.merge(state.latest(asof)[["Ticker"] + names], on="Ticker", how="left")
+    # tickers without enough history still score, on NaN features, and are reported back
+    incomplete = out[names].isna().any(axis=1).to_numpy()
+    if len(out) and incomplete.all():
+        raise HTTPException(400, f"Not enough history to derive features for {asof}: "
+                                 f"upload at least {spec_lookback(spec) + 1} days per ticker or ingest the earlier days first")
+    if incomplete.any():
+        out.attrs["underived"] = out.loc[incomplete, "Ticker"].astype(str).tolist()
+        logger.warning(f"{market} {asof}: {incomplete.sum()} tickers lack history for some derived features")
+    return out
+
+def feature_warning(scored: pd.DataFrame) -> Dict:
+    underived = scored.attrs.get("underived")
+    if not underived:
+        return {}
+    return {"warning": f"{len(underived)} tickers scored without full feature history: {', '.join(underived[:10])}"}
+
+def numeric_block(df: pd.DataFrame, cols) -> np.ndarray:
+    try:
+        return feature_block(df, cols)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(400, f"Non-numeric feature values: {e}")
+
+def every_day_features(df: pd.DataFrame, spec: List[Dict]) -> pd.DataFrame:
+    feats = compute_features(df, spec)
+    return pd.concat([df.drop(columns=[c for c in feats.columns if c in df.columns]), feats], axis=1)
+
+def feature_matrix(df: pd.DataFrame, bundle: ModelBundle, market: str = DEFAULT_MARKET, every_day: bool = False):
+    # scoring derives only the latest day; backtests need a feature row for every day in the upload
+    feats = bundle.feature_cols
+    if feats:
+        missing = [c for c in feats if c not in df.columns]
+        if missing and can_derive(df, bundle.feature_spec, missing):
+            if every_day:
+                df = every_day_features(df, bundle.feature_spec)
+            else:
+                df = latest_features(df, market, bundle.feature_spec)
+            X = numeric_block(df, feats)
+            # derived columns live on in X only
+            return df.drop(columns=feats), X
+        if missing:
+            raise HTTPException(400, f"Missing features: {missing[:10]}")
+        X = numeric_block(df, feats)
+    else:
+        non_feat = {"Date","Ticker","Nama","Papan","Open","High","Low","Close","AdjClose","Volume"}
+        X = numeric_block(df, [c for c in df.columns if c not in non_feat])
+    return df, X
+
+def dataset_features(df: pd.DataFrame, bundle: ModelBundle, market: str, dataset_id: Optional[str] = None):
+    key = (dataset_id, bundle.digest, market)
+    cached = matrix_cache.get(key) if dataset_id else None
+    if cached is not None:
+        return cached
+    with span("features"):
+        rows, X = feature_matrix(df, bundle, market)
+    return matrix_cache.put(key, (rows, X)) if dataset_id else (rows, X)
+
+def score_columns(fields: Optional[str], liq_by: str) -> Optional[List[str]]:
+    if fields == "*":
+        return None
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else []
+    return IDENTITY_FIELDS + SCORE_FIELDS + [liq_by] + wanted
+
+def score_frame(df: pd.DataFrame, market: str, bundle: ModelBundle, dataset_id: Optional[str] = None,
+                columns: Optional[List[str]] = IDENTITY_FIELDS + SCORE_FIELDS) -> pd.DataFrame:
+    # scores sorted best first; the index is each row's position in the dataset's feature block
+    # a stored dataset's scores only change with the bundle, so history is written when its matrix is built
+    fresh = dataset_id is None or (dataset_id, bundle.digest, market) not in matrix_cache
+    rows, X = dataset_features(df, bundle, market, dataset_id)
+    with span("predict"):
+        p = predict_mean(bundle.models, X, bundle.calib)
+    if columns is None:
+        out = rows.copy()
+        if bundle.feature_cols and bundle.feature_cols[0] not in out.columns:
+            out[bundle.feature_cols] = X
+    else:
+        out = rows[[c for c in dict.fromkeys(columns) if c in rows.columns]].copy()
+    out.index = pd.RangeIndex(len(out))
+    out["proba_ARA_t1"] = p
+    if fresh:
+        with span("score_history"):
+            record_scores(out, market, bundle.version)
+    with span("sort"):
+        out = out.sort_values("proba_ARA_t1", ascending=False)
+    if rows.attrs.get("underived"):
+        out.attrs["underived"] = rows.attrs["underived"]
+    return out
+
+def record_scores(out: pd.DataFrame, market: str, model_version: str):
+    if "Date" not in out.columns or "Ticker" not in out.columns:
+        return
+    try:
+        store = get_store(market, model_version)
+        days = pd.to_datetime(out["Date"]).dt.date
+        for day, rows in out.groupby(days, sort=False):
+            store.write(day, rows["Ticker"], rows["proba_ARA_t1"])
+    except Exception as e:
+        logger.warning(f"Score history write failed: {e}")
+
+PANEL_COLS = {"Date", "Ticker", "Close", "Papan", "vol_rank_day", "turnover_rank_day"}
+
+def backtest_panel(market: str, bundle: ModelBundle):
+    since = date.today() - timedelta(days=int(BACKTEST_DAYS * 7 / 5) + 30)
+    index = get_dataset_index(market, since)
+    if not index:
+        return None
+    key = (market, bundle.version, index[-1]["id"], len(index))
+    panel = panel_cache.get(key)
+    if panel is not None:
+        return key, panel
+
+    # latest upload per as-of date; older uploads only fill in dates the newer ones lack
+    latest = {row["asof_date"]: row["id"] for row in index}
+    rows, blocks = [], []
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        # each upload is featurised on its own and cut down to the panel's columns before the next one
+        for df in pool.map(get_dataset, latest.values()):
+            if df is None or df.empty:
+                continue
+            part, X = feature_matrix(enrich_screen_features(df), bundle, market, every_day=True)
+            rows.append(part[[c for c in part.columns if c in PANEL_COLS or c.startswith("avgvol_rank_")]])
+            blocks.append(X)
+    if not rows:
+        return None
+    df = pd.concat(rows, ignore_index=True)
+    keep = ~df.duplicated(["Ticker", "Date"], keep="last").to_numpy()
+    df, X = df[keep].reset_index(drop=True), np.concatenate(blocks)[keep]
+    # normalisation and calibration are monotone, so raw ensemble order already gives each day's top-k
+    scores = predict_mean(bundle.models, X)
+    panel = build_panel(df, scores, lambda d: get_next_trading_day(market, d))
+    return key, panel_cache.put(key, panel)
+
+def explain_rows(top: pd.DataFrame, dataset_id: Optional[str], top_n: int, bundle: ModelBundle,
+                 values: Optional[np.ndarray] = None) -> List[Dict]:
+    feats = bundle.feature_cols
+    if not feats:
+        raise HTTPException(400, "Explanations need the bundle feature list")
+    if values is None:
+        values = feature_block(top, feats)
+    keys = [(dataset_id, bundle.version, t) for t in top["Ticker"].astype(str)]
+    contribs = [explain_cache.get(key) if dataset_id else None for key in keys]
+    missing = [i for i, c in enumerate(contribs) if c is None]
+    if missing:
+        X = values[missing]
+        with span("explain"):
+            fresh = contributions_mean(bundle.models, X).astype(np.float32)
+        for j, i in enumerate(missing):
+            contribs[i] = explain_cache.put(keys[i], fresh[j]) if dataset_id else fresh[j]
+
+    result = []
+    for row, c in zip(values, contribs):
+        order = np.argsort(-np.abs(c[:-1]))[:top_n]
+        result.append({
+            "bias": float(c[-1]),
+            "contributions": [
+                {"feature": feats[i], "value": None if np.isnan(row[i]) else float(row[i]), "contribution": float(c[i])}
+                for i in order
+            ]
+        })
+    return result
+
+def check_output(fmt: str, k: int, explain: bool):
+    if fmt not in FORMATS:
+        raise HTTPException(400, f"Unknown format: {fmt}")
+    if fmt == "arrow" and not ARROW_AVAILABLE:
+        raise HTTPException(406, "format=arrow is not available on this server (pyarrow is not installed)")
+    if (fmt == "json" or explain) and not 1 <= k <= 200:
+        raise HTTPException(400, "k must be between 1 and 200; use format=ndjson, csv or arrow without explain for larger k")
+
+def score_rows(top: pd.DataFrame, fields: Optional[str], liq_by: str, dataset_id: Optional[str],
+               explain: bool, explain_top: int, bundle: ModelBundle, X: Optional[np.ndarray] = None):
+    rows = select_fields(top, fields, [liq_by])
+    if not explain or not len(top):
+        return rows
+    rows = records(rows)
+    values = X[top.index.to_numpy()] if X is not None else None
+    for row, e in zip(rows, explain_rows(top, dataset_id, explain_top, bundle, values)):
+        row["explanation"] = e
+    return rows
+
+def latest_scored(market: str):
+    bundle = model_registry.get(market)
+    dataset_info = get_latest_dataset_info(market)
+    if not dataset_info:
+        raise RuntimeError(f"No datasets available for {market}")
+    df = load_dataset(dataset_info["id"])
+    if df is None:
+        raise RuntimeError(f"Dataset {dataset_info['id']} not found")
+    return dataset_info.get("asof_date"), score_frame(df, market, bundle, dataset_info["id"])
+
+def publish_alerts(alerts: List[Dict], schedule: Optional[Dict] = None):
+    channels = (schedule.get("channels") or ["sse"]) if schedule else ["sse"]
+    # one scoring run per call, so every alert carries the same market and model version
+    fresh = alert_deduper.filter(alerts, alerts[0].get("model_version", "") if alerts else "",
+                                 str(schedule.get("id")) if schedule else None)
+    if "sse" in channels:
+        for payload in package_alerts(fresh, ALERT_BATCH):
+            event_bus.publish(payload)
+    # a schedule fires once per run, so its own webhooks get the full list rather than the deduplicated one
+    targets = [(url, alerts) for url in webhook_targets(channels)] if schedule else [(url, fresh) for url in WEBHOOK_URLS]
+    for url, batch in targets:
+        webhook_outbox.enqueue(url, batch)
+
+scheduler = AlertScheduler(
+    runner=latest_scored,
+    publish=publish_alerts,
+    load_schedules=get_active_alert_schedules,
+    mark_run=update_alert_last_run,
+    threshold=ALERT_THRESHOLD
+)
+
+_caches = {"datasets": dataset_cache, "matrices": matrix_cache, "panels": panel_cache, "backtests": backtest_cache, "explanations": explain_cache}
+registry.collect("ara_cache_hits_total", "Cache hits", lambda: {(("cache", n),): c.hits for n, c in _caches.items()}, "counter")
+registry.collect("ara_cache_misses_total", "Cache misses", lambda: {(("cache", n),): c.misses for n, c in _caches.items()}, "counter")
+registry.collect("ara_cache_entries", "Cached entries", lambda: {(("cache", n),): len(c) for n, c in _caches.items()})
+registry.collect("ara_sse_subscribers", "Connected SSE subscribers", lambda: {(): alert_broker.stats()["subscribers"]})
+registry.collect("ara_sse_dropped_total", "Events dropped for slow SSE subscribers", lambda: {(): alert_broker.stats()["dropped"]}, "counter")
+registry.collect("ara_alerts_published_total", "Alert events delivered to this worker", lambda: {(): alert_broker.published}, "counter")
+registry.collect("ara_alerts_deduplicated_total", "Alerts suppressed as duplicates", lambda: {(): alert_deduper.suppressed}, "counter")
+registry.collect("ara_webhook_queue", "Webhook outbox rows", lambda: {(("state", k),): v for k, v in webhook_outbox.stats().items() if k in ("pending", "dead")})
+registry.collect("ara_scheduled_alerts", "Alert schedules held by the scheduler", lambda: {(): len(scheduler.schedules)})
+registry.collect("ara_model_bundles_resident", "Market bundles held in memory", lambda: {(): model_registry.stats()["resident"]})
+registry.collect("ara_model_bundle_bytes", "Serialized booster bytes per resident market", lambda: {(("market", b["market"]),): b["mb"] * 2**20 for b in model_registry.resident()})
+registry.collect("ara_model_bundle_evictions_total", "Bundles dropped to stay under MODEL_REGISTRY_MAX_MB", lambda: {(): model_registry.evictions}, "counter")
+registry.collect("ara_startup_import_seconds", "Time spent importing modules at startup", lambda: {(): IMPORT_SECONDS})
+registry.collect("ara_ingestor_import_seconds", "Time spent importing an ingestor's dependencies on first use",
+                 lambda: {(("source", n),): i.import_seconds for n, i in INGESTORS.items() if i.import_seconds is not None})
+
+def ingest_route(path: str, source: str):
+    # endpoints whose parser dependencies are not installed are left unregistered, so slim workers serve 404
+    def wrap(fn):
+        missing = INGESTORS[source].missing()
+        if missing:
+            logger.info(f"{path} disabled, missing: {', '.join(missing)}")
+            return fn
+        return app.post(path)(fn)
+    return wrap
+
 @app.get("/health")
 def health():
     return {
         "ok": True,
-        "models": len(MODELS),
-        "has_calibrator": CALIB is not None,
-        "features_from_bundle": FEAT_FROM_BUNDLE is not None,
+        "models": len(DEFAULT_BUNDLE.models),
+        "has_calibrator": DEFAULT_BUNDLE.calib is not None,
+        "features_from_bundle": DEFAULT_BUNDLE.feature_cols is not None,
+        "feature_spec": DEFAULT_BUNDLE.feature_spec is not None,
+        "markets": [b["market"] for b in model_registry.resident()],
         "version": "2.0.0"
     }
 
 @app.get("/meta")
-def meta():
+def meta(
+    response: Response,
+    market: str = Query(DEFAULT_MARKET),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    bundle = bundle_for(market)
+    etag = make_etag("meta", bundle.digest)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, STATIC_CACHE_CONTROL)
+    tag(response, etag, STATIC_CACHE_CONTROL)
     return {
-        "card": MODEL_CARD,
-        "required_features_count": len(FEAT_FROM_BUNDLE) if FEAT_FROM_BUNDLE else None,
-        "required_features_sample": FEAT_FROM_BUNDLE[:10] if FEAT_FROM_BUNDLE else None
+        "card": bundle.card,
+        "required_features_count": len(bundle.feature_cols) if bundle.feature_cols else None,
+        "required_features_sample": bundle.feature_cols[:10] if bundle.feature_cols else None
     }
 
 @app.get("/bundle/info")
-def bundle_info():
+def bundle_info(
+    response: Response,
+    market: str = Query(DEFAULT_MARKET),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
+):
+    bundle = bundle_for(market)
+    etag = make_etag("bundle_info", bundle.digest)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, STATIC_CACHE_CONTROL)
+    tag(response, etag, STATIC_CACHE_CONTROL)
     return {
-        "extract_dir": EXTRACT_DIR,
-        "model_card": MODEL_CARD,
-        "num_models": len(MODELS),
-        "has_calibrator": CALIB is not None,
-        "feature_count": len(FEAT_FROM_BUNDLE) if FEAT_FROM_BUNDLE else 0
+        "market": bundle.market,
+        "extract_dir": bundle.extract_dir,
+        "model_card": bundle.card,
+        "num_models": len(bundle.models),
+        "has_calibrator": bundle.calib is not None,
+        "feature_count": len(bundle.feature_cols) if bundle.feature_cols else 0
     }
 
+@app.get("/bundle/registry")
+def bundle_registry():
+    return {**model_registry.stats(), "bundles": model_registry.resident()}
+
 @app.get("/metrics")
-def metrics():
-    metrics_data = MODEL_CARD.get("metrics", {}) if MODEL_CARD else {}
+def metrics(market: str = Query(DEFAULT_MARKET)):
+    card = bundle_for(market).card
+    metrics_data = card.get("metrics", {}) if card else {}
     return {
         "ap_valid": metrics_data.get("ap_valid", 0),
         "ap_test": metrics_data.get("ap_test", 0),
         "p_at_k": metrics_data.get("p_at_k", {}),
         "base_rate": metrics_data.get("base_rate", 0),
-        "model_version": MODEL_CARD.get("version", "unknown") if MODEL_CARD else "unknown",
+        "model_version": card.get("version", "unknown") if card else "unknown",
         "data_timestamp": datetime.now().isoformat()
     }
 
-@app.post("/ingest/csv")
+@app.get("/metrics/runtime")
+def runtime_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    if not authorized(x_profile_token):
+        raise HTTPException(403, "Invalid profile token")
+    path = profile_path(profile_id)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    with open(path) as f:
+        return PlainTextResponse(f.read())
+
+@app.get("/metrics/live")
+def live_metrics(
+    market: str = Query("ID"),
+    windows: str = Query("5,20,60")
+):
+    try:
+        sizes = [int(w) for w in windows.split(",") if w.strip()]
+    except ValueError:
+        raise HTTPException(400, f"Invalid windows: {windows}")
+    if not sizes or min(sizes) < 1:
+        raise HTTPException(400, f"Invalid windows: {windows}")
+    return get_monitor(market, bundle_for(market).version).summary(sizes)
+
+@ingest_route("/ingest/csv", "csv")
 async def ingest_csv_endpoint(
     file: UploadFile = File(...),
     market: str = Form("ID")
@@ -119,10 +561,12 @@ async def ingest_csv_endpoint(
             raise HTTPException(400, "File too large")
 
         df, source_type = ingest_csv(content, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, file.filename, market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -134,7 +578,7 @@ async def ingest_csv_endpoint(
         logger.error(f"CSV ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/excel")
+@ingest_route("/ingest/excel", "excel")
 async def ingest_excel_endpoint(
     file: UploadFile = File(...),
     market: str = Form("ID")
@@ -145,10 +589,12 @@ async def ingest_excel_endpoint(
             raise HTTPException(400, "File too large")
 
         df, source_type = ingest_excel(content, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, file.filename, market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -160,7 +606,7 @@ async def ingest_excel_endpoint(
         logger.error(f"Excel ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/pdf")
+@ingest_route("/ingest/pdf", "pdf")
 async def ingest_pdf_endpoint(
     file: UploadFile = File(...),
     market: str = Form("ID")
@@ -171,10 +617,12 @@ async def ingest_pdf_endpoint(
             raise HTTPException(400, "File too large")
 
         df, source_type = ingest_pdf(content, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, file.filename, market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -187,7 +635,7 @@ async def ingest_pdf_endpoint(
         logger.error(f"PDF ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/image")
+@ingest_route("/ingest/image", "image")
 async def ingest_image_endpoint(
     file: UploadFile = File(...),
     market: str = Form("ID")
@@ -198,10 +646,12 @@ async def ingest_image_endpoint(
             raise HTTPException(400, "File too large")
 
         df, source_type = ingest_image(content, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, file.filename, market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -214,7 +664,7 @@ async def ingest_image_endpoint(
         logger.error(f"Image ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/docx")
+@ingest_route("/ingest/docx", "docx")
 async def ingest_docx_endpoint(
     file: UploadFile = File(...),
     market: str = Form("ID")
@@ -225,10 +675,12 @@ async def ingest_docx_endpoint(
             raise HTTPException(400, "File too large")
 
         df, source_type = ingest_docx(content, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, file.filename, market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -240,17 +692,19 @@ async def ingest_docx_endpoint(
         logger.error(f"DOCX ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/paste")
+@ingest_route("/ingest/paste", "paste")
 async def ingest_paste_endpoint(
     text: str = Form(...),
     market: str = Form("ID")
 ):
     try:
         df, source_type = ingest_paste(text, market)
-        status, notes = validate_dataset(df)
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, "pasted_text", market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -262,7 +716,7 @@ async def ingest_paste_endpoint(
         logger.error(f"Paste ingest error: {e}")
         raise HTTPException(400, str(e))
 
-@app.post("/ingest/scrape")
+@ingest_route("/ingest/scrape", "scrape")
 async def ingest_scrape_endpoint(
     source: str = Query(...),
     market: str = Query("ID"),
@@ -270,11 +724,14 @@ async def ingest_scrape_endpoint(
 ):
     try:
         ticker_list = tickers.split(",") if tickers else []
-        df, source_type = ingest_scrape(source, market, ticker_list)
-        status, notes = validate_dataset(df)
+        bundle = market_bundle(market)
+        df, source_type = ingest_scrape(source, market, ticker_list, scrape_period(bundle.feature_spec if bundle else None))
+        status, notes = check_dataset(df, market)
 
         dataset_id = save_dataset(df, source_type, f"scrape_{source}", market, status, notes)
 
+        after_ingest(df, dataset_id, market, status)
+
         return {
             "dataset_id": dataset_id,
             "status": status,
@@ -286,15 +743,25 @@ async def ingest_scrape_endpoint(
         logger.error(f"Scrape ingest error: {e}")
         raise HTTPException(400, str(e))
 
+@app.get("/ingest/sources")
+def ingest_sources():
+    return ingestor_status()
+
 @app.get("/calendar")
 def calendar(
+    response: Response,
     market: str = Query("ID"),
     from_date: str = Query(...),
-    to_date: str = Query(...)
+    to_date: str = Query(...),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
     try:
         from_d = date.fromisoformat(from_date)
         to_d = date.fromisoformat(to_date)
+        etag = make_etag("calendar", market, from_d, to_d, calendar_version(market))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, STATIC_CACHE_CONTROL)
+        tag(response, etag, STATIC_CACHE_CONTROL)
         trading_days = get_trading_days(market, from_d, to_d)
 
         return {
@@ -324,63 +791,83 @@ def next_trading_day(
     except Exception as e:
         raise HTTPException(400, str(e))
 
+@app.get("/features/state")
+def feature_state_info(
+    market: str = Query("ID"),
+    verify_dataset_id: Optional[str] = Query(None)
+):
+    state = get_state(bundle_for(market).feature_spec, market)
+    if state is None:
+        raise HTTPException(404, "Bundle has no feature spec")
+
+    result = {
+        "market": market,
+        "asof": state.asof.isoformat() if state.asof else None,
+        "tickers": len(state.tickers),
+        "window_bars": state.length
+    }
+    if verify_dataset_id:
+        history = get_dataset(verify_dataset_id)
+        if history is None:
+            raise HTTPException(404, "Dataset not found")
+        result["verify"] = state.verify(history)
+    return result
+
 @app.get("/score")
 def score_by_date(
     market: str = Query("ID"),
     asof: str = Query(...),
-    k: int = Query(50, ge=1, le=200),
+    k: int = Query(50, ge=0, le=100000),
     liq: float = Query(0.5, ge=0.0, le=1.0),
     exclude_pemantauan: bool = Query(True),
-    dataset_id: Optional[str] = Query(None)
+    dataset_id: Optional[str] = Query(None),
+    liq_by: str = Query("vol_rank_day"),
+    explain: bool = Query(False),
+    explain_top: int = Query(EXPLAIN_TOP_N, ge=1, le=100),
+    fields: Optional[str] = Query(None),
+    fmt: str = Query("json", alias="format"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
+    check_output(fmt, k, explain)
     try:
         asof_date = date.fromisoformat(asof)
 
-        if dataset_id:
-            df = get_dataset(dataset_id)
-            if df is None:
-                raise HTTPException(404, "Dataset not found")
-        else:
+        if not dataset_id:
             datasets = get_datasets_by_date(market, asof_date)
             if not datasets:
                 raise HTTPException(404, f"No datasets found for {asof}")
-            df = get_dataset(datasets[0]["id"])
-
-        if FEAT_FROM_BUNDLE:
-            missing = [c for c in FEAT_FROM_BUNDLE if c not in df.columns]
-            if missing:
-                raise HTTPException(400, f"Missing features: {missing[:10]}")
-            X = df[FEAT_FROM_BUNDLE].astype(np.float32)
-        else:
-            non_feat = {"Date","Ticker","Nama","Papan","Open","High","Low","Close","AdjClose","Volume"}
-            X = df[[c for c in df.columns if c not in non_feat]].astype(np.float32)
-
-        p = predict_mean(MODELS, X, CALIB)
-        out = df.copy()
-        out["proba_ARA_t1"] = p[:len(out)]
-
-        out_all = out.sort_values("proba_ARA_t1", ascending=False).reset_index(drop=True)
-        out_scr = screen(out_all, exclude_pemantauan, liq)
-        top_scr = out_scr.head(k)
-
-        for _, row in top_scr.iterrows():
-            if row["proba_ARA_t1"] >= ALERT_THRESHOLD:
-                alert_queue.append({
-                    "ticker": row.get("Ticker", ""),
-                    "proba": float(row["proba_ARA_t1"]),
-                    "timestamp": datetime.now().isoformat(),
-                    "type": "ara_candidate",
-                    "market": market,
-                    "asof": asof
-                })
-
-        return {
-            "market": market,
-            "asof": asof,
-            "rows": top_scr.to_dict(orient="records")
-        }
+            dataset_id = datasets[0]["id"]
+        elif not get_dataset_notes(dataset_id):
+            # a named dataset is looked up before any 304, so a deleted one stops validating cached copies
+            raise HTTPException(404, "Dataset not found")
+
+        bundle = bundle_for(market)
+        etag = make_etag("score", dataset_id, bundle.digest, market, asof, k, liq, exclude_pemantauan, liq_by,
+                         explain, explain_top, fields, fmt)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, SCORE_CACHE_CONTROL)
+        df = load_dataset(dataset_id)
+        if df is None:
+            raise HTTPException(404, "Dataset not found")
+
+        out_all = score_frame(df, market, bundle, dataset_id, score_columns(fields, liq_by))
+        if liq_by not in out_all.columns:
+            raise HTTPException(400, f"Unknown liq_by column: {liq_by}")
+        with span("screen"):
+            out_scr = screen(out_all, exclude_pemantauan, liq, liq_by)
+        top_scr = out_scr.head(k) if k else out_scr
+
+        publish_alerts(extract_alerts(top_scr, ALERT_THRESHOLD, market=market, asof=asof, model_version=bundle.version))
+
+        with span("serialize"):
+            X = dataset_features(df, bundle, market, dataset_id)[1] if explain else None
+            rows = score_rows(top_scr, fields, liq_by, dataset_id, explain, explain_top, bundle, X)
+            return tag(frame_response(rows, fmt, {"market": market, "asof": asof, **feature_warning(out_all)}),
+                       etag, SCORE_CACHE_CONTROL)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Score error: {e}")
         raise HTTPException(500, str(e))
@@ -388,86 +875,128 @@ def score_by_date(
 @app.get("/score_latest")
 def score_latest(
     market: str = Query("ID"),
-    k: int = Query(50, ge=1, le=200),
+    k: int = Query(50, ge=0, le=100000),
     liq: float = Query(0.5, ge=0.0, le=1.0),
-    exclude_pemantauan: bool = Query(True)
+    exclude_pemantauan: bool = Query(True),
+    liq_by: str = Query("vol_rank_day"),
+    explain: bool = Query(False),
+    explain_top: int = Query(EXPLAIN_TOP_N, ge=1, le=100),
+    fields: Optional[str] = Query(None),
+    fmt: str = Query("json", alias="format"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match")
 ):
+    check_output(fmt, k, explain)
     try:
-        result = get_latest_dataset(market)
-        if not result:
+        dataset_info = get_latest_dataset_info(market)
+        if not dataset_info:
             raise HTTPException(404, "No datasets available. Use /ingest endpoints to add data.")
 
-        dataset_id, df, dataset_info = result
+        dataset_id = dataset_info["id"]
+        bundle = bundle_for(market)
+        etag = make_etag("score_latest", dataset_id, bundle.digest, market, k, liq, exclude_pemantauan, liq_by,
+                         explain, explain_top, fields, fmt)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, SCORE_CACHE_CONTROL)
+        df = load_dataset(dataset_id)
+        if df is None:
+            raise HTTPException(404, "Dataset not found")
         asof = dataset_info.get("asof_date", date.today().isoformat())
 
-        if FEAT_FROM_BUNDLE:
-            missing = [c for c in FEAT_FROM_BUNDLE if c not in df.columns]
-            if missing:
-                raise HTTPException(400, f"Missing features: {missing[:10]}")
-            X = df[FEAT_FROM_BUNDLE].astype(np.float32)
-        else:
-            non_feat = {"Date","Ticker","Nama","Papan","Open","High","Low","Close","AdjClose","Volume"}
-            X = df[[c for c in df.columns if c not in non_feat]].astype(np.float32)
-
-        p = predict_mean(MODELS, X, CALIB)
-        out = df.copy()
-        out["proba_ARA_t1"] = p[:len(out)]
-
-        out_all = out.sort_values("proba_ARA_t1", ascending=False).reset_index(drop=True)
-        out_scr = screen(out_all, exclude_pemantauan, liq)
-        top_scr = out_scr.head(k)
-
-        for _, row in top_scr.iterrows():
-            if row["proba_ARA_t1"] >= ALERT_THRESHOLD:
-                alert_queue.append({
-                    "ticker": row.get("Ticker", ""),
-                    "proba": float(row["proba_ARA_t1"]),
-                    "timestamp": datetime.now().isoformat(),
-                    "type": "ara_candidate",
-                    "market": market
-                })
-
-        return {
-            "market": market,
-            "date": asof,
-            "dataset_id": dataset_id,
-            "source": dataset_info.get("source_type"),
-            "rows": top_scr.to_dict(orient="records")
-        }
+        out_all = score_frame(df, market, bundle, dataset_id, score_columns(fields, liq_by))
+        if liq_by not in out_all.columns:
+            raise HTTPException(400, f"Unknown liq_by column: {liq_by}")
+        with span("screen"):
+            out_scr = screen(out_all, exclude_pemantauan, liq, liq_by)
+        top_scr = out_scr.head(k) if k else out_scr
+
+        publish_alerts(extract_alerts(top_scr, ALERT_THRESHOLD, market=market, asof=asof, model_version=bundle.version))
+
+        with span("serialize"):
+            X = dataset_features(df, bundle, market, dataset_id)[1] if explain else None
+            rows = score_rows(top_scr, fields, liq_by, dataset_id, explain, explain_top, bundle, X)
+            return tag(frame_response(rows, fmt, {
+                "market": market,
+                "date": asof,
+                "dataset_id": dataset_id,
+                "source": dataset_info.get("source_type"),
+                **feature_warning(out_all)
+            }), etag, SCORE_CACHE_CONTROL)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         logger.error(f"Score latest error: {e}")
         raise HTTPException(500, str(e))
 
 @app.get("/equity")
-def equity(k: int = Query(50, ge=1, le=200)):
-    dates = []
-    equity_vals = []
-
-    for i in range(100):
-        date_val = datetime.now() - timedelta(days=100-i)
-        dates.append(date_val.strftime("%Y-%m-%d"))
-        equity_vals.append(1.0 + (i * 0.02) + np.random.randn() * 0.05)
+def equity(
+    k: int = Query(50, ge=1, le=200),
+    market: str = Query("ID"),
+    liq: float = Query(0.5, ge=0.0, le=1.0),
+    exclude_pemantauan: bool = Query(True),
+    liq_by: str = Query("vol_rank_day")
+):
+    try:
+        bundle = bundle_for(market)
+        built = backtest_panel(market, bundle)
+        if built is None:
+            return {"market": market, "k": k, "dates": [], "equity": [], "hit_rate": None, "turnover": None}
+        panel_key, panel = built
+        key = (panel_key, k, liq, exclude_pemantauan, liq_by)
+        result = backtest_cache.get(key)
+        if result is None:
+            result = backtest_cache.put(key, run_backtest(panel, k, liq, exclude_pemantauan, liq_by))
+        return {"market": market, "k": k, "model_version": bundle.version, **result}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Equity backtest error: {e}")
+        raise HTTPException(500, str(e))
 
+@app.get("/ticker/{ticker}/history")
+def ticker_history(
+    ticker: str,
+    market: str = Query("ID"),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    days: int = Query(60, ge=1, le=5000)
+):
+    try:
+        end_date = date.fromisoformat(end) if end else None
+        start_date = date.fromisoformat(start) if start else (end_date or date.today()) - timedelta(days=int(days * 7 / 5) + 1)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    version = bundle_for(market).version
+    dates, proba = get_store(market, version).history(ticker, start_date, end_date)
     return {
-        "dates": dates,
-        "equity": equity_vals
+        "ticker": ticker,
+        "market": market,
+        "model_version": version,
+        "dates": dates[-days:] if not start else dates,
+        "proba": proba[-days:] if not start else proba
     }
 
-async def alert_generator():
-    while True:
-        if alert_queue:
-            alert = alert_queue.pop(0)
-            yield f"data: {json.dumps(alert)}\\n\\n"
-        await asyncio.sleep(1)
-
 @app.get("/alerts/stream")
-async def alerts_stream():
-    return StreamingResponse(alert_generator(), media_type="text/event-stream")
+async def alerts_stream(last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")):
+    sub = alert_broker.subscribe(parse_last_event_id(last_event_id))
+    return StreamingResponse(
+        alert_broker.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/alerts/stats")
+def alerts_stats():
+    return {**alert_broker.stats(), "deduplicated": alert_deduper.suppressed, "webhooks": webhook_outbox.stats()}
 
 @app.post("/alerts/schedule")
 def schedule_alert(schedule: AlertScheduleCreate):
+    invalid = [c for c in schedule.channels if not valid_channel(c)]
+    if invalid:
+        raise HTTPException(400, f"Unsupported channels: {invalid}")
     try:
         schedule_id = create_alert_schedule(
             schedule.market,
@@ -479,7 +1008,8 @@ def schedule_alert(schedule: AlertScheduleCreate):
             schedule.channels
         )
 
-        next_run = calculate_next_run(schedule.run_at_local, schedule.timezone)
+        next_run = calculate_next_run(schedule.run_at_local, schedule.timezone, schedule.market)
+        scheduler.add({**schedule.dict(), "id": schedule_id, "next_run": next_run})
 
         return {
             "schedule_id": schedule_id,
@@ -490,6 +1020,19 @@ def schedule_alert(schedule: AlertScheduleCreate):
         logger.error(f"Schedule alert error: {e}")
         raise HTTPException(500, str(e))
 
+@app.get("/datasets/{dataset_id}/drift")
+def dataset_drift(dataset_id: str, market: str = Query(DEFAULT_MARKET)):
+    bundle = bundle_for(market)
+    cached = dataset_cache.get(dataset_id)
+    if cached is not None:
+        drift = feature_drift(cached, bundle)
+    else:
+        row = get_dataset_notes(dataset_id)
+        if row is None:
+            raise HTTPException(404, "Dataset not found")
+        drift = (row.get("validation_notes") or {}).get("drift")
+    return {"dataset_id": dataset_id, "reference": bundle.reference_sketch is not None, "drift": drift}
+
 @app.get("/datasets")
 def list_datasets(
     market: str = Query("ID"),
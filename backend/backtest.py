@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+# IDX auto rejection (ARA) limits by previous close, and the tick size grid the limit price is floored to
+ARA_TIERS = [(200, 0.35), (5000, 0.25), (np.inf, 0.20)]
+TICK_TIERS = [(200, 1), (500, 2), (2000, 5), (5000, 10), (np.inf, 25)]
+
+def _tier(values: np.ndarray, tiers) -> np.ndarray:
+    bounds = np.array([b for b, _ in tiers[:-1]], dtype=np.float64)
+    return np.array([v for _, v in tiers], dtype=np.float64)[np.searchsorted(bounds, values, side="left")]
+
+def ara_price(prev_close: np.ndarray) -> np.ndarray:
+    prev_close = np.asarray(prev_close, dtype=np.float64)
+    limit = prev_close * (1.0 + _tier(prev_close, ARA_TIERS))
+    tick = _tier(limit, TICK_TIERS)
+    return np.floor(limit / tick + 1e-9) * tick
+
+def ara_hits(prev_close: np.ndarray, close: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return np.asarray(close, dtype=np.float64) >= ara_price(prev_close)
+
+@dataclass
+class Panel:
+    dates: np.ndarray
+    tickers: np.ndarray
+    score: np.ndarray
+    close: np.ndarray
+    ranks: Dict[str, np.ndarray]
+    pemantauan: np.ndarray
+    next_ok: np.ndarray
+
+def _matrix(d: np.ndarray, t: np.ndarray, values: np.ndarray, shape, fill, dtype) -> np.ndarray:
+    m = np.full(shape, fill, dtype=dtype)
+    m[d, t] = values
+    return m
+
+def build_panel(df: pd.DataFrame, scores: np.ndarray,
+                next_trading_day: Optional[Callable] = None) -> Panel:
+    dates = pd.to_datetime(df["Date"]).dt.normalize().to_numpy().astype("datetime64[D]")
+    d_codes, uniq_dates = pd.factorize(dates, sort=True)
+    t_codes, tickers = pd.factorize(df["Ticker"].to_numpy())
+    shape = (len(uniq_dates), len(tickers))
+
+    close = pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=np.float64)
+    rank_cols = [c for c in df.columns if c == "vol_rank_day" or c == "turnover_rank_day" or c.startswith("avgvol_rank_")]
+    ranks = {c: _matrix(d_codes, t_codes, pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float32), shape, np.nan, np.float32)
+             for c in rank_cols}
+    if "Papan" in df.columns:
+        pem = df["Papan"].fillna("").astype(str).str.lower().eq("pemantauan khusus").to_numpy()
+    else:
+        pem = np.zeros(len(df), dtype=bool)
+
+    uniq_dates = np.asarray(uniq_dates, dtype="datetime64[D]")
+    # a row only earns a return when the next row in the panel is really the next trading day
+    next_ok = np.zeros(len(uniq_dates), dtype=bool)
+    if len(uniq_dates) > 1:
+        if next_trading_day is None:
+            next_ok[:-1] = True
+        else:
+            expected = [next_trading_day(d.item()) for d in uniq_dates[:-1]]
+            next_ok[:-1] = [e is not None and np.datetime64(e, "D") == n for e, n in zip(expected, uniq_dates[1:])]
+
+    return Panel(
+        dates=uniq_dates,
+        tickers=np.asarray(tickers),
+        score=_matrix(d_codes, t_codes, np.asarray(scores, dtype=np.float32), shape, np.nan, np.float32),
+        close=_matrix(d_codes, t_codes, close, shape, np.nan, np.float64),
+        ranks=ranks,
+        pemantauan=_matrix(d_codes, t_codes, pem, shape, False, bool),
+        next_ok=next_ok
+    )
+
+def top_k_mask(score: np.ndarray, eligible: np.ndarray, k: int) -> np.ndarray:
+    s = np.where(eligible & np.isfinite(score), score, -np.inf)
+    k = min(k, s.shape[1])
+    picks = np.zeros(s.shape, dtype=bool)
+    if k == 0:
+        return picks
+    idx = np.argpartition(-s, k - 1, axis=1)[:, :k]
+    np.put_along_axis(picks, idx, True, axis=1)
+    return picks & np.isfinite(s)
+
+def run_backtest(panel: Panel, k: int, liq: float, exclude_pemantauan: bool,
+                 liq_by: str = "vol_rank_day") -> Dict:
+    if liq_by not in panel.ranks:
+        raise ValueError(f"Unknown liquidity rank column: {liq_by}")
+    eligible = np.nan_to_num(panel.ranks[liq_by], nan=0.0) >= float(liq)
+    if exclude_pemantauan:
+        eligible &= ~panel.pemantauan
+    picks = top_k_mask(panel.score, eligible, k)
+
+    prev, nxt = panel.close[:-1], panel.close[1:]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret = nxt / prev - 1.0
+    valid = picks[:-1] & np.isfinite(ret) & panel.next_ok[:-1, None]
+    counts = valid.sum(axis=1)
+    daily = np.where(counts > 0, np.where(valid, ret, 0.0).sum(axis=1) / np.maximum(counts, 1), 0.0)
+    hits = (valid & ara_hits(prev, nxt)).sum(axis=1)
+
+    held = picks.sum(axis=1)
+    overlap = (picks[1:] & picks[:-1]).sum(axis=1)
+    turnover = np.concatenate([[1.0 if held[:1].any() else 0.0], 1.0 - overlap / np.maximum(held[1:], 1)])
+
+    days = panel.next_ok[:-1]
+    equity = np.cumprod(1.0 + daily[days])
+    evaluated = int(counts.sum())
+    return {
+        "dates": [str(d) for d in panel.dates[1:][days]],
+        "equity": equity.round(6).tolist(),
+        "daily_return": daily[days].round(6).tolist(),
+        "hits": hits[days].tolist(),
+        "hit_rate": float(hits.sum() / evaluated) if evaluated else None,
+        "turnover": float(turnover[:-1][days].mean()) if days.any() else None,
+        "total_return": float(equity[-1] - 1.0) if len(equity) else 0.0,
+        "picks": evaluated
+    }
@@ -0,0 +1,75 @@
+import os, sys, json, time, argparse, threading
+import multiprocessing as mp
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from eventbus import create_bus
+
+def worker(url, expected, ready, results):
+    lat, done = [], threading.Event()
+
+    def deliver(event_id, data):
+        lat.append(time.time() - json.loads(data)["t"])
+        if len(lat) >= expected:
+            done.set()
+
+    bus = create_bus(deliver, url)
+    bus.start()
+    ready.put(os.getpid())
+    done.wait(60)
+    bus.stop()
+    results.put(lat)
+
+def publisher(url, count, start):
+    bus = create_bus(lambda *a: None, url)
+    bus.start()
+    start.wait()
+    for i in range(count):
+        bus.publish({"t": time.time(), "i": i, "ticker": "BBCA.JK", "proba": 0.91})
+    time.sleep(0.5)
+    bus.stop()
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure alert delivery across worker processes")
+    ap.add_argument("--bus", default=os.getenv("EVENT_BUS", "unix"))
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--publishers", type=int, default=2)
+    ap.add_argument("--events", type=int, default=5000, help="events per publisher")
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    expected = args.publishers * args.events
+    ready, results, start = mp.Queue(), mp.Queue(), mp.Event()
+    workers = [mp.Process(target=worker, args=(args.bus, expected, ready, results)) for _ in range(args.workers)]
+    for w in workers:
+        w.start()
+    for _ in workers:
+        ready.get(timeout=30)
+    pubs = [mp.Process(target=publisher, args=(args.bus, args.events, start)) for _ in range(args.publishers)]
+    for p in pubs:
+        p.start()
+    time.sleep(0.5)
+    t0 = time.time()
+    start.set()
+    lat = np.concatenate([np.asarray(results.get(timeout=120)) for _ in workers])
+    elapsed = time.time() - t0
+    for p in pubs + workers:
+        p.join()
+
+    report = {
+        "bus": args.bus,
+        "workers": args.workers,
+        "publishers": args.publishers,
+        "published": expected,
+        "delivered": int(len(lat)),
+        "delivery_ratio": float(len(lat) / (expected * args.workers)),
+        "throughput_deliveries_per_s": float(len(lat) / elapsed),
+        "latency_ms": {q: float(np.percentile(lat, int(q[1:])) * 1000) for q in ("p50", "p95", "p99")},
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import os, sys, json, time, argparse, tempfile, platform
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bench import synthetic
+
+NOISE_FLOOR_MS = 1.0
+WORKLOAD_KEYS = ("seeds", "features", "rounds", "tickers", "days", "doc_rows", "k")
+
+def timeit(fn, repeat: int, warmup: int = 1, setup=None) -> dict:
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t) * 1000)
+    s = np.asarray(samples)
+    return {"median_ms": float(np.median(s)), "min_ms": float(s.min()), "p95_ms": float(np.percentile(s, 95)), "n": repeat}
+
+def skipped(reason: str) -> dict:
+    return {"skipped": reason}
+
+def tesseract_available() -> bool:
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+def load_app(bundle: bytes, workdir: str):
+    # the app downloads its bundle and wires its stores at import, so point both at offline stand-ins first
+    for key, sub in (("SCORE_STORE_DIR", "scores"), ("MONITOR_DIR", "monitor"), ("FEATURE_STATE_DIR", "state")):
+        os.environ.setdefault(key, os.path.join(workdir, sub))
+    os.environ.setdefault("WEBHOOK_OUTBOX_PATH", os.path.join(workdir, "outbox.db"))
+    os.environ.setdefault("ALERT_DEDUP_PATH", os.path.join(workdir, "dedup.db"))
+    os.environ.setdefault("ALERT_SCHEDULER", "0")
+    os.environ.setdefault("BUNDLE_ROOT", os.path.join(workdir, "bundles"))
+    import model_loader
+    model_loader.download_bundle = lambda *a, **k: bundle
+    import app
+    return app
+
+def run_suite(seeds: int = 5, features: int = 14, rounds: int = 200, tickers: int = 900, days: int = 80,
+              repeat: int = 20, doc_rows: int = 200, k: int = 50) -> dict:
+    workdir = tempfile.mkdtemp(prefix="ara_bench_")
+    t = time.perf_counter()
+    bundle = synthetic.make_bundle(n_seeds=seeds, n_features=features, rounds=rounds)
+    build_s = time.perf_counter() - t
+    universe = synthetic.make_universe(n_tickers=tickers, n_days=days)
+    snapshot = synthetic.latest_day(universe)
+    fake = synthetic.install_fake_supabase()
+    app = load_app(bundle, workdir)
+
+    import db, ingest
+    from utils import predict_mean, screen, enrich_screen_features
+    from fastapi.testclient import TestClient
+
+    results = {}
+    model = app.model_registry.get("ID")
+    X = np.random.default_rng(0).normal(size=(tickers, len(model.feature_cols))).astype(np.float32)
+    results["predict_mean"] = timeit(lambda: predict_mean(model.models, X, model.calib), repeat)
+
+    scored = enrich_screen_features(snapshot).assign(proba_ARA_t1=np.random.default_rng(1).random(len(snapshot)))
+    results["screen"] = timeit(lambda: screen(scored, True, 0.5), repeat)
+
+    dataset_id = db.save_dataset(universe, "csv", "bench.csv", "ID", "valid", {})
+    results["get_dataset_decode"] = timeit(lambda: db.get_dataset(dataset_id), max(repeat // 4, 3))
+    results["validate_dataset"] = timeit(lambda: ingest.validate_dataset(universe), repeat)
+
+    docs = snapshot.head(doc_rows)
+    csv_history = universe.to_csv(index=False).encode()
+    results["ingest_csv"] = timeit(lambda: ingest.ingest_csv(csv_history), max(repeat // 4, 3))
+    results["ingest_paste"] = timeit(lambda: ingest.ingest_paste(synthetic.paste_text(snapshot)), repeat)
+    xlsx = synthetic.excel_bytes(snapshot)
+    results["ingest_excel"] = timeit(lambda: ingest.ingest_excel(xlsx), max(repeat // 4, 3))
+    docx = synthetic.docx_bytes(docs)
+    results["ingest_docx"] = timeit(lambda: ingest.ingest_docx(docx), max(repeat // 4, 3))
+    pdf = synthetic.pdf_bytes(docs)
+    results["ingest_pdf"] = timeit(lambda: ingest.ingest_pdf(pdf), max(repeat // 4, 3))
+    if tesseract_available():
+        png = synthetic.image_bytes(docs.head(60))
+        results["ingest_image"] = timeit(lambda: ingest.ingest_image(png), 3)
+    else:
+        results["ingest_image"] = skipped("tesseract binary not installed")
+    results["ingest_scrape"] = skipped("needs network access to Yahoo Finance")
+
+    client = TestClient(app.app)
+    url = f"/score_latest?k={k}"
+    assert client.get(url).status_code == 200
+    results["score_latest_warm"] = timeit(lambda: client.get(url), repeat)
+    results["score_latest_cold"] = timeit(lambda: client.get(url), max(repeat // 4, 3), setup=app.dataset_cache.clear)
+
+    return {
+        "meta": {
+            "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+            "seeds": seeds, "features": features, "rounds": rounds, "tickers": tickers, "days": days,
+            "rows": len(universe), "doc_rows": len(docs), "k": k, "bundle_bytes": len(bundle),
+            "bundle_build_s": round(build_s, 2), "tables": {t: len(r) for t, r in fake.tables.items()}
+        },
+        "results": results
+    }
+
+def compare(current: dict, baseline: dict, threshold: float, floor_ms: float = NOISE_FLOOR_MS) -> list:
+    regressions = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base or "median_ms" not in cur or "median_ms" not in base:
+            continue
+        if cur["median_ms"] > base["median_ms"] * (1 + threshold) and cur["median_ms"] - base["median_ms"] > floor_ms:
+            regressions.append({"name": name, "baseline_ms": base["median_ms"], "current_ms": cur["median_ms"],
+                                "ratio": round(cur["median_ms"] / base["median_ms"], 3)})
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser(description="Time the scoring, ingest and decode paths on a synthetic IDX universe")
+    ap.add_argument("--seeds", type=int, default=5)
+    ap.add_argument("--features", type=int, default=14)
+    ap.add_argument("--rounds", type=int, default=200)
+    ap.add_argument("--tickers", type=int, default=900)
+    ap.add_argument("--days", type=int, default=80)
+    ap.add_argument("--repeat", type=int, default=20)
+    ap.add_argument("--doc-rows", type=int, default=200, help="rows in the docx/pdf payloads")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--baseline", default=None, help="earlier --out file to compare against")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown of the median, 0.25 = 25%%")
+    args = ap.parse_args()
+
+    report = run_suite(args.seeds, args.features, args.rounds, args.tickers, args.days, args.repeat, args.doc_rows)
+    for name, r in report["results"].items():
+        print(f"{name:22s} " + (f"{r['median_ms']:10.2f} ms  (min {r['min_ms']:.2f}, p95 {r['p95_ms']:.2f})"
+                                 if "median_ms" in r else f"skipped: {r['skipped']}"))
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = [k for k in WORKLOAD_KEYS if baseline.get("meta", {}).get(k) != report["meta"][k]]
+        if changed:
+            print(f"warning: baseline ran a different workload ({', '.join(changed)})")
+        regressions = compare(report, baseline, args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['baseline_ms']:.2f} -> {r['current_ms']:.2f} ms (x{r['ratio']})")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
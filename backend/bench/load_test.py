@@ -0,0 +1,173 @@
+import os, sys, json, time, random, socket, asyncio, argparse, tempfile, threading
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bench import synthetic
+
+DEFAULT_MIX = "score_latest=6,score=3,ingest_csv=1"
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, w = part.partition("=")
+        if name.strip() not in ("score_latest", "score", "ingest_csv"):
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name.strip()] = float(w or 1)
+    return weights
+
+def percentiles(values) -> dict:
+    if not len(values):
+        return {"p50": None, "p95": None, "p99": None}
+    a = np.asarray(values) * 1000
+    return {q: round(float(np.percentile(a, int(q[1:]))), 2) for q in ("p50", "p95", "p99")}
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(args) -> str:
+    # same offline stand-ins as the benchmark suite, plus a single-process bus so SSE sees every alert
+    from bench.bench_suite import load_app
+    import uvicorn
+    os.environ.setdefault("EVENT_BUS", "local")
+    os.environ.setdefault("ALERT_THRESHOLD", str(args.alert_threshold))
+    os.environ.setdefault("ALERT_DEDUP_TTL", "0")
+    bundle = synthetic.make_bundle(n_seeds=args.seeds, rounds=args.rounds)
+    synthetic.install_fake_supabase()
+    app = load_app(bundle, tempfile.mkdtemp(prefix="ara_load_"))
+    import db
+    db.save_dataset(synthetic.make_universe(args.tickers, args.days), "csv", "seed.csv", "ID", "valid", {})
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app.app, host="127.0.0.1", port=port, log_level="warning",
+                                           timeout_keep_alive=30))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+class Stats:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lags = []
+        self.events = 0
+        self.streams_open = 0
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latency) | set(self.errors)):
+            ok = self.latency[name]
+            endpoints[name] = {"requests": len(ok) + self.errors[name], "errors": self.errors[name],
+                               "throughput_rps": round(len(ok) / elapsed, 2), "latency_ms": percentiles(ok)}
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": endpoints,
+            "sse": {"streams": self.streams_open, "events": self.events,
+                    "events_per_s": round(self.events / elapsed, 2), "delivery_lag_ms": percentiles(self.lags)}
+        }
+
+async def user(client, base: str, weights: dict, payload: bytes, asof: str, k: int, think: float,
+               deadline: float, stats: Stats, rng: random.Random):
+    names, w = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, w)[0]
+        t = time.perf_counter()
+        try:
+            if name == "score_latest":
+                r = await client.get(f"{base}/score_latest", params={"k": k})
+            elif name == "score":
+                r = await client.get(f"{base}/score", params={"asof": asof, "k": k})
+            else:
+                r = await client.post(f"{base}/ingest/csv", data={"market": "ID"},
+                                      files={"file": (f"load_{rng.random():.8f}.csv", payload, "text/csv")})
+            if r.status_code >= 400:
+                stats.errors[name] += 1
+            else:
+                stats.latency[name].append(time.perf_counter() - t)
+        except Exception:
+            stats.errors[name] += 1
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+def _lags(data: str, now: datetime):
+    payload = json.loads(data)
+    alerts = payload.get("alerts", [payload]) if isinstance(payload, dict) else []
+    for a in alerts:
+        stamp = a.get("timestamp")
+        if stamp:
+            yield (now - datetime.fromisoformat(stamp)).total_seconds()
+
+async def stream(client, base: str, deadline: float, stats: Stats):
+    try:
+        async with client.stream("GET", f"{base}/alerts/stream", timeout=None) as r:
+            stats.streams_open += 1
+            lines = r.aiter_lines()
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(lines.__anext__(), remaining)
+                except (asyncio.TimeoutError, StopAsyncIteration):
+                    break
+                if line.startswith("data: "):
+                    lags = list(_lags(line[6:], datetime.now()))
+                    stats.events += len(lags)
+                    stats.lags.extend(lags)
+    except Exception:
+        stats.errors["alerts_stream"] += 1
+
+async def run(args, base: str) -> dict:
+    import httpx
+    weights = parse_mix(args.mix)
+    payload = synthetic.make_universe(args.tickers, args.ingest_days, seed=1).to_csv(index=False).encode()
+    asof = synthetic.END_DATE.isoformat()
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.users + args.sse + 10, max_keepalive_connections=args.users + args.sse)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        await client.get(f"{base}/score_latest", params={"k": args.k})
+        start = time.monotonic()
+        deadline = start + args.duration
+        streams = [asyncio.create_task(stream(client, base, deadline + 2, stats)) for _ in range(args.sse)]
+        await asyncio.sleep(0.2)
+        rngs = [random.Random(i) for i in range(args.users)]
+        await asyncio.gather(*[user(client, base, weights, payload, asof, args.k, args.think, deadline, stats, rng)
+                               for rng in rngs])
+        elapsed = time.monotonic() - start
+        await asyncio.gather(*streams)
+    report = stats.report(elapsed)
+    report["config"] = {k: v for k, v in vars(args).items() if k != "out"}
+    return report
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay a close-of-market mix of ingest, scoring and SSE traffic")
+    ap.add_argument("--url", default=None, help="target a running server instead of an in-process one")
+    ap.add_argument("--users", type=int, default=20, help="concurrent polling/ingesting clients")
+    ap.add_argument("--sse", type=int, default=50, help="long-lived /alerts/stream connections")
+    ap.add_argument("--mix", default=DEFAULT_MIX)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--think", type=float, default=0.5, help="mean seconds between a user's requests")
+    ap.add_argument("--k", type=int, default=50)
+    ap.add_argument("--timeout", type=float, default=60)
+    ap.add_argument("--tickers", type=int, default=900)
+    ap.add_argument("--days", type=int, default=80, help="history in the seeded dataset")
+    ap.add_argument("--ingest-days", type=int, default=80, help="history in each uploaded CSV")
+    ap.add_argument("--seeds", type=int, default=5)
+    ap.add_argument("--rounds", type=int, default=200)
+    ap.add_argument("--alert-threshold", type=float, default=0.5)
+    ap.add_argument("--out", default=None)
+    args = ap.parse_args()
+
+    base = args.url or start_server(args)
+    report = asyncio.run(run(args, base))
+    print(json.dumps({k: v for k, v in report.items() if k != "config"}, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
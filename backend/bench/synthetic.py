@@ -0,0 +1,294 @@
+import io, os, sys, json, uuid, zipfile, itertools
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PAPAN = ["Utama", "Pengembangan", "Akselerasi", "Pemantauan Khusus"]
+PAPAN_WEIGHTS = [0.45, 0.40, 0.10, 0.05]
+END_DATE = date(2025, 10, 15)
+
+# (op, col, windows) cycled to reach the requested feature count
+SPEC_TEMPLATE = [
+    ("ret", "Close", [1, 5, 10, 20]), ("logret", "Close", [20, 5, 60]), ("sma", "Volume", [20, 5, 60]),
+    ("rel_sma", "Volume", [20, 5, 60]), ("std", "Close", [20, 5, 60]), ("zscore", "Close", [20, 5, 60]),
+    ("dist_max", "Close", [60, 20]), ("dist_min", "Close", [60, 20]), ("range", "Close", [5, 20]),
+    ("ret_std", "Close", [20, 5]), ("max", "High", [10, 20]), ("lag", "Close", [3, 1]), ("value", "Close", [1])
+]
+
+def make_spec(n_features: int = 14) -> List[Dict]:
+    spec = []
+    for depth in itertools.count():
+        added = False
+        for op, col, windows in SPEC_TEMPLATE:
+            if depth >= len(windows):
+                continue
+            w = windows[depth]
+            name = "close" if op == "value" else f"{op}_{col.lower()}_{w}"
+            spec.append({"name": name, "op": op, "col": col, "window": w})
+            added = True
+            if len(spec) == n_features:
+                return spec
+        if not added:
+            raise ValueError(f"SPEC_TEMPLATE only yields {len(spec)} features")
+
+def make_bundle(n_seeds: int = 5, n_features: int = 14, rounds: int = 200, depth: int = 6,
+                train_rows: int = 20000, seed: int = 0) -> bytes:
+    # zip laid out like a training release: seed boosters, isotonic calibrator, feature list and spec
+    import joblib, xgboost as xgb
+    from sklearn.isotonic import IsotonicRegression
+
+    spec = make_spec(n_features)
+    cols = [f["name"] for f in spec]
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(train_rows, len(cols))).astype(np.float32)
+    logit = X @ rng.normal(scale=0.8, size=len(cols)) + 0.5 * X[:, 0] * X[:, 1] - 4.0
+    y = (rng.random(train_rows) < 1 / (1 + np.exp(-logit))).astype(np.float32)
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        dtrain = xgb.DMatrix(X, label=y, feature_names=cols)
+        preds = []
+        for s in range(n_seeds):
+            booster = xgb.train({"objective": "binary:logistic", "max_depth": depth, "eta": 0.05,
+                                 "subsample": 0.8, "colsample_bytree": 0.8, "seed": s, "nthread": 1},
+                                dtrain, num_boost_round=rounds)
+            z.writestr(f"xgb_cls_seed{s}.json", booster.save_raw("json").decode())
+            preds.append(booster.predict(dtrain))
+        p = np.mean(preds, axis=0)
+        p = (p - p.min()) / (p.max() - p.min() + 1e-12)
+        calib = IsotonicRegression(out_of_bounds="clip").fit(p, y)
+        calib_buf = io.BytesIO()
+        joblib.dump(calib, calib_buf)
+        z.writestr("artifacts/isotonic_calibrator.pkl", calib_buf.getvalue())
+        z.writestr("feature_cols_final.json", json.dumps(cols))
+        z.writestr("artifacts/feature_spec.json", json.dumps(spec))
+        z.writestr("model_card.json", json.dumps({
+            "version": f"synthetic-{n_seeds}x{rounds}-{n_features}f",
+            "metrics": {"ap_valid": 0.3, "ap_test": 0.28, "p_at_k": {"10": 0.4}, "base_rate": float(y.mean())}
+        }))
+    return buf.getvalue()
+
+def make_universe(n_tickers: int = 900, n_days: int = 80, end: date = END_DATE, seed: int = 0) -> pd.DataFrame:
+    # daily OHLCV for an IDX-like universe: random-walk closes, lognormal volumes, board labels
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end, periods=n_days).date
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codes = set()
+    while len(codes) < n_tickers:
+        codes.add("".join(rng.choice(letters, 4)))
+    tickers = np.array([f"{c}.JK" for c in sorted(codes)])
+
+    start = np.exp(rng.uniform(np.log(50), np.log(20000), n_tickers))
+    rets = rng.normal(0, 0.03, size=(n_days, n_tickers)) + (rng.random((n_days, n_tickers)) < 0.01) * 0.25
+    close = np.maximum(np.round(start * np.exp(np.cumsum(np.log1p(rets), axis=0))), 1)
+    spread = np.abs(rng.normal(0, 0.015, size=close.shape))
+    high = np.round(close * (1 + spread))
+    low = np.maximum(np.round(close * (1 - spread)), 1)
+    opn = np.clip(np.round(close * (1 + rng.normal(0, 0.01, close.shape))), low, high)
+    volume = np.round(np.exp(rng.normal(13, 2, size=(1, n_tickers)) + rng.normal(0, 0.5, size=close.shape)) / 100) * 100
+    papan = rng.choice(PAPAN, n_tickers, p=PAPAN_WEIGHTS)
+
+    return pd.DataFrame({
+        "Date": np.repeat(dates, n_tickers),
+        "Ticker": np.tile(tickers, n_days),
+        "Nama": np.tile([f"PT {t[:4]} Tbk" for t in tickers], n_days),
+        "Papan": np.tile(papan, n_days),
+        "Open": opn.ravel(), "High": high.ravel(), "Low": low.ravel(), "Close": close.ravel(),
+        "Volume": volume.ravel()
+    })
+
+def latest_day(df: pd.DataFrame) -> pd.DataFrame:
+    return df[df["Date"] == df["Date"].max()].reset_index(drop=True)
+
+def paste_text(df: pd.DataFrame) -> str:
+    return df.to_csv(sep="\t", index=False)
+
+def excel_bytes(df: pd.DataFrame) -> bytes:
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+def docx_bytes(df: pd.DataFrame) -> bytes:
+    from docx import Document
+    doc = Document()
+    table = doc.add_table(rows=len(df) + 1, cols=len(df.columns))
+    for j, c in enumerate(df.columns):
+        table.cell(0, j).text = str(c)
+    for i, row in enumerate(df.itertuples(index=False), start=1):
+        cells = table.rows[i].cells
+        for j, v in enumerate(row):
+            cells[j].text = str(v)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def pdf_bytes(df: pd.DataFrame, row_height: float = 9.0, font_size: float = 6.0) -> bytes:
+    # single-page PDF with a ruled table, enough for pdfplumber's line-based table finder
+    rows = [list(map(str, df.columns))] + [[str(v) for v in r] for r in df.itertuples(index=False)]
+    width, height, margin = 595.0, 842.0, 20.0
+    col_w = (width - 2 * margin) / len(rows[0])
+    max_rows = int((height - 2 * margin) // row_height)
+    rows = rows[:max_rows]
+    top = height - margin
+    ops = ["0.3 w"]
+    for i in range(len(rows) + 1):
+        y = top - i * row_height
+        ops.append(f"{margin} {y} m {width - margin} {y} l S")
+    for j in range(len(rows[0]) + 1):
+        x = margin + j * col_w
+        ops.append(f"{x} {top} m {x} {top - len(rows) * row_height} l S")
+    for i, row in enumerate(rows):
+        y = top - (i + 1) * row_height + 2.5
+        for j, v in enumerate(row):
+            text = v.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"BT /F1 {font_size} Tf {margin + j * col_w + 1.5} {y} Td ({text}) Tj ET")
+    stream = "\n".join(ops).encode("latin-1", "replace")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] /Contents 4 0 R "
+        f"/Resources << /Font << /F1 5 0 R >> >> >>".encode(),
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{i} 0 obj\n".encode() + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    out.write("".join(f"{o:010d} 00000 n \n" for o in offsets).encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+def image_bytes(df: pd.DataFrame) -> bytes:
+    from PIL import Image, ImageDraw
+    lines = [" ".join(map(str, df.columns))] + [" ".join(str(v) for v in r) for r in df.itertuples(index=False)]
+    img = Image.new("L", (1400, 20 * len(lines) + 20), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((10, 10 + 20 * i), line, fill=0)
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+class FakeResult:
+    def __init__(self, data):
+        self.data = data
+
+# just enough of the postgrest builder for db.py; filters run on row metadata, payloads go through JSON
+class FakeQuery:
+    def __init__(self, client: "FakeSupabase", table: str):
+        self.client = client
+        self.table = table
+        self.cols: Optional[List[str]] = None
+        self.filters = []
+        self.orders = []
+        self.lim: Optional[int] = None
+        self.window: Optional[tuple] = None
+        self.single = False
+        self.op = "select"
+        self.payload = None
+
+    def select(self, cols: str = "*"):
+        self.cols = None if cols.strip() == "*" else [c.strip() for c in cols.split(",")]
+        return self
+
+    def _filter(self, col, fn, value):
+        self.filters.append((col, fn, value))
+        return self
+
+    def eq(self, col, value): return self._filter(col, lambda a, b: a == b, value)
+    def neq(self, col, value): return self._filter(col, lambda a, b: a != b, value)
+    def gte(self, col, value): return self._filter(col, lambda a, b: a is not None and a >= b, value)
+    def lte(self, col, value): return self._filter(col, lambda a, b: a is not None and a <= b, value)
+    def gt(self, col, value): return self._filter(col, lambda a, b: a is not None and a > b, value)
+    def lt(self, col, value): return self._filter(col, lambda a, b: a is not None and a < b, value)
+
+    def order(self, col, desc: bool = False):
+        self.orders.append((col, desc))
+        return self
+
+    def limit(self, n: int):
+        self.lim = n
+        return self
+
+    def range(self, start: int, end: int):
+        self.window = (start, end)
+        return self
+
+    def maybe_single(self):
+        self.single = True
+        return self
+
+    def insert(self, row: Dict):
+        self.op, self.payload = "insert", row
+        return self
+
+    def update(self, values: Dict):
+        self.op, self.payload = "update", values
+        return self
+
+    def _matches(self, meta: Dict) -> bool:
+        return all(fn(meta.get(col), value) for col, fn, value in self.filters)
+
+    def execute(self) -> FakeResult:
+        rows = self.client.tables.setdefault(self.table, [])
+        if self.op == "insert":
+            return FakeResult([self.client._store(rows, self.payload)])
+        if self.op == "update":
+            hit = [r for r in rows if self._matches(r[0])]
+            for r in hit:
+                full = {**json.loads(r[1]), **self.payload}
+                r[0].update({k: v for k, v in self.payload.items() if k != "data"})
+                r[1] = json.dumps(full, default=str)
+            return FakeResult([r[0] for r in hit])
+
+        hit = [r for r in rows if self._matches(r[0])]
+        for col, desc in reversed(self.orders):
+            hit.sort(key=lambda r: (r[0].get(col) is None, r[0].get(col)), reverse=desc)
+        if self.window:
+            hit = hit[self.window[0]:self.window[1] + 1]
+        if self.lim is not None:
+            hit = hit[:self.lim]
+        data = [self._project(r) for r in hit]
+        if self.single:
+            # postgrest's maybe_single().execute() returns no response at all when nothing matches
+            return FakeResult(data[0]) if data else None
+        return FakeResult(data)
+
+    def _project(self, r):
+        meta, raw = r
+        if self.cols is None or "data" in self.cols:
+            # a real client parses the whole response body, so payload rows pay the JSON decode here too
+            row = json.loads(raw)
+            return row if self.cols is None else {c: row.get(c) for c in self.cols}
+        return {c: meta.get(c) for c in self.cols}
+
+# in-memory stand-in for supabase.Client covering the tables and query shapes db.py uses
+class FakeSupabase:
+    def __init__(self):
+        self.tables: Dict[str, list] = {}
+        self.clock = datetime(2025, 1, 1)
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def _store(self, rows: list, row: Dict) -> Dict:
+        self.clock += timedelta(seconds=1)
+        full = {"id": str(uuid.uuid4()), "created_at": self.clock.isoformat(), "is_active": True, **row}
+        full = json.loads(json.dumps(full, default=str))
+        meta = {k: v for k, v in full.items() if k != "data"}
+        rows.append([meta, json.dumps(full)])
+        return full
+
+def install_fake_supabase() -> FakeSupabase:
+    import db
+    db.supabase = FakeSupabase()
+    return db.supabase
@@ -0,0 +1,54 @@
+import os, threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+DATASET_CACHE_SIZE = int(os.getenv("DATASET_CACHE_SIZE", "8"))
+BACKTEST_CACHE_SIZE = int(os.getenv("BACKTEST_CACHE_SIZE", "64"))
+EXPLAIN_CACHE_SIZE = int(os.getenv("EXPLAIN_CACHE_SIZE", "5000"))
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data: "OrderedDict[Any, Any]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[Any]:
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+        return value
+
+    def pop(self, key):
+        with self.lock:
+            return self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+datasets = LRUCache(DATASET_CACHE_SIZE)
+# bundle-ordered feature arrays, one per (dataset, bundle), sized like the datasets they come from
+matrices = LRUCache(DATASET_CACHE_SIZE)
+panels = LRUCache(2)
+backtests = LRUCache(BACKTEST_CACHE_SIZE)
+explanations = LRUCache(EXPLAIN_CACHE_SIZE)
@@ -1,5 +1,10 @@
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
+import bisect
+import hashlib
+import logging
+import threading
+import time
 import pytz
 from supabase import create_client, Client
 import os
@@ -8,48 +13,161 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL else None
 
+CALENDAR_REFRESH_SECONDS = int(os.getenv("CALENDAR_REFRESH_SECONDS", "21600"))
+CALENDAR_START = date.fromisoformat(os.getenv("CALENDAR_START", "2000-01-01"))
+CALENDAR_YEARS_AHEAD = int(os.getenv("CALENDAR_YEARS_AHEAD", "2"))
+
+logger = logging.getLogger(__name__)
+
 def is_weekend(d: date) -> bool:
     return d.weekday() >= 5
 
-def get_trading_days(market: str, from_date: date, to_date: date) -> List[date]:
+def fetch_holidays(market: str) -> set:
     if not supabase:
-        trading_days = []
-        current = from_date
-        while current <= to_date:
-            if not is_weekend(current):
-                trading_days.append(current)
-            current += timedelta(days=1)
-        return trading_days
+        return set()
 
-    try:
+    rows, page, start = [], 1000, 0
+    while True:
         result = supabase.table("trading_calendar")\
             .select("date, is_trading_day")\
             .eq("market", market)\
-            .gte("date", from_date.isoformat())\
-            .lte("date", to_date.isoformat())\
+            .order("date")\
+            .range(start, start + page - 1)\
             .execute()
+        rows.extend(result.data)
+        if len(result.data) < page:
+            break
+        start += page
+
+    return {date.fromisoformat(row["date"]) for row in rows if not row["is_trading_day"]}
+
+class CalendarIndex:
+    def __init__(self, market: str, holidays: set, start: date, end: date):
+        self.market = market
+        self.start = start
+        self.end = end
+        self.holidays = holidays
+        first = start.toordinal()
+        self.days = [o for o in range(first, end.toordinal() + 1)
+                     if (o + 6) % 7 < 5 and date.fromordinal(o) not in holidays]
+        self.loaded_at = time.monotonic()
+        self.version = hashlib.sha1(f"{start}|{end}|{sorted(holidays)}".encode()).hexdigest()[:12]
+
+    @classmethod
+    def build(cls, market: str) -> "CalendarIndex":
+        end = date(date.today().year + CALENDAR_YEARS_AHEAD, 12, 31)
+        return cls(market, fetch_holidays(market), CALENDAR_START, end)
+
+    def covers(self, d: date) -> bool:
+        return self.start <= d <= self.end
+
+    def is_trading_day(self, d: date) -> bool:
+        o = d.toordinal()
+        i = bisect.bisect_left(self.days, o)
+        return i < len(self.days) and self.days[i] == o
+
+    def between(self, from_date: date, to_date: date) -> List[date]:
+        lo = bisect.bisect_left(self.days, from_date.toordinal())
+        hi = bisect.bisect_right(self.days, to_date.toordinal())
+        return [date.fromordinal(o) for o in self.days[lo:hi]]
+
+    def count(self, from_date: date, to_date: date) -> int:
+        lo = bisect.bisect_left(self.days, from_date.toordinal())
+        hi = bisect.bisect_right(self.days, to_date.toordinal())
+        return max(hi - lo, 0)
+
+    def next(self, after: date) -> Optional[date]:
+        i = bisect.bisect_right(self.days, after.toordinal())
+        return date.fromordinal(self.days[i]) if i < len(self.days) else None
+
+    def prev(self, before: date) -> Optional[date]:
+        i = bisect.bisect_left(self.days, before.toordinal())
+        return date.fromordinal(self.days[i - 1]) if i > 0 else None
 
-        holidays = {row["date"] for row in result.data if not row["is_trading_day"]}
+    def add(self, d: date, n: int) -> Optional[date]:
+        if n == 0:
+            return d if self.is_trading_day(d) else self.next(d)
+        if n > 0:
+            i = bisect.bisect_right(self.days, d.toordinal()) + n - 1
+        else:
+            i = bisect.bisect_left(self.days, d.toordinal()) + n
+        return date.fromordinal(self.days[i]) if 0 <= i < len(self.days) else None
+
+_indexes: Dict[str, CalendarIndex] = {}
+_refreshing: set = set()
+_lock = threading.Lock()
+
+def _refresh(market: str):
+    try:
+        idx = CalendarIndex.build(market)
+        with _lock:
+            _indexes[market] = idx
     except Exception as e:
-        holidays = set()
+        logger.warning(f"Calendar refresh for {market} failed: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(market)
+
+def get_calendar(market: str) -> CalendarIndex:
+    idx = _indexes.get(market)
+    if idx is None:
+        try:
+            idx = CalendarIndex.build(market)
+        except Exception as e:
+            logger.warning(f"Calendar load for {market} failed, using weekdays only: {e}")
+            idx = CalendarIndex(market, set(), CALENDAR_START, date(date.today().year + CALENDAR_YEARS_AHEAD, 12, 31))
+            idx.loaded_at -= max(CALENDAR_REFRESH_SECONDS - 60, 0)
+        with _lock:
+            _indexes[market] = idx
+        return idx
+
+    if time.monotonic() - idx.loaded_at > CALENDAR_REFRESH_SECONDS:
+        with _lock:
+            start = market not in _refreshing
+            _refreshing.add(market)
+        if start:
+            threading.Thread(target=_refresh, args=(market,), daemon=True).start()
+    return idx
+
+def calendar_version(market: str) -> str:
+    return get_calendar(market).version
+
+def invalidate_calendar(market: Optional[str] = None):
+    with _lock:
+        if market is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(market, None)
 
+def _weekdays(from_date: date, to_date: date) -> List[date]:
     trading_days = []
     current = from_date
     while current <= to_date:
-        date_str = current.isoformat()
-        if not is_weekend(current) and date_str not in holidays:
+        if not is_weekend(current):
             trading_days.append(current)
         current += timedelta(days=1)
-
     return trading_days
 
+def get_trading_days(market: str, from_date: date, to_date: date) -> List[date]:
+    idx = get_calendar(market)
+    if not (idx.covers(from_date) and idx.covers(to_date)):
+        return _weekdays(from_date, to_date)
+    return idx.between(from_date, to_date)
+
+def count_trading_days(market: str, from_date: date, to_date: date) -> int:
+    return get_calendar(market).count(from_date, to_date)
+
+def is_trading_day(market: str, d: date) -> bool:
+    return get_calendar(market).is_trading_day(d)
+
 def get_next_trading_day(market: str, after: date) -> Optional[date]:
-    trading_days = get_trading_days(market, after + timedelta(days=1), after + timedelta(days=30))
-    return trading_days[0] if trading_days else None
+    return get_calendar(market).next(after)
 
 def get_prev_trading_day(market: str, before: date) -> Optional[date]:
-    trading_days = get_trading_days(market, before - timedelta(days=30), before - timedelta(days=1))
-    return trading_days[-1] if trading_days else None
+    return get_calendar(market).prev(before)
+
+def add_trading_days(market: str, d: date, n: int) -> Optional[date]:
+    return get_calendar(market).add(d, n)
 
 def get_market_close_time(market: str) -> str:
     close_times = {
@@ -58,13 +176,18 @@ def get_market_close_time(market: str) -> str:
     }
     return close_times.get(market, "16:00")
 
-def calculate_next_run(run_at_local: str, timezone_str: str) -> datetime:
+def calculate_next_run(run_at_local: str, timezone_str: str, market: Optional[str] = None, now: Optional[datetime] = None) -> datetime:
     tz = pytz.timezone(timezone_str)
-    now = datetime.now(tz)
-    hour, minute = map(int, run_at_local.split(":"))
+    now = datetime.now(pytz.UTC) if now is None else pytz.UTC.localize(now) if now.tzinfo is None else now
+    local_now = now.astimezone(tz)
+    hour, minute = map(int, run_at_local.split(":")[:2])
 
-    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-    if next_run <= now:
-        next_run += timedelta(days=1)
+    day = local_now.date()
+    if market and not is_trading_day(market, day):
+        day = get_next_trading_day(market, day) or day
+    next_run = tz.localize(datetime(day.year, day.month, day.day, hour, minute))
+    if next_run <= local_now:
+        day = (get_next_trading_day(market, day) if market else None) or day + timedelta(days=1)
+        next_run = tz.localize(datetime(day.year, day.month, day.day, hour, minute))
 
     return next_run.astimezone(pytz.UTC).replace(tzinfo=None)
@@ -0,0 +1,56 @@
+import sys, json
+import numpy as np
+from typing import Dict
+
+# fitted isotonic calibrator reduced to its breakpoints and evaluated with np.interp
+class IsotonicTable:
+    def __init__(self, x, y, x_min: float, x_max: float, out_of_bounds: str = "clip"):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.x_min = float(x_min)
+        self.x_max = float(x_max)
+        self.out_of_bounds = out_of_bounds
+
+    @classmethod
+    def from_isotonic(cls, iso) -> "IsotonicTable":
+        return cls(iso.X_thresholds_, iso.y_thresholds_, iso.X_min_, iso.X_max_, iso.out_of_bounds)
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "IsotonicTable":
+        return cls(d["x"], d["y"], d["x_min"], d["x_max"], d.get("out_of_bounds", "clip"))
+
+    def to_dict(self) -> Dict:
+        return {"x": self.x.tolist(), "y": self.y.tolist(), "x_min": self.x_min, "x_max": self.x_max,
+                "out_of_bounds": self.out_of_bounds}
+
+    def _interp(self, p: np.ndarray, x: np.ndarray, lo: float, hi: float) -> np.ndarray:
+        # np.interp holds the end values outside the breakpoints, which is exactly out_of_bounds="clip"
+        out = np.interp(p, x, self.y)
+        if self.out_of_bounds != "clip":
+            outside = (p < lo) | (p > hi)
+            if outside.any():
+                if self.out_of_bounds == "raise":
+                    raise ValueError("Calibrator input is outside the fitted range")
+                out[outside] = np.nan
+        return out
+
+    def transform(self, p) -> np.ndarray:
+        return self._interp(np.asarray(p, dtype=np.float64), self.x, self.x_min, self.x_max)
+
+    def transform_norm01(self, raw: np.ndarray) -> np.ndarray:
+        # transform(norm01(raw)) with the min-max scaling moved onto the breakpoints instead of every score
+        lo, hi = float(np.min(raw)), float(np.max(raw))
+        if hi <= lo:
+            return self.transform(np.zeros(len(raw)))
+        scale = hi - lo + 1e-12
+        return self._interp(raw, self.x * scale + lo, self.x_min * scale + lo, self.x_max * scale + lo)
+
+def compile_calibrator(calib):
+    if calib is None or isinstance(calib, IsotonicTable) or not hasattr(calib, "X_thresholds_"):
+        return calib
+    return IsotonicTable.from_isotonic(calib)
+
+if __name__ == "__main__" and len(sys.argv) >= 2:
+    # python calibration.py isotonic_calibrator.pkl > isotonic_calibrator.json
+    import joblib
+    json.dump(compile_calibrator(joblib.load(sys.argv[1])).to_dict(), sys.stdout)
@@ -3,6 +3,7 @@ from datetime import date, datetime
 from typing import Dict, List, Optional, Any
 from supabase import create_client, Client
 import pandas as pd
+from telemetry import span
 
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
@@ -51,16 +52,26 @@ def get_dataset(dataset_id: str) -> Optional[pd.DataFrame]:
     if not supabase:
         return None
 
-    result = supabase.table("datasets").select("*").eq("id", dataset_id).maybeSingle().execute()
-    if not result.data:
+    with span("supabase_fetch"):
+        result = supabase.table("datasets").select("*").eq("id", dataset_id).maybe_single().execute()
+    # maybe_single() hands back no response at all when the id is unknown
+    if result is None or not result.data:
         return None
 
-    data = result.data["data"]
-    df = pd.DataFrame(data)
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    with span("dataset_decode"):
+        data = result.data["data"]
+        df = pd.DataFrame(data)
+        if "Date" in df.columns:
+            df["Date"] = pd.to_datetime(df["Date"]).dt.date
     return df
 
+def get_dataset_notes(dataset_id: str) -> Optional[Dict]:
+    if not supabase:
+        return None
+
+    result = supabase.table("datasets").select("id, validation_status, validation_notes").eq("id", dataset_id).maybe_single().execute()
+    return result.data if result is not None else None
+
 def get_latest_dataset(market: str = "ID", source_type: Optional[str] = None) -> Optional[tuple]:
     if not supabase:
         return None
@@ -74,18 +85,57 @@ def get_latest_dataset(market: str = "ID", source_type: Optional[str] = None) ->
     if source_type:
         query = query.eq("source_type", source_type)
 
-    result = query.execute()
+    with span("supabase_fetch"):
+        result = query.execute()
 
     if not result.data:
         return None
 
     dataset = result.data[0]
-    df = pd.DataFrame(dataset["data"])
-    if "Date" in df.columns:
-        df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    with span("dataset_decode"):
+        df = pd.DataFrame(dataset["data"])
+        if "Date" in df.columns:
+            df["Date"] = pd.to_datetime(df["Date"]).dt.date
 
     return dataset["id"], df, dataset
 
+def get_latest_dataset_info(market: str = "ID", source_type: Optional[str] = None) -> Optional[Dict]:
+    if not supabase:
+        return None
+
+    query = supabase.table("datasets")\
+        .select("id, source_type, source_name, asof_date, row_count, created_at")\
+        .eq("market", market)\
+        .order("created_at", desc=True)\
+        .limit(1)
+
+    if source_type:
+        query = query.eq("source_type", source_type)
+
+    with span("dataset_info"):
+        result = query.execute()
+    return result.data[0] if result.data else None
+
+def get_dataset_index(market: str, since: Optional[date] = None) -> List[Dict]:
+    if not supabase:
+        return []
+
+    rows, page, start = [], 1000, 0
+    while True:
+        query = supabase.table("datasets")\
+            .select("id, asof_date, created_at")\
+            .eq("market", market)\
+            .neq("validation_status", "error")
+        if since:
+            query = query.gte("asof_date", since.isoformat())
+        result = query.order("asof_date").order("created_at").range(start, start + page - 1).execute()
+        rows.extend(result.data)
+        if len(result.data) < page:
+            break
+        start += page
+
+    return rows
+
 def get_datasets_by_date(market: str, asof_date: date) -> List[Dict]:
     if not supabase:
         return []
@@ -121,12 +171,23 @@ def create_alert_schedule(
         "liq": float(liq),
         "exclude_pemantauan": exclude_pemantauan,
         "channels": channels,
-        "next_run": calculate_next_run(run_at_local, timezone).isoformat()
+        "next_run": calculate_next_run(run_at_local, timezone, market).isoformat()
     }
 
     result = supabase.table("alert_schedules").insert(schedule).execute()
     return result.data[0]["id"]
 
+def get_active_alert_schedules() -> List[Dict]:
+    if not supabase:
+        return []
+
+    result = supabase.table("alert_schedules")\
+        .select("*")\
+        .eq("is_active", True)\
+        .execute()
+
+    return result.data
+
 def get_pending_alerts() -> List[Dict]:
     if not supabase:
         return []
@@ -0,0 +1,158 @@
+import os, sys, json, math
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+DRIFT_ALPHA = float(os.getenv("DRIFT_ALPHA", "0.02"))
+DRIFT_KS_THRESHOLD = float(os.getenv("DRIFT_KS_THRESHOLD", "0.2"))
+MIN_VALUE = 1e-9
+
+def _add(store: Dict[int, int], keys: np.ndarray):
+    if not len(keys):
+        return
+    # keys span a few hundred buckets at most, so a bincount beats sorting
+    lo = int(keys.min())
+    counts = np.bincount(keys - lo)
+    for i in np.flatnonzero(counts).tolist():
+        store[lo + i] = store.get(lo + i, 0) + int(counts[i])
+
+# mergeable log-bucketed quantile sketch (relative accuracy alpha) plus null count and Welford moments
+class FeatureSketch:
+    def __init__(self, alpha: float = DRIFT_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.pos: Dict[int, int] = {}
+        self.neg: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.nulls = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def _merge_moments(self, n: int, mean: float, m2: float):
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+
+    def update(self, values) -> "FeatureSketch":
+        v = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(v)
+        self.nulls += int(len(v) - finite.sum())
+        v = v[finite]
+        if not len(v):
+            return self
+        mean = float(v.mean())
+        self._merge_moments(len(v), mean, float(np.dot(v - mean, v - mean)))
+        # float32 is plenty for a bucket index and halves the memory traffic of the log pass
+        mag = np.abs(v).astype(np.float32)
+        nonzero = mag > MIN_VALUE
+        self.zeros += int(len(v) - nonzero.sum())
+        np.maximum(mag, MIN_VALUE, out=mag)
+        keys = np.log(mag, out=mag)
+        keys *= np.float32(1.0 / self.log_gamma)
+        keys = np.ceil(keys, out=keys).astype(np.int32)
+        negative = v < 0
+        _add(self.pos, keys[nonzero & ~negative])
+        _add(self.neg, keys[nonzero & negative])
+        return self
+
+    def merge(self, other: "FeatureSketch") -> "FeatureSketch":
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for src, dst in ((other.pos, self.pos), (other.neg, self.neg)):
+            for k, c in src.items():
+                dst[k] = dst.get(k, 0) + c
+        self.zeros += other.zeros
+        self.nulls += other.nulls
+        if other.count:
+            self._merge_moments(other.count, other.mean, other.m2)
+        return self
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def null_rate(self) -> float:
+        total = self.count + self.nulls
+        return self.nulls / total if total else 0.0
+
+    def _value(self, key: int) -> float:
+        return 2.0 * self.gamma ** key / (self.gamma + 1)
+
+    def buckets(self) -> tuple:
+        # bucket representatives in ascending value order with their counts
+        neg = sorted(self.neg.items(), key=lambda kv: -kv[0])
+        pos = sorted(self.pos.items())
+        values = [-self._value(k) for k, _ in neg] + ([0.0] if self.zeros else []) + [self._value(k) for k, _ in pos]
+        counts = [c for _, c in neg] + ([self.zeros] if self.zeros else []) + [c for _, c in pos]
+        return np.array(values, dtype=np.float64), np.array(counts, dtype=np.float64)
+
+    def quantile(self, q: float) -> Optional[float]:
+        values, counts = self.buckets()
+        if not counts.sum():
+            return None
+        i = int(np.searchsorted(np.cumsum(counts), q * (counts.sum() - 1), side="right"))
+        return float(values[min(i, len(values) - 1)])
+
+    def to_dict(self) -> Dict:
+        return {
+            "alpha": self.alpha, "count": self.count, "nulls": self.nulls, "mean": self.mean, "m2": self.m2,
+            "zeros": self.zeros, "pos": {str(k): c for k, c in self.pos.items()}, "neg": {str(k): c for k, c in self.neg.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "FeatureSketch":
+        s = cls(d.get("alpha", DRIFT_ALPHA))
+        s.count, s.nulls, s.mean, s.m2, s.zeros = d["count"], d["nulls"], d["mean"], d["m2"], d["zeros"]
+        s.pos = {int(k): c for k, c in d["pos"].items()}
+        s.neg = {int(k): c for k, c in d["neg"].items()}
+        return s
+
+def ks_distance(a: FeatureSketch, b: FeatureSketch) -> Optional[float]:
+    va, ca = a.buckets()
+    vb, cb = b.buckets()
+    if not ca.sum() or not cb.sum():
+        return None
+    # same alpha means both sketches share one bucket grid, so the CDFs line up exactly
+    grid = np.union1d(va, vb)
+    fa = np.zeros(len(grid)); fa[np.searchsorted(grid, va)] = ca
+    fb = np.zeros(len(grid)); fb[np.searchsorted(grid, vb)] = cb
+    return float(np.abs(np.cumsum(fa) / ca.sum() - np.cumsum(fb) / cb.sum()).max())
+
+def sketch_frame(df: pd.DataFrame, columns: List[str], alpha: float = DRIFT_ALPHA) -> Dict[str, FeatureSketch]:
+    return {c: FeatureSketch(alpha).update(pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64))
+            for c in columns if c in df.columns}
+
+def drift_scores(current: Dict[str, FeatureSketch], reference: Dict[str, FeatureSketch],
+                 threshold: float = DRIFT_KS_THRESHOLD) -> Dict:
+    features = {}
+    for name, cur in current.items():
+        ref = reference.get(name)
+        if ref is None:
+            continue
+        std = math.sqrt(ref.variance)
+        ks = ks_distance(cur, ref)
+        features[name] = {
+            "ks": round(ks, 4) if ks is not None else None,
+            "mean_shift": round(abs(cur.mean - ref.mean) / std, 4) if std > 0 and cur.count else None,
+            "null_rate": round(cur.null_rate, 4),
+            "ref_null_rate": round(ref.null_rate, 4),
+            "p50": cur.quantile(0.5),
+            "ref_p50": ref.quantile(0.5)
+        }
+    ks_values = [f["ks"] for f in features.values() if f["ks"] is not None]
+    return {
+        "features": features,
+        "max_ks": max(ks_values) if ks_values else None,
+        "drifted": sorted(n for n, f in features.items() if f["ks"] is not None and f["ks"] > threshold)
+    }
+
+if __name__ == "__main__" and len(sys.argv) >= 2:
+    # python drift.py training.csv [feature ...] > reference_sketch.json
+    frame = pd.read_parquet(sys.argv[1]) if sys.argv[1].endswith(".parquet") else pd.read_csv(sys.argv[1])
+    cols = sys.argv[2:] or [c for c in frame.columns if pd.api.types.is_numeric_dtype(frame[c])]
+    json.dump({k: v.to_dict() for k, v in sketch_frame(frame, cols).items()}, sys.stdout)
@@ -0,0 +1,219 @@
+import os, sys, json, time, socket, logging, threading, subprocess
+from typing import Callable, Optional
+
+EVENT_BUS = os.getenv("EVENT_BUS", "unix")
+EVENT_BUS_SOCKET = os.getenv("EVENT_BUS_SOCKET", "/tmp/ara_eventbus.sock")
+EVENT_BUS_CHANNEL = os.getenv("EVENT_BUS_CHANNEL", "ara:alerts")
+EVENT_BUS_MAX_PENDING = int(os.getenv("EVENT_BUS_MAX_PENDING", str(8 * 1024 * 1024)))
+EVENT_BUS_IDLE_SECONDS = float(os.getenv("EVENT_BUS_IDLE_SECONDS", "300"))
+HELLO = b"0\t\n"
+
+logger = logging.getLogger(__name__)
+
+Deliver = Callable[[Optional[int], str], None]
+
+class LocalBus:
+    def __init__(self, deliver: Deliver):
+        self.deliver = deliver
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, payload):
+        self.deliver(None, json.dumps(payload, default=str))
+
+class UnixSocketBus:
+    def __init__(self, deliver: Deliver, path: str = EVENT_BUS_SOCKET):
+        self.deliver = deliver
+        self.path = path
+        self.sock: Optional[socket.socket] = None
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.running = True
+        self._connect()
+        self.thread = threading.Thread(target=self._read_loop, name="eventbus-reader", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            if self.sock is not None:
+                try:
+                    self.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                self.sock.close()
+                self.sock = None
+
+    def _connect(self):
+        ensure_broker(self.path)
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(5.0)
+        s.connect(self.path)
+        # the broker greets only after registering us, so nothing published after start() is missed
+        if s.recv(len(HELLO), socket.MSG_WAITALL) != HELLO:
+            s.close()
+            raise OSError("Unexpected event bus greeting")
+        s.settimeout(None)
+        with self.lock:
+            self.sock = s
+
+    def publish(self, payload):
+        line = (json.dumps(payload, default=str) + "\n").encode()
+        with self.lock:
+            sock = self.sock
+            if sock is not None:
+                try:
+                    sock.sendall(line)
+                    return
+                except OSError as e:
+                    logger.warning(f"Event bus publish failed, delivering locally: {e}")
+        self.deliver(None, line[:-1].decode())
+
+    def _read_loop(self):
+        backoff = 0.1
+        while self.running:
+            sock = self.sock
+            if sock is None:
+                try:
+                    self._connect()
+                    backoff = 0.1
+                except OSError as e:
+                    logger.warning(f"Event bus reconnect failed: {e}")
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, 5.0)
+                continue
+            try:
+                f = sock.makefile("rb")
+                for raw in f:
+                    event_id, _, data = raw.rstrip(b"\n").partition(b"\t")
+                    self.deliver(int(event_id), data.decode())
+            except (OSError, ValueError) as e:
+                if self.running:
+                    logger.warning(f"Event bus connection lost: {e}")
+            with self.lock:
+                if self.sock is sock:
+                    self.sock = None
+            sock.close()
+
+class RedisBus:
+    def __init__(self, deliver: Deliver, url: str, channel: str = EVENT_BUS_CHANNEL):
+        import redis
+        self.deliver = deliver
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+        self.pubsub = None
+        self.thread = None
+
+    def start(self):
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.pubsub.subscribe(**{self.channel: self._on_message})
+        self.thread = self.pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def stop(self):
+        if self.thread is not None:
+            self.thread.stop()
+        if self.pubsub is not None:
+            self.pubsub.close()
+
+    def _on_message(self, message):
+        event_id, _, data = message["data"].partition(b"\t")
+        self.deliver(int(event_id), data.decode())
+
+    def publish(self, payload):
+        event_id = self.client.incr(f"{self.channel}:seq")
+        self.client.publish(self.channel, f"{event_id}\t{json.dumps(payload, default=str)}")
+
+def create_bus(deliver: Deliver, url: str = EVENT_BUS):
+    if url.startswith(("redis://", "rediss://", "unix+redis://")):
+        return RedisBus(deliver, url.replace("unix+redis://", "unix://"))
+    if url == "unix":
+        return UnixSocketBus(deliver)
+    if url.startswith("unix:"):
+        return UnixSocketBus(deliver, url[len("unix:"):])
+    return LocalBus(deliver)
+
+def _can_connect(path: str) -> bool:
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        s.close()
+
+def ensure_broker(path: str = EVENT_BUS_SOCKET, timeout: float = 5.0) -> Optional[subprocess.Popen]:
+    # the broker this call spawned, or None when one was already listening
+    if _can_connect(path):
+        return None
+    import fcntl
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _can_connect(path):
+            return None
+        if os.path.exists(path):
+            os.unlink(path)
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--broker", path],
+                                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                start_new_session=True)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if _can_connect(path):
+                return proc
+            time.sleep(0.02)
+    proc.kill()
+    raise OSError(f"Event bus broker did not start on {path}")
+
+def run_broker(path: str):
+    import asyncio
+
+    async def main():
+        clients = set()
+        # seed ids from the clock so they keep increasing across broker restarts
+        seq = [int(time.time() * 1000)]
+
+        async def handle(reader, writer):
+            clients.add(writer)
+            writer.write(HELLO)
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    seq[0] += 1
+                    frame = b"%d\t" % seq[0] + line
+                    for w in list(clients):
+                        if w.transport.get_write_buffer_size() > EVENT_BUS_MAX_PENDING:
+                            clients.discard(w)
+                            w.close()
+                            continue
+                        w.write(frame)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                pass
+            finally:
+                clients.discard(writer)
+                writer.close()
+
+        server = await asyncio.start_unix_server(handle, path=path, limit=EVENT_BUS_MAX_PENDING)
+        idle_since = time.monotonic()
+        async with server:
+            while True:
+                await asyncio.sleep(1.0)
+                if clients:
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since > EVENT_BUS_IDLE_SECONDS:
+                    break
+        if os.path.exists(path):
+            os.unlink(path)
+
+    asyncio.run(main())
+
+if __name__ == "__main__" and len(sys.argv) == 3 and sys.argv[1] == "--broker":
+    run_broker(sys.argv[2])
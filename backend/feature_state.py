@@ -0,0 +1,150 @@
+import os, json, hashlib, threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+from features import compute_sorted, derive_latest, spec_lookback
+from shared_file import file_lock, load_npz, save_npz
+
+FEATURE_STATE_DIR = os.getenv("FEATURE_STATE_DIR", "/tmp/ara_feature_state")
+STATE_COLS = ["Open", "High", "Low", "Close", "Volume"]
+NO_DATE = np.iinfo(np.int64).min
+
+def spec_hash(spec: List[Dict]) -> str:
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+class RollingState:
+    def __init__(self, spec: List[Dict], market: str = "ID"):
+        self.spec = spec
+        self.market = market
+        self.length = spec_lookback(spec) + 1
+        self.tickers: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.buf = np.full((0, self.length, len(STATE_COLS)), np.nan)
+        self.head = np.zeros(0, dtype=np.int64)
+        self.last_date = np.zeros(0, dtype=np.int64)
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    @property
+    def asof(self):
+        if not len(self.last_date) or self.last_date.max() == NO_DATE:
+            return None
+        return pd.Timestamp(int(self.last_date.max()), unit="D").date()
+
+    def _intern(self, tickers: np.ndarray) -> np.ndarray:
+        new = [t for t in pd.unique(tickers) if t not in self.index]
+        if new:
+            for t in new:
+                self.index[t] = len(self.tickers)
+                self.tickers.append(t)
+            n = len(new)
+            self.buf = np.concatenate([self.buf, np.full((n, self.length, len(STATE_COLS)), np.nan)])
+            self.head = np.concatenate([self.head, np.zeros(n, dtype=np.int64)])
+            self.last_date = np.concatenate([self.last_date, np.full(n, NO_DATE, dtype=np.int64)])
+        return np.fromiter((self.index[t] for t in tickers), dtype=np.int64, count=len(tickers))
+
+    def _push(self, idx: np.ndarray, values: np.ndarray, day: int):
+        idx, first = np.unique(idx, return_index=True)
+        values = values[first]
+        fresh = self.last_date[idx] < day
+        idx, values = idx[fresh], values[fresh]
+        self.buf[idx, self.head[idx]] = values
+        self.head[idx] = (self.head[idx] + 1) % self.length
+        self.last_date[idx] = day
+
+    def update(self, df: pd.DataFrame) -> int:
+        days = pd.to_datetime(df["Date"]).to_numpy("datetime64[D]").astype(np.int64)
+        values = np.column_stack([pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64) for c in STATE_COLS])
+        with self.lock:
+            idx = self._intern(df["Ticker"].astype(str).to_numpy())
+            order = np.argsort(days, kind="stable")
+            d = days[order]
+            cuts = np.flatnonzero(np.r_[True, d[1:] != d[:-1]])
+            for lo, hi in zip(cuts, np.r_[cuts[1:], len(d)]):
+                if d[lo] == NO_DATE:
+                    continue
+                seg = order[lo:hi]
+                self._push(idx[seg], values[seg], int(d[lo]))
+            return len(cuts)
+
+    def window(self, rows: np.ndarray) -> np.ndarray:
+        slots = (self.head[rows, None] + np.arange(self.length)) % self.length
+        return self.buf[rows[:, None], slots]
+
+    def latest(self, asof=None) -> pd.DataFrame:
+        with self.lock:
+            if asof is None:
+                asof = self.asof
+            if asof is None:
+                return pd.DataFrame(columns=["Date", "Ticker"] + STATE_COLS + [f["name"] for f in self.spec])
+            day = int(np.datetime64(pd.Timestamp(asof).date(), "D").astype(np.int64))
+            rows = np.flatnonzero(self.last_date == day)
+            win = self.window(rows)
+        n, L = len(rows), self.length
+        cols = {c: win[:, :, j].ravel() for j, c in enumerate(STATE_COLS)}
+        pos = np.tile(np.arange(L), n)
+        feats = compute_sorted(cols, pos, self.spec)
+        last = np.arange(n) * L + L - 1
+        out = pd.DataFrame({"Date": [pd.Timestamp(asof).date()] * n, "Ticker": [self.tickers[i] for i in rows]})
+        for j, c in enumerate(STATE_COLS):
+            out[c] = win[:, -1, j]
+        for name, v in feats.items():
+            out[name] = v[last]
+        return out
+
+    def verify(self, history: pd.DataFrame, tol: float = 1e-6) -> Dict:
+        full = derive_latest(history, self.spec).set_index("Ticker")
+        inc = self.latest(full["Date"].iloc[0] if len(full) else None).set_index("Ticker")
+        common = full.index.intersection(inc.index)
+        diffs = {}
+        for f in self.spec:
+            a = full.loc[common, f["name"]].to_numpy(dtype=np.float64)
+            b = inc.loc[common, f["name"]].to_numpy(dtype=np.float64)
+            both = ~(np.isnan(a) | np.isnan(b))
+            scale = np.maximum(np.abs(a[both]), 1.0)
+            err = float(np.max(np.abs(a[both] - b[both]) / scale)) if both.any() else 0.0
+            diffs[f["name"]] = {"max_rel_diff": err, "nan_mismatch": int((np.isnan(a) != np.isnan(b)).sum())}
+        ok = len(common) == len(full) and all(d["max_rel_diff"] <= tol and d["nan_mismatch"] == 0 for d in diffs.values())
+        return {"ok": ok, "tickers": len(common), "missing_tickers": int(len(full) - len(common)), "features": diffs}
+
+    def path(self) -> str:
+        return os.path.join(FEATURE_STATE_DIR, f"{self.market}_{spec_hash(self.spec)}.npz")
+
+    def refresh(self):
+        with self.lock:
+            z, self.stamp = load_npz(self.path(), self.stamp)
+            if z is not None and z["buf"].shape[1] == self.length:
+                self.buf, self.head, self.last_date = z["buf"], z["head"], z["last_date"]
+                self.tickers = z["tickers"].tolist()
+                self.index = {t: i for i, t in enumerate(self.tickers)}
+
+    def save(self):
+        with self.lock:
+            self.stamp = save_npz(self.path(), buf=self.buf, head=self.head, last_date=self.last_date,
+                                  tickers=np.array(self.tickers, dtype=str))
+
+    def commit(self, df: pd.DataFrame):
+        with file_lock(self.path()):
+            self.refresh()
+            self.update(df)
+            self.save()
+
+    @classmethod
+    def load(cls, spec: List[Dict], market: str = "ID") -> "RollingState":
+        st = cls(spec, market)
+        st.refresh()
+        return st
+
+_states: Dict[str, RollingState] = {}
+_states_lock = threading.Lock()
+
+def get_state(spec: Optional[List[Dict]], market: str = "ID") -> Optional[RollingState]:
+    if not spec:
+        return None
+    with _states_lock:
+        key = f"{market}_{spec_hash(spec)}"
+        if key not in _states:
+            _states[key] = RollingState(spec, market)
+        state = _states[key]
+    state.refresh()
+    return state
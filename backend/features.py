@@ -0,0 +1,160 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, List, Optional
+
+RAW_COLS = ["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"]
+
+# op -> number of bars of history the op needs beyond the current one
+OPS = {
+    "value": lambda w: 0,
+    "lag": lambda w: w,
+    "ret": lambda w: w,
+    "logret": lambda w: w,
+    "sma": lambda w: w - 1,
+    "std": lambda w: w - 1,
+    "max": lambda w: w - 1,
+    "min": lambda w: w - 1,
+    "rel_sma": lambda w: w - 1,
+    "zscore": lambda w: w - 1,
+    "dist_max": lambda w: w - 1,
+    "dist_min": lambda w: w - 1,
+    "range": lambda w: w - 1,
+    "ret_std": lambda w: w,
+}
+
+def normalize_spec(spec) -> List[Dict]:
+    items = spec.get("features", []) if isinstance(spec, dict) else spec
+    out = []
+    for f in items:
+        op = f["op"]
+        if op not in OPS:
+            raise ValueError(f"Unknown feature op: {op}")
+        out.append({"name": f["name"], "op": op, "col": f.get("col", "Close"), "window": int(f.get("window", 1))})
+    return out
+
+def spec_lookback(spec: List[Dict]) -> int:
+    return max((OPS[f["op"]](f["window"]) for f in spec), default=0)
+
+def spec_columns(spec: List[Dict]) -> List[str]:
+    cols = set()
+    for f in spec:
+        cols.update(["High", "Low", "Close"] if f["op"] == "range" else [f["col"]])
+    return [c for c in RAW_COLS if c in cols]
+
+def scrape_period(spec: Optional[List[Dict]]) -> str:
+    # yfinance periods are calendar based; leave headroom for weekends and holidays
+    bars = spec_lookback(spec) + 1 if spec else 1
+    for period, cap in (("5d", 3), ("1mo", 15), ("3mo", 45), ("6mo", 100), ("1y", 200)):
+        if bars <= cap:
+            return period
+    return "2y"
+
+def group_layout(df: pd.DataFrame):
+    tcodes, _ = pd.factorize(df["Ticker"])
+    dcodes, _ = pd.factorize(df["Date"], sort=True)
+    order = np.lexsort((dcodes, tcodes))
+    t = tcodes[order]
+    first = np.r_[True, t[1:] != t[:-1]]
+    idx = np.arange(len(t))
+    return order, idx - np.maximum.accumulate(np.where(first, idx, 0))
+
+def _lag(x, n, pos):
+    out = np.full_like(x, np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    out[pos < n] = np.nan
+    return out
+
+def _window_sum(x, w, pos):
+    valid = ~np.isnan(x)
+    cs = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+    cnt = np.concatenate(([0], np.cumsum(valid)))
+    hi = np.arange(1, len(x) + 1)
+    lo = np.maximum(hi - w, 0)
+    s = cs[hi] - cs[lo]
+    s[(pos < w - 1) | (cnt[hi] - cnt[lo] < w)] = np.nan
+    return s
+
+def _centered(x, pos):
+    # variance is shift invariant; centring per ticker keeps the cumsum of squares well conditioned
+    valid = ~np.isnan(x)
+    g = np.cumsum(pos == 0) - 1
+    mean = np.bincount(g, np.where(valid, x, 0.0)) / np.maximum(np.bincount(g, valid), 1)
+    return x - mean[g]
+
+def window_mean(x, w, pos):
+    return _window_sum(x, w, pos) / w
+
+def _std(x, w, pos):
+    if w < 2:
+        return np.full_like(x, np.nan)
+    xc = _centered(x, pos)
+    s = _window_sum(xc, w, pos)
+    ss = _window_sum(xc * xc, w, pos)
+    var = np.maximum((ss - s * s / w) / (w - 1), 0.0)
+    return np.sqrt(var)
+
+def _extreme(x, w, pos, fn):
+    out = np.full_like(x, np.nan)
+    if w <= len(x):
+        out[w - 1:] = fn(sliding_window_view(x, w), axis=1)
+    out[pos < w - 1] = np.nan
+    return out
+
+def _feature(f, cols, pos):
+    op, w = f["op"], f["window"]
+    x = cols.get(f["col"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if op == "value":
+            return x
+        if op == "lag":
+            return _lag(x, w, pos)
+        if op == "ret":
+            return x / _lag(x, w, pos) - 1.0
+        if op == "logret":
+            return np.log(x / _lag(x, w, pos))
+        if op == "sma":
+            return window_mean(x, w, pos)
+        if op == "std":
+            return _std(x, w, pos)
+        if op == "max":
+            return _extreme(x, w, pos, np.max)
+        if op == "min":
+            return _extreme(x, w, pos, np.min)
+        if op == "rel_sma":
+            return x / window_mean(x, w, pos) - 1.0
+        if op == "zscore":
+            return (x - window_mean(x, w, pos)) / _std(x, w, pos)
+        if op == "dist_max":
+            return x / _extreme(x, w, pos, np.max) - 1.0
+        if op == "dist_min":
+            return x / _extreme(x, w, pos, np.min) - 1.0
+        if op == "range":
+            return window_mean((cols["High"] - cols["Low"]) / cols["Close"], w, pos)
+        if op == "ret_std":
+            return _std(x / _lag(x, 1, pos) - 1.0, w, pos)
+
+def compute_sorted(cols: Dict[str, np.ndarray], pos: np.ndarray, spec: List[Dict]) -> Dict[str, np.ndarray]:
+    return {f["name"]: _feature(f, cols, pos) for f in spec}
+
+def compute_features(df: pd.DataFrame, spec: List[Dict]) -> pd.DataFrame:
+    order, pos = group_layout(df)
+    cols = {c: pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64)[order] for c in spec_columns(spec)}
+    feats = compute_sorted(cols, pos, spec)
+    inv = np.empty_like(order)
+    inv[order] = np.arange(len(order))
+    return pd.DataFrame({name: v[inv] for name, v in feats.items()}, index=df.index)
+
+def can_derive(df: pd.DataFrame, spec: Optional[List[Dict]], missing: List[str]) -> bool:
+    if not spec or any(c not in df.columns for c in RAW_COLS):
+        return False
+    names = {f["name"] for f in spec}
+    return all(m in names for m in missing)
+
+def derive_latest(df: pd.DataFrame, spec: List[Dict]) -> pd.DataFrame:
+    feats = compute_features(df, spec)
+    drop = [c for c in feats.columns if c in df.columns]
+    out = pd.concat([df.drop(columns=drop), feats], axis=1)
+    last = pd.to_datetime(out["Date"]) == pd.to_datetime(out["Date"]).max()
+    return out[last].reset_index(drop=True)
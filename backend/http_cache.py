@@ -0,0 +1,120 @@
+import os, json, zlib, hashlib
+from typing import Optional
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+SCORE_CACHE_CONTROL = "private, no-cache"
+STATIC_CACHE_CONTROL = "public, max-age=300"
+ENCODING_SUFFIXES = ("-br", "-gz")
+UNCOMPRESSED_TYPES = ("text/event-stream", "application/vnd.apache.arrow.stream", "image/", "application/zip")
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha1(json.dumps(parts, default=str, sort_keys=True).encode()).hexdigest()[:24] + '"'
+
+def _strip(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_strip(t) == etag for t in if_none_match.split(","))
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def tag(response: Response, etag: str, cache_control: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self.c = brotli.Compressor(quality=4)
+        else:
+            self.c = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            out = self.c.process(data)
+            return out + (self.c.finish() if last else self.c.flush())
+        out = self.c.compress(data)
+        return out + self.c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+def _pick_encoding(accept: str) -> Optional[str]:
+    offered = {p.split(";")[0].strip().lower(): ";q=0" not in p.replace(" ", "") for p in accept.split(",")}
+    if brotli is not None and offered.get("br"):
+        return "br"
+    if offered.get("gzip"):
+        return "gzip"
+    return None
+
+def _vary(headers: list) -> list:
+    # shared caches must key every compressible response on Accept-Encoding, identity bodies included
+    current = [v.decode() for k, v in headers if k.lower() == b"vary"]
+    if any("accept-encoding" in v.lower() or v.strip() == "*" for v in current):
+        return headers
+    rest = [(k, v) for k, v in headers if k.lower() != b"vary"]
+    return rest + [(b"vary", ", ".join(current + ["Accept-Encoding"]).encode())]
+
+# gzip/brotli for large or streamed bodies; event streams and already-compact binaries pass through
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict((k.decode().lower(), v.decode()) for k, v in scope.get("headers", []))
+        encoding = _pick_encoding(headers.get("accept-encoding", ""))
+
+        state = {"start": None, "encoder": None, "passthrough": False}
+
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                resp_headers = dict((k.decode().lower(), v.decode()) for k, v in start["headers"])
+                ctype = resp_headers.get("content-type", "")
+                compressible = "content-encoding" not in resp_headers and not ctype.startswith(UNCOMPRESSED_TYPES)
+                if (encoding is None or not compressible or start["status"] in (204, 304)
+                        or (not more and len(body) < self.minimum_size)):
+                    state["passthrough"] = True
+                    await send({**start, "headers": _vary(start["headers"])} if compressible else start)
+                    return await send(message)
+                state["encoder"] = _Encoder(encoding)
+                raw = [(k, v) for k, v in _vary(start["headers"]) if k.lower() not in (b"content-length", b"etag")]
+                raw.append((b"content-encoding", encoding.encode()))
+                if "etag" in resp_headers:
+                    suffix = "-br" if encoding == "br" else "-gz"
+                    raw.append((b"etag", (resp_headers["etag"][:-1] + suffix + '"').encode()))
+                out = state["encoder"].chunk(body, not more)
+                if not more:
+                    raw.append((b"content-length", str(len(out)).encode()))
+                await send({**start, "headers": raw})
+                return await send({"type": "http.response.body", "body": out, "more_body": more})
+            await send({"type": "http.response.body", "body": state["encoder"].chunk(body, not more), "more_body": more})
+
+        await self.app(scope, receive, wrapped)
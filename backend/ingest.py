@@ -1,20 +1,61 @@
-import io, os, re, json
+import io, os, re, json, time, shutil, importlib, importlib.util
 import pandas as pd
 import numpy as np
 from datetime import datetime, date
 import pytz
-from typing import Dict, List, Tuple, Any
-import pdfplumber
-from PIL import Image
-import pytesseract
-from docx import Document
-from faster_whisper import WhisperModel
-import yfinance as yf
+from typing import Callable, Dict, List, Tuple, Any, Optional
+from validation import run_checks
+from telemetry import timed
 
 REQUIRED_COLS = ["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"]
 OPTIONAL_COLS = ["AdjClose", "Papan", "limit_price_t", "limit_pct_t"]
 MAX_FILE_SIZE = 50 * 1024 * 1024
 
+# parser for one source type; the modules it needs are imported on its first call, not at startup
+class Ingestor:
+    def __init__(self, source: str, fn: Callable, modules: Tuple[str, ...] = (), binaries: Tuple[str, ...] = ()):
+        self.source = source
+        self.fn = fn
+        self.modules = modules
+        self.binaries = binaries
+        self.import_seconds: Optional[float] = None
+        self.__name__ = fn.__name__
+        self.__doc__ = fn.__doc__
+
+    def missing(self) -> List[str]:
+        # find_spec locates a package without executing it
+        return [m for m in self.modules if importlib.util.find_spec(m) is None] + \
+               [b for b in self.binaries if shutil.which(b) is None]
+
+    def available(self) -> bool:
+        return not self.missing()
+
+    def load(self):
+        if self.import_seconds is None:
+            start = time.perf_counter()
+            for m in self.modules:
+                importlib.import_module(m)
+            self.import_seconds = time.perf_counter() - start
+
+    def __call__(self, *args, **kwargs):
+        self.load()
+        return self.fn(*args, **kwargs)
+
+INGESTORS: Dict[str, Ingestor] = {}
+
+def ingestor(source: str, modules: Tuple[str, ...] = (), binaries: Tuple[str, ...] = ()):
+    def wrap(fn):
+        INGESTORS[source] = Ingestor(source, fn, modules, binaries)
+        return INGESTORS[source]
+    return wrap
+
+def ingestor_status() -> Dict[str, Dict]:
+    status = {}
+    for name, ing in INGESTORS.items():
+        missing = ing.missing()
+        status[name] = {"available": not missing, "missing": missing, "import_seconds": ing.import_seconds}
+    return status
+
 def normalize_ticker(ticker: str, market: str = "ID") -> str:
     ticker = str(ticker).strip().upper()
     if market == "ID" and not ticker.endswith(".JK"):
@@ -29,7 +70,8 @@ def normalize_timezone(df: pd.DataFrame) -> pd.DataFrame:
         df["Date"] = df["Date"].dt.date
     return df
 
-def validate_dataset(df: pd.DataFrame) -> Tuple[str, Dict]:
+@timed("validate")
+def validate_dataset(df: pd.DataFrame, sample_rows: Optional[int] = None) -> Tuple[str, Dict]:
     notes = {"errors": [], "warnings": [], "info": []}
 
     if df.empty:
@@ -41,32 +83,42 @@ def validate_dataset(df: pd.DataFrame) -> Tuple[str, Dict]:
         notes["errors"].append(f"Missing required columns: {missing_required}")
         return "error", notes
 
-    null_counts = df[REQUIRED_COLS].isnull().sum()
-    for col, count in null_counts.items():
+    checks = run_checks(df, sample_rows)
+    notes["checks"] = checks
+    rows = checks["checked_rows"]
+    scope = f" in a {rows}-row sample" if checks["sampled"] else ""
+
+    for col, count in checks["nulls"].items():
         if count > 0:
-            pct = (count / len(df)) * 100
+            pct = (count / rows) * 100
             if col in ["Date", "Ticker"]:
-                notes["errors"].append(f"{col} has {count} null values ({pct:.1f}%)")
+                notes["errors"].append(f"{col} has {count} null values ({pct:.1f}%){scope}")
             else:
-                notes["warnings"].append(f"{col} has {count} null values ({pct:.1f}%)")
+                notes["warnings"].append(f"{col} has {count} null values ({pct:.1f}%){scope}")
 
-    if "errors" in notes and notes["errors"]:
+    if notes["errors"]:
         return "error", notes
 
-    df_clean = df.dropna(subset=["Date", "Ticker"])
-    dupes = df_clean.duplicated(subset=["Date", "Ticker"], keep="first").sum()
-    if dupes > 0:
-        notes["warnings"].append(f"Found {dupes} duplicate (Date, Ticker) pairs - keeping first occurrence")
-
-    date_range = f"{df_clean['Date'].min()} to {df_clean['Date'].max()}"
-    ticker_count = df_clean["Ticker"].nunique()
-    notes["info"].append(f"Date range: {date_range}")
-    notes["info"].append(f"Unique tickers: {ticker_count}")
-    notes["info"].append(f"Total rows: {len(df_clean)}")
+    if checks["duplicates"] > 0:
+        notes["warnings"].append(f"Found {checks['duplicates']} duplicate (Date, Ticker) pairs{scope} - keeping first occurrence")
+    if checks["high_lt_low"] > 0:
+        notes["warnings"].append(f"Found {checks['high_lt_low']} rows with High < Low{scope}")
+    if checks["close_out_of_band"] > 0:
+        notes["warnings"].append(f"Found {checks['close_out_of_band']} rows with Close outside [Low, High]{scope}")
+    if checks["negative_volume"] > 0:
+        notes["warnings"].append(f"Found {checks['negative_volume']} rows with negative Volume{scope}")
+    if checks["non_monotonic_dates"] > 0:
+        notes["warnings"].append(f"Found {checks['non_monotonic_dates']} out-of-order dates within tickers{scope}")
+
+    notes["info"].append(f"Date range: {checks['date_min']} to {checks['date_max']}")
+    notes["info"].append(f"Unique tickers: {checks['ticker_count']}")
+    notes["info"].append(f"Total rows: {checks['rows']}")
 
     status = "warning" if notes["warnings"] else "valid"
     return status, notes
 
+@ingestor("csv")
+@timed("ingest_csv")
 def ingest_csv(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
     df = pd.read_csv(io.BytesIO(file_bytes))
     df = normalize_timezone(df)
@@ -74,6 +126,8 @@ def ingest_csv(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "csv"
 
+@ingestor("excel", modules=("openpyxl",))
+@timed("ingest_excel")
 def ingest_excel(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
     df = pd.read_excel(io.BytesIO(file_bytes))
     df = normalize_timezone(df)
@@ -81,7 +135,10 @@ def ingest_excel(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, s
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "excel"
 
+@ingestor("pdf", modules=("pdfplumber",))
+@timed("ingest_pdf")
 def ingest_pdf(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
+    import pdfplumber
     tables = []
     with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
         for page in pdf.pages:
@@ -100,7 +157,11 @@ def ingest_pdf(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "pdf"
 
+@ingestor("image", modules=("PIL", "pytesseract"), binaries=("tesseract",))
+@timed("ingest_image")
 def ingest_image(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
+    from PIL import Image
+    import pytesseract
     image = Image.open(io.BytesIO(file_bytes))
     text = pytesseract.image_to_string(image)
 
@@ -124,7 +185,10 @@ def ingest_image(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, s
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "image"
 
+@ingestor("docx", modules=("docx",))
+@timed("ingest_docx")
 def ingest_docx(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
+    from docx import Document
     doc = Document(io.BytesIO(file_bytes))
     tables_data = []
 
@@ -146,6 +210,8 @@ def ingest_docx(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, st
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "docx"
 
+@ingestor("paste")
+@timed("ingest_paste")
 def ingest_paste(text: str, market: str = "ID") -> Tuple[pd.DataFrame, str]:
     delimiter = "\t" if "\t" in text else "," if "," in text else None
 
@@ -161,8 +227,11 @@ def ingest_paste(text: str, market: str = "ID") -> Tuple[pd.DataFrame, str]:
         df["Ticker"] = df["Ticker"].apply(lambda x: normalize_ticker(x, market))
     return df, "paste"
 
-def ingest_scrape(source: str, market: str = "ID", tickers: List[str] = None) -> Tuple[pd.DataFrame, str]:
+@ingestor("scrape", modules=("yfinance",))
+@timed("ingest_scrape")
+def ingest_scrape(source: str, market: str = "ID", tickers: List[str] = None, period: str = "5d") -> Tuple[pd.DataFrame, str]:
     if source.lower() == "yahoo":
+        import yfinance as yf
         if not tickers:
             raise ValueError("Tickers required for Yahoo scraping")
 
@@ -171,7 +240,7 @@ def ingest_scrape(source: str, market: str = "ID", tickers: List[str] = None) ->
             try:
                 normalized = normalize_ticker(ticker, market)
                 stock = yf.Ticker(normalized)
-                hist = stock.history(period="5d")
+                hist = stock.history(period=period)
                 if not hist.empty:
                     hist["Ticker"] = normalized
                     hist["Date"] = hist.index.date
@@ -189,7 +258,10 @@ def ingest_scrape(source: str, market: str = "ID", tickers: List[str] = None) ->
 
     raise ValueError(f"Unsupported scrape source: {source}")
 
+@ingestor("audio", modules=("faster_whisper",))
+@timed("ingest_audio")
 def ingest_audio(file_bytes: bytes, market: str = "ID") -> Tuple[pd.DataFrame, str]:
+    from faster_whisper import WhisperModel
     audio_path = f"/tmp/audio_{datetime.now().timestamp()}.wav"
     with open(audio_path, "wb") as f:
         f.write(file_bytes)
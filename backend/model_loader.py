@@ -1,36 +1,58 @@
-import os, io, json, zipfile, requests, joblib, xgboost as xgb
+import os, io, re, json, zipfile, requests, xgboost as xgb
+from features import normalize_spec
+from calibration import IsotonicTable, compile_calibrator
+from drift import FeatureSketch
 
 def _gh_headers(tok=None):
     h={"Accept":"application/vnd.github+json"}
     if tok: h["Authorization"]=f"token {tok}"
     return h
 
-def find_zip_url(repo, token=None, tag=None):
+def _tokens(name):
+    return set(re.split(r"[^a-z0-9]+", str(name).lower()))
+
+def _zip_asset(release, market=None, exclude=()):
+    zips = [a for a in release.get("assets", []) if a["name"].endswith(".zip")]
+    if market:
+        # a market bundle is named after the market (ara_model_bundle_us_*.zip) or lives under a market tag (us-v3)
+        m = market.lower()
+        if m not in _tokens(release.get("tag_name", "")):
+            zips = [a for a in zips if m in _tokens(a["name"][:-4])]
+    elif exclude:
+        # an unlabelled lookup must not pick up a bundle that belongs to another market
+        others = {e.lower() for e in exclude}
+        if others & _tokens(release.get("tag_name", "")):
+            return None
+        zips = [a for a in zips if not others & _tokens(a["name"][:-4])]
+    return zips[0]["browser_download_url"] if zips else None
+
+def find_zip_url(repo, token=None, tag=None, market=None, exclude=()):
+    where = f" untuk market {market}" if market else ""
     if tag:
         r = requests.get(f"https://api.github.com/repos/{repo}/releases/tags/{tag}",
                          headers=_gh_headers(token), timeout=60)
         if r.ok:
-            for a in r.json().get("assets", []):
-                if a["name"].endswith(".zip"):
-                    return a["browser_download_url"]
-        raise RuntimeError(f"Tidak ada .zip pada tag {tag}")
+            url = _zip_asset(r.json(), market, exclude)
+            if url:
+                return url
+        raise RuntimeError(f"Tidak ada .zip{where} pada tag {tag}")
     r = requests.get(f"https://api.github.com/repos/{repo}/releases/latest",
                      headers=_gh_headers(token), timeout=60)
     if r.ok:
-        for a in r.json().get("assets", []):
-            if a["name"].endswith(".zip"):
-                return a["browser_download_url"]
+        url = _zip_asset(r.json(), market, exclude)
+        if url:
+            return url
     r2 = requests.get(f"https://api.github.com/repos/{repo}/releases?per_page=20",
                       headers=_gh_headers(token), timeout=60)
     r2.raise_for_status()
     for rel in r2.json():
-        for a in rel.get("assets", []):
-            if a["name"].endswith(".zip"):
-                return a["browser_download_url"]
-    raise RuntimeError("Tidak ditemukan asset .zip pada releases.")
+        url = _zip_asset(rel, market, exclude)
+        if url:
+            return url
+    raise RuntimeError(f"Tidak ditemukan asset .zip{where} pada releases.")
 
-def download_bundle(repo, token=None, tag=None, direct_url=None):
-    url = direct_url or find_zip_url(repo, token=token, tag=tag)
+def download_bundle(repo, token=None, tag=None, direct_url=None, market=None, exclude=()):
+    url = direct_url or find_zip_url(repo, token=token, tag=tag, market=market, exclude=exclude)
     z = requests.get(url, headers=_gh_headers(token), timeout=120)
     z.raise_for_status()
     return z.content
@@ -47,10 +69,17 @@ def load_bundle_flex(bundle_bytes:bytes, extract_dir="/tmp/ara_bundle"):
         card = json.load(open(card_path, "r", encoding="utf-8"))
 
     calib = None
-    for cand in ("artifacts/isotonic_calibrator.pkl","isotonic_calibrator.pkl"):
+    for cand in ("artifacts/isotonic_calibrator.json","isotonic_calibrator.json"):
         p = os.path.join(extract_dir, cand)
         if os.path.exists(p):
-            calib = joblib.load(p)
+            calib = IsotonicTable.from_dict(json.load(open(p,"r",encoding="utf-8")))
+            break
+    for cand in ("artifacts/isotonic_calibrator.pkl","isotonic_calibrator.pkl"):
+        p = os.path.join(extract_dir, cand)
+        if calib is None and os.path.exists(p):
+            # older bundles only ship the pickle; unpickle once and keep its breakpoints
+            import joblib
+            calib = compile_calibrator(joblib.load(p))
             break
 
     model_files = [n for n in names if n.endswith(".json") and n.startswith("xgb_cls_seed")]
@@ -80,3 +109,17 @@ def load_bundle_flex(bundle_bytes:bytes, extract_dir="/tmp/ara_bundle"):
                 pass
 
     return extract_dir, card, calib, models, feat_from_bundle
+
+def load_feature_spec(extract_dir):
+    for cand in ("artifacts/feature_spec.json","feature_spec.json"):
+        p=os.path.join(extract_dir,cand)
+        if os.path.exists(p):
+            return normalize_spec(json.load(open(p,"r",encoding="utf-8")))
+    return None
+
+def load_reference_sketch(extract_dir):
+    for cand in ("artifacts/reference_sketch.json","reference_sketch.json"):
+        p=os.path.join(extract_dir,cand)
+        if os.path.exists(p):
+            return {k: FeatureSketch.from_dict(v) for k, v in json.load(open(p,"r",encoding="utf-8")).items()}
+    return None
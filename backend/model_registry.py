@@ -0,0 +1,128 @@
+import os, time, shutil, hashlib, logging, threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+from model_loader import load_bundle_flex, load_feature_spec, load_reference_sketch
+
+DEFAULT_MARKET = os.getenv("DEFAULT_MARKET", "ID")
+MARKETS = [m.strip().upper() for m in os.getenv("MARKETS", DEFAULT_MARKET).split(",") if m.strip()]
+BUNDLE_ROOT = os.getenv("BUNDLE_ROOT", "/tmp/ara_bundle")
+MODEL_REGISTRY_MAX_MB = float(os.getenv("MODEL_REGISTRY_MAX_MB", "1024"))
+MODEL_REGISTRY_RETRY_SECONDS = float(os.getenv("MODEL_REGISTRY_RETRY_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+# one market's ensemble and the artifacts that travel with it
+class ModelBundle:
+    def __init__(self, market: str, bundle_bytes: bytes, extract_dir: str):
+        self.market = market
+        self.extract_dir, self.card, self.calib, self.models, self.feature_cols = load_bundle_flex(bundle_bytes, extract_dir)
+        # inplace_predict on a bare array trusts column positions, so the booster's own order wins
+        names = self.models[0].feature_names if self.models else None
+        if names:
+            if self.feature_cols and set(self.feature_cols) != set(names):
+                raise ValueError(f"Bundle feature list does not match the booster: {sorted(set(self.feature_cols) ^ set(names))[:10]}")
+            if self.feature_cols != names:
+                logger.warning(f"{market} bundle feature list reordered to the booster's feature order")
+            self.feature_cols = list(names)
+        self.version = str(self.card.get("version", "unknown")) if self.card else "unknown"
+        self.digest = hashlib.sha1(bundle_bytes).hexdigest()[:16]
+        self.feature_spec = load_feature_spec(self.extract_dir)
+        self.reference_sketch = load_reference_sketch(self.extract_dir)
+        # serialized boosters track the in-memory tree arrays closely enough to budget residency
+        self.nbytes = sum(len(m.save_raw("ubj")) for m in self.models)
+        self.loaded_at = time.time()
+
+    def info(self) -> Dict:
+        return {"market": self.market, "version": self.version, "digest": self.digest,
+                "models": len(self.models), "mb": round(self.nbytes / 2**20, 2)}
+
+# per-market bundles loaded on first use; least recently used ones go once boosters exceed max_bytes
+class ModelRegistry:
+    def __init__(self, fetch: Callable[[str], bytes], max_bytes: float = MODEL_REGISTRY_MAX_MB * 2**20,
+                 pinned=(DEFAULT_MARKET,), root: str = BUNDLE_ROOT, retry_seconds: float = MODEL_REGISTRY_RETRY_SECONDS,
+                 clock: Callable[[], float] = time.monotonic, markets=MARKETS):
+        self.fetch = fetch
+        self.max_bytes = max_bytes
+        self.pinned = {m.upper() for m in pinned}
+        self.markets = self.pinned | {m.upper() for m in markets}
+        self.root = root
+        self.retry_seconds = retry_seconds
+        self.clock = clock
+        self.bundles: "OrderedDict[str, ModelBundle]" = OrderedDict()
+        self.loading: Dict[str, threading.Lock] = {}
+        self.failures: Dict[str, tuple] = {}
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def peek(self, market: str) -> Optional[ModelBundle]:
+        with self.lock:
+            return self.bundles.get(market.upper())
+
+    def get(self, market: str) -> ModelBundle:
+        market = market.upper()
+        # only configured markets reach the fetcher, the lock table and the extract path
+        if market not in self.markets:
+            raise LookupError(f"Unknown market {market}")
+        with self.lock:
+            bundle = self.bundles.get(market)
+            if bundle is not None:
+                self.bundles.move_to_end(market)
+                return bundle
+            load_lock = self.loading.setdefault(market, threading.Lock())
+
+        # one loader per market; other markets keep serving while it downloads
+        with load_lock:
+            with self.lock:
+                bundle = self.bundles.get(market)
+                if bundle is not None:
+                    self.bundles.move_to_end(market)
+                    return bundle
+                failed = self.failures.get(market)
+            if failed and self.clock() - failed[0] < self.retry_seconds:
+                raise LookupError(failed[1])
+            try:
+                bundle_bytes = self.fetch(market)
+                extract_dir = os.path.join(self.root, market)
+                shutil.rmtree(extract_dir, ignore_errors=True)
+                bundle = ModelBundle(market, bundle_bytes, extract_dir)
+            except Exception as e:
+                message = f"No model bundle for market {market}: {e}"
+                with self.lock:
+                    self.failures[market] = (self.clock(), message)
+                raise LookupError(message)
+            with self.lock:
+                self.failures.pop(market, None)
+                self.bundles[market] = bundle
+                self.loads += 1
+                self._evict()
+            logger.info(f"Loaded {market} bundle {bundle.version} ({bundle.nbytes / 2**20:.1f} MB)")
+            return bundle
+
+    def _evict(self):
+        total = sum(b.nbytes for b in self.bundles.values())
+        newest = next(reversed(self.bundles))
+        for market in list(self.bundles):
+            if total <= self.max_bytes:
+                break
+            if market in self.pinned or market == newest:
+                continue
+            # requests already holding the bundle finish with it; only the registry lets go
+            total -= self.bundles.pop(market).nbytes
+            self.evictions += 1
+            logger.info(f"Evicted {market} bundle to stay under {self.max_bytes / 2**20:.0f} MB")
+
+    def resident(self) -> List[Dict]:
+        with self.lock:
+            return [b.info() for b in self.bundles.values()]
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                "resident": len(self.bundles),
+                "resident_mb": round(sum(b.nbytes for b in self.bundles.values()) / 2**20, 2),
+                "max_mb": round(self.max_bytes / 2**20, 2),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "failed": sorted(self.failures)
+            }
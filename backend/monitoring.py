@@ -0,0 +1,221 @@
+import os, hashlib, threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Callable, Dict, List, Optional
+from backtest import ara_hits
+from shared_file import file_lock, load_npz, save_npz
+
+MONITOR_DIR = os.getenv("MONITOR_DIR", "/tmp/ara_monitor")
+MONITOR_KS = [int(k) for k in os.getenv("MONITOR_KS", "10,20,50").split(",") if k.strip()]
+MONITOR_BINS = int(os.getenv("MONITOR_BINS", "10"))
+SCALARS = ["n", "positives", "ap_sum", "ap_days", "brier_sum"]
+
+def average_precision(proba: np.ndarray, labels: np.ndarray) -> Optional[float]:
+    y = labels[np.argsort(-proba, kind="stable")]
+    positives = int(y.sum())
+    if not positives:
+        return None
+    ranks = np.flatnonzero(y) + 1
+    return float((np.cumsum(y)[ranks - 1] / ranks).mean())
+
+# cumulative daily evaluation counters; any rolling window is a difference of two rows
+class LiveMonitor:
+    def __init__(self, market: str, model_version: str, ks: List[int] = None, bins: int = MONITOR_BINS):
+        self.market = market
+        self.model_version = model_version
+        self.ks = list(ks or MONITOR_KS)
+        self.bins = bins
+        self.n = 0
+        self._set(np.zeros(0, dtype=np.int64), np.zeros((1, len(SCALARS))), np.zeros((1, len(self.ks))),
+                  np.zeros((1, len(self.ks))), np.zeros((1, 3, bins)))
+        self.pending: Optional[Dict] = None
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def _set(self, days, cum_scalar, cum_hits, cum_k, cum_bins, capacity: int = 16):
+        # rows live in preallocated buffers that double when full, so a new day copies only itself
+        self.n = len(days)
+        cap = max(capacity, self.n)
+        self._days = np.zeros(cap, dtype=np.int64)
+        self._days[:self.n] = days
+        self._cum = []
+        for a in (cum_scalar, cum_hits, cum_k, cum_bins):
+            buf = np.zeros((cap + 1,) + a.shape[1:])
+            buf[:self.n + 1] = a
+            self._cum.append(buf)
+
+    @property
+    def days(self) -> np.ndarray:
+        return self._days[:self.n]
+
+    @property
+    def cum_scalar(self) -> np.ndarray:
+        return self._cum[0][:self.n + 1]
+
+    @property
+    def cum_hits(self) -> np.ndarray:
+        return self._cum[1][:self.n + 1]
+
+    @property
+    def cum_k(self) -> np.ndarray:
+        return self._cum[2][:self.n + 1]
+
+    @property
+    def cum_bins(self) -> np.ndarray:
+        return self._cum[3][:self.n + 1]
+
+    def path(self) -> str:
+        version = hashlib.sha1(self.model_version.encode()).hexdigest()[:12]
+        return os.path.join(MONITOR_DIR, f"{self.market}_{version}.npz")
+
+    @property
+    def asof(self) -> Optional[date]:
+        return pd.Timestamp(int(self.days[-1]), unit="D").date() if len(self.days) else None
+
+    def snapshot(self, asof: date, tickers, proba, close):
+        day = np.datetime64(asof, "D").astype(np.int64)
+        with self.lock:
+            # the newest labelled day is exactly the day whose scores get labelled next
+            if len(self.days) and day < self.days[-1]:
+                return
+            if self.pending is not None and day < self.pending["day"]:
+                return
+            self.pending = {
+                "day": day,
+                "tickers": np.asarray(tickers).astype(str),
+                "proba": np.asarray(proba, dtype=np.float64),
+                "close": np.asarray(close, dtype=np.float64)
+            }
+
+    def label(self, df: pd.DataFrame, next_trading_day: Callable[[date], Optional[date]]) -> Optional[date]:
+        with self.lock:
+            pending = self.pending
+        if pending is None:
+            return None
+        expected = next_trading_day(pd.Timestamp(int(pending["day"]), unit="D").date())
+        if expected is None:
+            return None
+        rows = df[pd.to_datetime(df["Date"]).dt.date == expected]
+        if rows.empty:
+            return None
+
+        idx = pd.Index(rows["Ticker"].astype(str)).get_indexer(pending["tickers"].astype(str))
+        seen = idx >= 0
+        close = pd.to_numeric(rows["Close"], errors="coerce").to_numpy(dtype=np.float64)
+        proba, prev = pending["proba"][seen], pending["close"][seen]
+        y = ara_hits(prev, close[idx[seen]]).astype(np.float64)
+        self._append(np.datetime64(expected, "D").astype(np.int64), proba, y)
+        with self.lock:
+            if self.pending is pending:
+                self.pending = None
+        return expected
+
+    def _append(self, day: int, proba: np.ndarray, y: np.ndarray):
+        order = np.argsort(-proba, kind="stable")
+        ys = y[order]
+        hits = np.array([ys[:k].sum() for k in self.ks])
+        k_eff = np.minimum(self.ks, len(ys)).astype(np.float64)
+        ap = average_precision(proba, y)
+        scalar = np.array([len(y), y.sum(), ap or 0.0, float(ap is not None), ((proba - y) ** 2).sum()])
+        b = np.clip((proba * self.bins).astype(np.int64), 0, self.bins - 1)
+        bins = np.vstack([
+            np.bincount(b, minlength=self.bins),
+            np.bincount(b, weights=proba, minlength=self.bins),
+            np.bincount(b, weights=y, minlength=self.bins)
+        ])
+        with self.lock:
+            n = self.n
+            if n and day <= self._days[n - 1]:
+                return
+            if n == len(self._days):
+                self._set(self.days, self.cum_scalar, self.cum_hits, self.cum_k, self.cum_bins, 2 * n)
+            self._days[n] = day
+            for buf, row in zip(self._cum, (scalar, hits, k_eff, bins)):
+                buf[n + 1] = buf[n] + row
+            self.n = n + 1
+
+    def window(self, days: int) -> Dict:
+        with self.lock:
+            n = len(self.days)
+            lo = max(n - days, 0)
+            s = dict(zip(SCALARS, self.cum_scalar[n] - self.cum_scalar[lo]))
+            hits = self.cum_hits[n] - self.cum_hits[lo]
+            k_eff = self.cum_k[n] - self.cum_k[lo]
+            count, sum_p, sum_y = self.cum_bins[n] - self.cum_bins[lo]
+        filled = count > 0
+        mean_p = np.divide(sum_p, count, out=np.zeros_like(sum_p), where=filled)
+        rate = np.divide(sum_y, count, out=np.zeros_like(sum_y), where=filled)
+        total = count.sum()
+        return {
+            "days": n - lo,
+            "rows": int(s["n"]),
+            "positives": int(s["positives"]),
+            "base_rate": float(s["positives"] / s["n"]) if s["n"] else None,
+            "precision_at_k": {str(k): (float(h / e) if e else None) for k, h, e in zip(self.ks, hits, k_eff)},
+            "average_precision": float(s["ap_sum"] / s["ap_days"]) if s["ap_days"] else None,
+            "brier": float(s["brier_sum"] / s["n"]) if s["n"] else None,
+            "ece": float((count * np.abs(mean_p - rate)).sum() / total) if total else None,
+            "calibration": [
+                {"bin": i, "count": int(count[i]), "mean_proba": float(mean_p[i]), "hit_rate": float(rate[i])}
+                for i in np.flatnonzero(filled)
+            ]
+        }
+
+    def summary(self, windows: List[int]) -> Dict:
+        pending = self.pending
+        return {
+            "market": self.market,
+            "model_version": self.model_version,
+            "asof": self.asof.isoformat() if self.asof else None,
+            "pending": pd.Timestamp(int(pending["day"]), unit="D").date().isoformat() if pending else None,
+            "windows": {str(w): self.window(w) for w in windows}
+        }
+
+    def save(self):
+        with self.lock:
+            p = self.pending or {}
+            self.stamp = save_npz(self.path(), days=self.days, cum_scalar=self.cum_scalar, cum_hits=self.cum_hits,
+                                  cum_k=self.cum_k, cum_bins=self.cum_bins, ks=np.array(self.ks),
+                                  pending_day=np.array([p.get("day", -1)]),
+                                  pending_tickers=p.get("tickers", np.array([], dtype=str)),
+                                  pending_proba=p.get("proba", np.array([])),
+                                  pending_close=p.get("close", np.array([])))
+
+    def refresh(self):
+        with self.lock:
+            z, self.stamp = load_npz(self.path(), self.stamp)
+            # a file kept with other ks or bins leaves this monitor's own counters in place
+            if z is None or z["ks"].tolist() != self.ks or z["cum_bins"].shape[2] != self.bins:
+                return
+            self._set(z["days"], z["cum_scalar"], z["cum_hits"], z["cum_k"], z["cum_bins"], 2 * len(z["days"]))
+            self.pending = None
+            if z["pending_day"][0] >= 0:
+                self.pending = {"day": int(z["pending_day"][0]), "tickers": z["pending_tickers"],
+                                "proba": z["pending_proba"], "close": z["pending_close"]}
+
+    @contextmanager
+    def exclusive(self):
+        with file_lock(self.path()):
+            self.refresh()
+            yield self
+            self.save()
+
+    @classmethod
+    def load(cls, market: str, model_version: str) -> "LiveMonitor":
+        mon = cls(market, model_version)
+        mon.refresh()
+        return mon
+
+_monitors: Dict[str, LiveMonitor] = {}
+_monitors_lock = threading.Lock()
+
+def get_monitor(market: str, model_version: str) -> LiveMonitor:
+    with _monitors_lock:
+        key = f"{market}_{model_version}"
+        if key not in _monitors:
+            _monitors[key] = LiveMonitor(market, model_version)
+        monitor = _monitors[key]
+    monitor.refresh()
+    return monitor
@@ -0,0 +1,152 @@
+import os, sys, time, hmac, uuid, asyncio, threading
+from collections import Counter
+from typing import Optional
+from urllib.parse import parse_qs
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/ara_profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "__profile"
+
+# leaf frames of threads parked waiting for work; they say nothing about the request
+IDLE_LEAVES = {
+    ("threading.py", "wait"), ("selectors.py", "select"), ("queue.py", "get"),
+    ("thread.py", "_worker"), ("base_events.py", "_run_once")
+}
+
+# samples every thread's stack at a fixed interval and folds them into collapsed stacks
+class Sampler:
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def _sample(self, me: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for tid, frame in sys._current_frames().items():
+            if tid == me:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(tid, str(tid)))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            self._sample(me)
+
+    def start(self) -> "Sampler":
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> "Sampler":
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def save(self, name: str) -> str:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{name}.collapsed")
+        with open(path, "w") as f:
+            f.write(self.collapsed())
+        prune(PROFILE_KEEP, path)
+        return path
+
+def prune(keep: int, newest: str):
+    # oldest profiles go first once the directory holds more than keep; the one just written always stays
+    entries = []
+    for e in os.scandir(PROFILE_DIR):
+        if e.name.endswith(".collapsed") and e.path != newest:
+            try:
+                entries.append((e.stat().st_mtime_ns, e.path))
+            except FileNotFoundError:
+                pass
+    for _, path in sorted(entries)[:max(len(entries) + 1 - keep, 0)]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+def authorized(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not profile_id or os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+    return path if os.path.exists(path) else None
+
+def _requested_token(scope) -> Optional[str]:
+    for k, v in scope.get("headers", []):
+        if k == PROFILE_HEADER:
+            return v.decode()
+    qs = scope.get("query_string", b"")
+    if PROFILE_QUERY.encode() in qs:
+        return parse_qs(qs.decode()).get(PROFILE_QUERY, [None])[0]
+    return None
+
+# profiles the process while a request carrying X-Profile: <token> or ?__profile=<token> runs;
+# every thread is sampled, so concurrent requests show up too and X-Profile-Scope says so
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_TOKEN:
+            return await self.app(scope, receive, send)
+        token = _requested_token(scope)
+        if token is None:
+            return await self.app(scope, receive, send)
+        if not authorized(token):
+            await send({"type": "http.response.start", "status": 403, "headers": [(b"content-type", b"text/plain")]})
+            return await send({"type": "http.response.body", "body": b"Invalid profile token"})
+
+        path = scope["path"].strip("/").replace("/", "_") or "root"
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{path}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+        sampler = Sampler().start()
+
+        async def finish():
+            # joining the sampler thread and writing the file stay off the event loop
+            if not sampler.stop_event.is_set():
+                sampler.stop_event.set()
+                await asyncio.to_thread(lambda: sampler.stop().save(profile_id))
+
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode()), (b"x-profile-scope", b"process")]}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                await finish()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, wrapped)
+        finally:
+            await finish()
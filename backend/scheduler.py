@@ -0,0 +1,191 @@
+import os, asyncio, heapq, itertools, logging, threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from calendar_utils import calculate_next_run
+from utils import screen
+from alerts import extract_alerts
+
+SCHEDULER_LOCK = os.getenv("SCHEDULER_LOCK", "/tmp/ara_scheduler.lock")
+SCHEDULER_RELOAD_SECONDS = float(os.getenv("SCHEDULER_RELOAD_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+def acquire_leader(path: str = SCHEDULER_LOCK):
+    import fcntl
+    f = open(path, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return f
+    except OSError:
+        f.close()
+        return None
+
+def utcnow() -> datetime:
+    return datetime.utcnow()
+
+def _parse_ts(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+class AlertScheduler:
+    def __init__(
+        self,
+        runner: Callable[[str], Tuple[str, pd.DataFrame]],
+        publish: Callable[[List[Dict], Dict], None],
+        load_schedules: Callable[[], List[Dict]] = lambda: [],
+        mark_run: Callable[[str, datetime], None] = lambda schedule_id, next_run: None,
+        clock: Callable[[], datetime] = utcnow,
+        threshold: float = 0.0,
+    ):
+        self.runner = runner
+        self.publish = publish
+        self.load_schedules = load_schedules
+        self.mark_run = mark_run
+        self.clock = clock
+        self.threshold = threshold
+        self.schedules: Dict[str, Dict] = {}
+        self.heap: List[Tuple[datetime, int, str]] = []
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wake: Optional[asyncio.Event] = None
+
+    def _next_run(self, schedule: Dict, now: datetime) -> datetime:
+        return calculate_next_run(str(schedule["run_at_local"]), schedule.get("timezone", "Asia/Jakarta"),
+                                  schedule.get("market", "ID"), now)
+
+    def add(self, schedule: Dict):
+        now = self.clock()
+        next_run = _parse_ts(schedule.get("next_run")) or self._next_run(schedule, now)
+        with self.lock:
+            schedule = {**schedule, "next_run": next_run}
+            self.schedules[schedule["id"]] = schedule
+            heapq.heappush(self.heap, (next_run, next(self.seq), schedule["id"]))
+        self._notify()
+
+    def reload(self) -> int:
+        # schedules created or deleted on other workers reach the leader through the table
+        rows = self.load_schedules()
+        ids = {row["id"] for row in rows}
+        for sid in [sid for sid in list(self.schedules) if sid not in ids]:
+            self.remove(sid)
+        for row in rows:
+            current = self.schedules.get(row["id"])
+            if current is None or _parse_ts(row.get("next_run")) not in (None, current["next_run"]):
+                self.add(row)
+        return len(rows)
+
+    def remove(self, schedule_id: str):
+        with self.lock:
+            self.schedules.pop(schedule_id, None)
+        self._notify()
+
+    def _notify(self):
+        if self.loop is not None and self.wake is not None:
+            self.loop.call_soon_threadsafe(self.wake.set)
+
+    def next_due(self) -> Optional[datetime]:
+        with self.lock:
+            while self.heap:
+                when, _, sid = self.heap[0]
+                s = self.schedules.get(sid)
+                if s is not None and s["next_run"] == when:
+                    return when
+                heapq.heappop(self.heap)
+        return None
+
+    def pop_due(self, now: datetime) -> List[Dict]:
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                when, _, sid = heapq.heappop(self.heap)
+                s = self.schedules.get(sid)
+                if s is not None and s["next_run"] == when:
+                    due.append(s)
+        return due
+
+    def run_pending(self) -> int:
+        now = self.clock()
+        due = self.pop_due(now)
+        if not due:
+            return 0
+
+        groups: Dict[str, List[Dict]] = {}
+        for s in due:
+            groups.setdefault(s.get("market", "ID"), []).append(s)
+
+        for market, members in groups.items():
+            try:
+                asof, scored = self.runner(market)
+            except Exception as e:
+                logger.error(f"Scheduled scoring for {market} failed: {e}")
+                asof, scored = None, None
+
+            # one scoring pass per market serves every schedule due in this tick, whatever its run time
+            for s in members:
+                if scored is not None:
+                    top = screen(scored, bool(s.get("exclude_pemantauan", True)), float(s.get("liq", 0.5))).head(int(s.get("k", 50)))
+                    alerts = extract_alerts(top, self.threshold, market=market, asof=asof, schedule_id=s["id"])
+                    try:
+                        self.publish(alerts, s)
+                    except Exception as e:
+                        logger.error(f"Publishing alerts for schedule {s['id']} failed: {e}")
+                self._reschedule(s, now)
+        return len(due)
+
+    def _reschedule(self, schedule: Dict, now: datetime):
+        next_run = self._next_run(schedule, now)
+        try:
+            self.mark_run(schedule["id"], next_run)
+        except Exception as e:
+            logger.warning(f"Failed to persist next run for {schedule['id']}: {e}")
+        with self.lock:
+            if schedule["id"] in self.schedules:
+                self.schedules[schedule["id"]]["next_run"] = next_run
+                heapq.heappush(self.heap, (next_run, next(self.seq), schedule["id"]))
+
+    async def wait(self, timeout: Optional[float]):
+        try:
+            await asyncio.wait_for(self.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def lead(self, lock_path: str = SCHEDULER_LOCK, reload_seconds: float = SCHEDULER_RELOAD_SECONDS):
+        # every worker runs this; only the flock holder fires schedules, the rest take over if it exits
+        lock = None
+        while lock is None:
+            lock = await asyncio.to_thread(acquire_leader, lock_path)
+            if lock is None:
+                await asyncio.sleep(reload_seconds)
+        runner = asyncio.create_task(self.run_forever())
+        try:
+            while True:
+                try:
+                    loaded = await asyncio.to_thread(self.reload)
+                    logger.debug(f"Scheduler holds {loaded} alert schedules")
+                except Exception as e:
+                    logger.warning(f"Failed to load alert schedules: {e}")
+                await asyncio.sleep(reload_seconds)
+        finally:
+            runner.cancel()
+            lock.close()
+
+    async def run_forever(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        while True:
+            self.wake.clear()
+            due = self.next_due()
+            now = self.clock()
+            if due is not None and due <= now:
+                await asyncio.to_thread(self.run_pending)
+                continue
+            await self.wait(None if due is None else (due - now).total_seconds())
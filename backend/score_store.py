@@ -0,0 +1,109 @@
+import os, io, json, hashlib, threading
+import numpy as np
+import pandas as pd
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from shared_file import file_lock, load_npz, replace_file
+
+SCORE_STORE_DIR = os.getenv("SCORE_STORE_DIR", "/tmp/ara_scores")
+
+# scores.f32 holds one float32 block per scored day, index.npz maps each day to its (offset, length)
+# and tickers.json lists tickers in index order; a rescored day appends a new block and repoints the index
+class ScoreStore:
+    def __init__(self, market: str, model_version: str, root: str = SCORE_STORE_DIR):
+        version = hashlib.sha1(model_version.encode()).hexdigest()[:12]
+        self.dir = os.path.join(root, f"{market}_{version}")
+        self.market = market
+        self.model_version = model_version
+        self.tickers: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.days = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self.mm: Optional[np.memmap] = None
+        self.stamp = None
+        self.lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def _refresh(self):
+        z, stamp = load_npz(self._path("index.npz"), self.stamp)
+        if z is None:
+            return
+        self.days, self.offsets, self.lengths = z["days"], z["offsets"], z["lengths"]
+        with open(self._path("tickers.json")) as f:
+            self.tickers = json.load(f)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        size = os.path.getsize(self._path("scores.f32")) // 4
+        self.mm = np.memmap(self._path("scores.f32"), dtype=np.float32, mode="r", shape=(size,)) if size else None
+        self.stamp = stamp
+
+    def _row(self, i: int) -> np.ndarray:
+        return self.mm[self.offsets[i]:self.offsets[i] + self.lengths[i]]
+
+    def write(self, asof: date, tickers, proba) -> bool:
+        day = np.datetime64(asof, "D").astype(np.int64)
+        tickers = np.asarray(tickers).astype(str)
+        proba = np.asarray(proba, dtype=np.float32)
+        with self.lock, file_lock(self._path("index.npz")):
+            self._refresh()
+            new = [t for t in pd.unique(tickers) if t not in self.index]
+            for t in new:
+                self.index[t] = len(self.tickers)
+                self.tickers.append(t)
+            idx = np.fromiter((self.index[t] for t in tickers), dtype=np.int64, count=len(tickers))
+            block = np.full(len(self.tickers), np.nan, dtype=np.float32)
+            block[idx] = proba
+
+            pos = int(np.searchsorted(self.days, day))
+            exists = pos < len(self.days) and self.days[pos] == day
+            if exists and self.mm is not None:
+                old = self._row(pos)
+                if len(old) == len(block) and np.array_equal(old, block, equal_nan=True):
+                    return False
+
+            path = self._path("scores.f32")
+            offset = os.path.getsize(path) // 4 if os.path.exists(path) else 0
+            with open(path, "ab") as f:
+                f.write(block.tobytes())
+            if exists:
+                self.offsets[pos], self.lengths[pos] = offset, len(block)
+            else:
+                self.days = np.insert(self.days, pos, day)
+                self.offsets = np.insert(self.offsets, pos, offset)
+                self.lengths = np.insert(self.lengths, pos, len(block))
+            if new:
+                replace_file(self._path("tickers.json"), json.dumps(self.tickers).encode())
+            b = io.BytesIO()
+            np.savez(b, days=self.days, offsets=self.offsets, lengths=self.lengths)
+            replace_file(self._path("index.npz"), b.getvalue())
+            self.stamp = None
+            self._refresh()
+        return True
+
+    def history(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None) -> Tuple[List[str], List[float]]:
+        with self.lock:
+            self._refresh()
+            i = self.index.get(ticker)
+            if i is None or self.mm is None:
+                return [], []
+            lo = 0 if start is None else int(np.searchsorted(self.days, np.datetime64(start, "D").astype(np.int64)))
+            hi = len(self.days) if end is None else int(np.searchsorted(self.days, np.datetime64(end, "D").astype(np.int64), side="right"))
+            days, offsets, lengths = self.days[lo:hi], self.offsets[lo:hi], self.lengths[lo:hi]
+            present = lengths > i
+            values = np.full(len(days), np.nan, dtype=np.float32)
+            values[present] = self.mm[offsets[present] + i]
+        keep = ~np.isnan(values)
+        dates = days[keep].astype("datetime64[D]").astype(str).tolist()
+        return dates, values[keep].astype(float).round(6).tolist()
+
+_stores: Dict[str, ScoreStore] = {}
+_stores_lock = threading.Lock()
+
+def get_store(market: str, model_version: str) -> ScoreStore:
+    with _stores_lock:
+        key = os.path.join(SCORE_STORE_DIR, f"{market}_{model_version}")
+        if key not in _stores:
+            _stores[key] = ScoreStore(market, model_version, SCORE_STORE_DIR)
+        return _stores[key]
@@ -0,0 +1,90 @@
+import os, json
+from importlib.util import find_spec
+from typing import Dict, Iterator, List, Optional, Union
+import pandas as pd
+from fastapi.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+IDENTITY_FIELDS = ["Date", "Ticker", "Nama", "Papan", "Close", "Volume"]
+SCORE_FIELDS = ["proba_ARA_t1", "vol_rank_day"]
+NDJSON_CHUNK = int(os.getenv("NDJSON_CHUNK", "500"))
+FORMATS = ("json", "ndjson", "csv", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_AVAILABLE = find_spec("pyarrow") is not None
+
+def select_fields(df: pd.DataFrame, fields: Optional[str], screen_cols: List[str] = ()) -> pd.DataFrame:
+    if fields == "*":
+        return df
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in df.columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown[:10]}")
+    else:
+        wanted = [c for c in IDENTITY_FIELDS + SCORE_FIELDS + list(screen_cols) if c in df.columns]
+    return df[list(dict.fromkeys(wanted))]
+
+def _default(obj):
+    # missing pandas values go out as null and anything else unknown as its str, with or without orjson
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    return str(obj)
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_nan_to_none(obj), default=_default).encode()
+
+def _nan_to_none(obj):
+    if isinstance(obj, float) and obj != obj:
+        return None
+    if isinstance(obj, dict):
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_nan_to_none(v) for v in obj]
+    return obj
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def records(rows: Union[pd.DataFrame, List[Dict]]) -> List[Dict]:
+    return rows.to_dict(orient="records") if isinstance(rows, pd.DataFrame) else rows
+
+def ndjson_lines(rows: Union[pd.DataFrame, List[Dict]], chunk: int = NDJSON_CHUNK) -> Iterator[bytes]:
+    for start in range(0, len(rows), chunk):
+        part = rows.iloc[start:start + chunk] if isinstance(rows, pd.DataFrame) else rows[start:start + chunk]
+        yield b"".join(dumps(r) + b"\n" for r in records(part))
+
+def arrow_bytes(df: pd.DataFrame) -> bytes:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("format=arrow requires the pyarrow package")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def _headers(meta: Dict) -> Dict[str, str]:
+    return {f"X-{k.replace('_', '-').title()}": str(v) for k, v in meta.items() if v is not None}
+
+def frame_response(rows: Union[pd.DataFrame, List[Dict]], fmt: str, meta: Dict) -> Response:
+    if fmt == "json":
+        return FastJSONResponse({**meta, "rows": records(rows)})
+    if fmt == "ndjson":
+        return StreamingResponse(ndjson_lines(rows), media_type="application/x-ndjson", headers=_headers(meta))
+    if not isinstance(rows, pd.DataFrame):
+        raise ValueError(f"format={fmt} cannot carry nested explanations")
+    if fmt == "csv":
+        return Response(rows.to_csv(index=False), media_type="text/csv", headers=_headers(meta))
+    if fmt == "arrow":
+        return Response(arrow_bytes(rows), media_type=ARROW_MEDIA_TYPE, headers=_headers(meta))
+    raise ValueError(f"Unknown format: {fmt}")
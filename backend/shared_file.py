@@ -0,0 +1,38 @@
+import os, io, fcntl
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+# state files shared by every worker on a host: writers serialise on <path>.lock and swap in a
+# whole new file, readers reload whenever the file's mtime differs from the one they last saw
+
+@contextmanager
+def file_lock(path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+def replace_file(path: str, data: bytes) -> int:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return os.stat(path).st_mtime_ns
+
+def save_npz(path: str, **arrays) -> int:
+    b = io.BytesIO()
+    np.savez(b, **arrays)
+    return replace_file(path, b.getvalue())
+
+def load_npz(path: str, stamp: Optional[int]) -> Tuple[Optional[Dict[str, np.ndarray]], Optional[int]]:
+    # (arrays, stamp) when the file changed since stamp, (None, stamp) when it did not or is missing
+    try:
+        current = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None, stamp
+    if current == stamp:
+        return None, stamp
+    with np.load(path, allow_pickle=False) as z:
+        return {k: z[k] for k in z.files}, current
@@ -1,6 +1,24 @@
 import pytest
+import tempfile
 from fastapi.testclient import TestClient
-from app import app
+from bench.synthetic import make_bundle
+from bench.bench_suite import load_app
+# the app fetches its bundle at import; build one here so the suite never reads a checked-in binary
+app = load_app(make_bundle(n_seeds=3, rounds=10, train_rows=2000), tempfile.mkdtemp(prefix="ara_test_")).app
+import pandas as pd
+import numpy as np
+from ingest import validate_dataset
+from features import normalize_spec, compute_features
+from feature_state import RollingState
+from utils import enrich_screen_features, screen
+from datetime import date
+from calendar_utils import CalendarIndex
+from datetime import datetime
+from scheduler import AlertScheduler
+import asyncio
+from alerts import AlertBroker, AlertDeduper, extract_alerts, package_alerts
+import time
+from eventbus import UnixSocketBus
 
 client = TestClient(app)
 
@@ -39,3 +57,720 @@ def test_equity():
     assert "dates" in data
     assert "equity" in data
     assert len(data["dates"]) == len(data["equity"])
+
+def test_validate_dataset_checks():
+    df = pd.DataFrame({
+        "Date": ["2025-01-03", "2025-01-02", "2025-01-03"],
+        "Ticker": ["BBCA.JK", "BBCA.JK", "BBCA.JK"],
+        "Open": [10, 10, 10], "High": [9, 12, 12], "Low": [10, 9, 9],
+        "Close": [10, 13, 10], "Volume": [100, -5, 100]
+    })
+    status, notes = validate_dataset(df)
+    checks = notes["checks"]
+    assert status == "warning"
+    assert checks["duplicates"] == 1
+    assert checks["non_monotonic_dates"] == 1
+    assert checks["high_lt_low"] == 1
+    assert checks["close_out_of_band"] == 2
+    assert checks["negative_volume"] == 1
+    assert "ohlc" in checks["timings_ms"]
+
+def test_compute_features_grouped_windows():
+    df = pd.DataFrame({
+        "Date": ["2025-01-02", "2025-01-03", "2025-01-06"] * 2,
+        "Ticker": ["AAAA.JK"] * 3 + ["BBBB.JK"] * 3,
+        "Open": 1.0, "High": 1.0, "Low": 1.0,
+        "Close": [100, 110, 121, 50, 40, 60], "Volume": [1, 2, 3, 4, 5, 6]
+    }).iloc[::-1]
+    spec = normalize_spec([
+        {"name": "ret_1", "op": "ret", "window": 1},
+        {"name": "vol_sma_2", "op": "sma", "col": "Volume", "window": 2},
+    ])
+    feats = compute_features(df, spec)
+    assert feats.loc[2, "ret_1"] == pytest.approx(0.1)
+    assert feats.loc[5, "ret_1"] == pytest.approx(0.5)
+    assert pd.isna(feats.loc[3, "ret_1"])
+    assert feats.loc[4, "vol_sma_2"] == pytest.approx(4.5)
+    assert pd.isna(feats.loc[3, "vol_sma_2"])
+
+def test_rolling_state_matches_full_recompute(tmp_path, monkeypatch):
+    dates = pd.bdate_range("2025-01-02", periods=30).date
+    df = pd.DataFrame({
+        "Date": list(dates) * 2,
+        "Ticker": ["AAAA.JK"] * 30 + ["BBBB.JK"] * 30,
+        "Open": 1.0, "High": 2.0, "Low": 0.5,
+        "Close": [100 + i * (i % 3) for i in range(60)],
+        "Volume": [1000 + 7 * i for i in range(60)]
+    })
+    spec = normalize_spec([
+        {"name": "ret_5", "op": "ret", "window": 5},
+        {"name": "std_10", "op": "std", "window": 10},
+        {"name": "vol_max_20", "op": "max", "col": "Volume", "window": 20},
+    ])
+    state = RollingState(spec)
+    state.update(df[df["Date"] < dates[-1]])
+    state.update(df[df["Date"] == dates[-1]])
+    assert state.asof == dates[-1]
+    assert len(state.latest()) == 2
+    assert state.verify(df)["ok"]
+
+    # two workers sharing the state file: each commit builds on the other's last save
+    import feature_state
+    monkeypatch.setattr(feature_state, "FEATURE_STATE_DIR", str(tmp_path))
+    a, b = RollingState(spec), RollingState(spec)
+    a.commit(df[df["Date"] < dates[-1]])
+    b.commit(df[df["Date"] == dates[-1]])
+    a.refresh()
+    assert a.asof == dates[-1] and a.verify(df)["ok"]
+    assert np.load(a.path(), allow_pickle=False)["tickers"].tolist() == ["AAAA.JK", "BBBB.JK"]
+
+def test_latest_features_reports_missing_history(tmp_path, monkeypatch):
+    import feature_state
+    import app as app_module
+    from bench.synthetic import make_universe
+    monkeypatch.setattr(feature_state, "FEATURE_STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(feature_state, "_states", {})
+    bundle = app_module.DEFAULT_BUNDLE
+    universe = make_universe(n_tickers=6, n_days=80)
+    last = universe[universe["Date"] == universe["Date"].max()]
+    with pytest.raises(app_module.HTTPException) as err:
+        app_module.feature_matrix(last, bundle)
+    assert err.value.status_code == 400
+
+    late = last["Ticker"].iloc[-1]
+    feature_state.get_state(bundle.feature_spec).commit(universe[universe["Ticker"] != late])
+    rows, X = app_module.feature_matrix(last, bundle)
+    assert len(rows) == len(last) and rows.attrs["underived"] == [late]
+    scored = app_module.score_frame(last, "ID", bundle)
+    assert late in app_module.feature_warning(scored)["warning"]
+
+def test_screen_features_rank_per_date():
+    df = pd.DataFrame({
+        "Date": ["2025-01-02"] * 4 + ["2025-01-03"] * 4,
+        "Ticker": ["A.JK", "B.JK", "C.JK", "D.JK"] * 2,
+        "Close": [10, 10, 10, 10, 1, 2, 3, 4],
+        "Volume": [1, 2, 3, 4, 40, 30, 20, 10],
+        "Papan": ["Utama", "Utama", "Pemantauan Khusus", "Utama"] * 2
+    })
+    enriched = enrich_screen_features(df, avg_windows=[2])
+    assert enriched["vol_rank_day"].tolist() == [0.25, 0.5, 0.75, 1.0, 1.0, 0.75, 0.5, 0.25]
+    assert enriched["turnover_rank_day"].iloc[4:].tolist() == [0.375, 0.875, 0.875, 0.375]
+    assert enriched["avgvol_rank_2"].iloc[:4].isna().all()
+    assert enriched["avgvol_rank_2"].iloc[4] == 1.0
+    kept = screen(enriched, exclude_pemantauan=True, liq_floor=0.75)
+    assert kept["Ticker"].tolist() == ["D.JK", "A.JK", "B.JK"]
+
+def test_calendar_index_arithmetic():
+    cal = CalendarIndex("ID", {date(2025, 3, 31), date(2025, 4, 1)}, date(2025, 1, 1), date(2025, 12, 31))
+    assert cal.next(date(2025, 3, 28)) == date(2025, 4, 2)
+    assert cal.prev(date(2025, 4, 2)) == date(2025, 3, 28)
+    assert cal.add(date(2025, 3, 27), 2) == date(2025, 4, 2)
+    assert cal.add(date(2025, 4, 2), -2) == date(2025, 3, 27)
+    assert cal.count(date(2025, 3, 24), date(2025, 4, 4)) == 8
+    assert not cal.is_trading_day(date(2025, 3, 29))
+
+def test_scheduler_groups_due_schedules_and_skips_weekend():
+    now = [datetime(2025, 3, 7, 9, 0)]
+    runs, published, marked = [], [], {}
+    scored = pd.DataFrame({"Ticker": ["AAAA.JK", "BBBB.JK"], "proba_ARA_t1": [0.9, 0.8], "vol_rank_day": [1.0, 1.0]})
+
+    def runner(market):
+        runs.append(market)
+        return "2025-03-07", scored
+
+    sched = AlertScheduler(runner, lambda alerts, s: published.append((s["id"], alerts)),
+                           mark_run=lambda sid, nxt: marked.__setitem__(sid, nxt),
+                           clock=lambda: now[0], threshold=0.85)
+    for sid in ("a", "b"):
+        sched.add({"id": sid, "market": "ID", "run_at_local": "16:30", "timezone": "Asia/Jakarta",
+                   "k": 5, "liq": 0.5, "exclude_pemantauan": True})
+    assert sched.next_due() == datetime(2025, 3, 7, 9, 30)
+    assert sched.run_pending() == 0
+    now[0] = datetime(2025, 3, 7, 9, 30)
+    assert sched.run_pending() == 2
+    assert runs == ["ID"]
+    assert [len(a) for _, a in published] == [1, 1]
+    assert marked["a"] == datetime(2025, 3, 10, 9, 30)
+    assert sched.run_pending() == 0
+
+def test_scheduler_single_leader_and_reload(tmp_path, monkeypatch):
+    import calendar_utils
+    from scheduler import acquire_leader
+    lock = acquire_leader(str(tmp_path / "sched.lock"))
+    assert lock is not None and acquire_leader(str(tmp_path / "sched.lock")) is None
+    lock.close()
+    assert acquire_leader(str(tmp_path / "sched.lock")) is not None
+
+    rows = [{"id": "a", "market": "ID", "run_at_local": "16:30", "timezone": "Asia/Jakarta"}]
+    sched = AlertScheduler(lambda m: None, lambda a, s: None, load_schedules=lambda: rows,
+                           clock=lambda: datetime(2025, 3, 7, 9, 0))
+    assert sched.reload() == 1 and sched.reload() == 1
+    assert len(sched.pop_due(datetime(2025, 3, 8))) == 1
+    rows.clear()
+    sched.reload()
+    assert not sched.schedules
+
+    # past the end of the loaded calendar the next run still lands on the following day
+    monkeypatch.setattr(calendar_utils, "get_next_trading_day", lambda market, d: None)
+    assert calendar_utils.calculate_next_run("08:00", "UTC", "ID", datetime(2025, 3, 7, 9, 0)) == datetime(2025, 3, 8, 8, 0)
+
+def test_alert_broker_fanout_and_replay():
+    async def scenario():
+        broker = AlertBroker(history_size=10, buffer_size=2)
+        a, b = broker.subscribe(), broker.subscribe()
+        for i in range(3):
+            broker.publish({"ticker": f"T{i}"})
+        got_a = await a.drain(0.1)
+        got_b = await b.drain(0.1)
+        replay = broker.subscribe(last_event_id=1)
+        got_replay = await replay.drain(0.1)
+        return got_a, got_b, got_replay, a.dropped
+
+    got_a, got_b, got_replay, dropped = asyncio.run(scenario())
+    assert [i for i, _ in got_a] == [2, 3]
+    assert got_a == got_b
+    assert dropped == 1
+    assert [i for i, _ in got_replay] == [2, 3]
+
+@pytest.fixture
+def bus_path(tmp_path):
+    from eventbus import ensure_broker
+    path = str(tmp_path / "bus.sock")
+    # the broker outlives its clients by EVENT_BUS_IDLE_SECONDS, so start it here and stop exactly that process
+    broker = ensure_broker(path)
+    yield path
+    broker.terminate()
+    broker.wait(5)
+
+def test_unix_event_bus_fans_out_across_connections(bus_path):
+    path = bus_path
+    got_a, got_b = [], []
+    a = UnixSocketBus(lambda i, d: got_a.append((i, d)), path)
+    b = UnixSocketBus(lambda i, d: got_b.append((i, d)), path)
+    a.start()
+    b.start()
+    try:
+        a.publish({"ticker": "BBCA.JK"})
+        deadline = time.monotonic() + 5
+        while (not got_a or not got_b) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        a.stop()
+        b.stop()
+    assert got_a == got_b
+    assert '"BBCA.JK"' in got_a[0][1]
+
+def test_alert_dedup_and_batching():
+    clock = [0.0]
+    dedup = AlertDeduper(ttl=60, clock=lambda: clock[0])
+    top = pd.DataFrame({"Ticker": ["AAAA.JK", "BBBB.JK", "CCCC.JK"], "proba_ARA_t1": [0.95, 0.8, 0.5]})
+    alerts = extract_alerts(top, 0.75, market="ID", asof="2025-03-07")
+    assert [a["ticker"] for a in alerts] == ["AAAA.JK", "BBBB.JK"]
+    assert len(dedup.filter(alerts, "v1")) == 2
+    assert dedup.filter(alerts, "v1") == []
+    assert len(dedup.filter(alerts, "v2")) == 2
+    clock[0] = 61
+    assert len(dedup.filter(alerts, "v1")) == 2
+    batch = package_alerts(alerts, batch=True)
+    assert len(batch) == 1 and batch[0]["type"] == "ara_batch" and batch[0]["count"] == 2
+
+def test_alert_dedup_shared_between_workers(tmp_path, monkeypatch):
+    from alerts import SqliteAlertDeduper
+    clock = [1000.0]
+    path = str(tmp_path / "dedup.db")
+    # two workers scoring the same dataset: only the first one's alerts go out
+    a, b = (SqliteAlertDeduper(path, ttl=60, clock=lambda: clock[0]) for _ in range(2))
+    top = pd.DataFrame({"Ticker": ["AAAA.JK", "BBBB.JK"], "proba_ARA_t1": [0.95, 0.9]})
+    alerts = extract_alerts(top, 0.75, market="ID", asof="2025-03-07")
+    assert len(a.filter(alerts, "v1")) == 2
+    assert b.filter(alerts, "v1") == [] and b.suppressed == 2
+    assert [x["ticker"] for x in b.filter(extract_alerts(top.assign(Ticker=["AAAA.JK", "CCCC.JK"]), 0.75, market="ID", asof="2025-03-07"), "v1")] == ["CCCC.JK"]
+    assert len(b.filter(alerts, "v1", scope="7")) == 2 and a.filter(alerts, "v1", scope="7") == []
+    clock[0] += 61
+    assert len(b.filter(alerts, "v1")) == 2 and a.filter(alerts, "v1") == []
+    import app as app_module
+    dedup = SqliteAlertDeduper(str(tmp_path / "app_dedup.db"))
+    assert dedup.db is None
+    monkeypatch.setattr(app_module, "alert_deduper", dedup)
+    app_module.publish_alerts(alerts)
+    # a dashboard poll already published these over SSE; a scheduled run still gets its own
+    app_module.publish_alerts(alerts, {"id": 7, "channels": ["sse"]})
+    assert dedup.suppressed == 0
+    app_module.publish_alerts(alerts, {"id": 7, "channels": ["sse"]})
+    assert dedup.suppressed == 2
+
+def test_webhook_outbox_retries_and_batches(tmp_path):
+    import json, threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from webhook import WebhookOutbox
+
+    received, calls = [], []
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            calls.append(len(body["alerts"]))
+            # fail the first delivery to exercise the retry path
+            status = 503 if len(calls) == 1 else 200
+            if status == 200:
+                received.extend(body["alerts"])
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/hook"
+
+    now = [1000.0]
+    outbox = WebhookOutbox(str(tmp_path / "outbox.db"), batch_size=2, clock=lambda: now[0])
+    outbox.enqueue(url, [{"ticker": f"T{i}"} for i in range(3)])
+    outbox.enqueue("http://127.0.0.1:9/other", [{"ticker": "X"}])
+
+    async def run():
+        # each url gets one batch per claim: T0,T1 fail here, X is refused
+        assert await outbox.dispatch_once() == 3
+        assert outbox.stats()["pending"] == 4 and received == []
+        assert await outbox.dispatch_once() == 1
+        assert outbox.stats()["pending"] == 3 and len(received) == 1
+        now[0] += 10_000
+        await outbox.dispatch_once()
+        await outbox.close()
+
+    asyncio.run(run())
+    server.shutdown()
+    assert sorted(a["ticker"] for a in received) == ["T0", "T1", "T2"]
+    assert calls == [2, 1, 2]
+    assert outbox.stats()["pending"] == 1
+
+def test_alert_schedule_rejects_invalid_channels():
+    from webhook import valid_channel, webhook_targets
+    assert valid_channel("sse") and valid_channel("webhook:https://example.com/h")
+    assert not valid_channel("webhook:ftp://example.com") and not valid_channel("email:a@b.c")
+    assert webhook_targets(["sse", "webhook:https://example.com/h"]) == ["https://example.com/h"]
+    resp = client.post("/alerts/schedule", json={"run_at_local": "16:30", "channels": ["ftp://nope"]})
+    assert resp.status_code == 400
+
+def test_backtest_topk_equity_hits_and_turnover():
+    from backtest import build_panel, run_backtest, ara_price
+    assert ara_price(np.array([51.0, 100.0, 1000.0, 6000.0])).tolist() == [68.0, 135.0, 1250.0, 7200.0]
+
+    df = pd.DataFrame({
+        "Date": ["2025-01-06"] * 3 + ["2025-01-07"] * 3 + ["2025-01-08"] * 3,
+        "Ticker": ["AAAA.JK", "BBBB.JK", "CCCC.JK"] * 3,
+        "Close": [100.0, 1000.0, 500.0, 135.0, 1100.0, 450.0, 135.0, 1100.0, 450.0],
+        "vol_rank_day": [1.0, 1.0, 0.1] * 3,
+        "Papan": ["Utama"] * 9
+    })
+    scores = np.array([0.9, 0.8, 0.99, 0.1, 0.8, 0.99, 0.5, 0.5, 0.5])
+    result = run_backtest(build_panel(df, scores), k=1, liq=0.5, exclude_pemantauan=True)
+    # day one holds AAAA (+35%, an ARA hit), day two rotates into BBBB (flat)
+    assert result["dates"] == ["2025-01-07", "2025-01-08"]
+    assert result["equity"] == pytest.approx([1.35, 1.35])
+    assert result["hit_rate"] == 0.5
+    assert result["turnover"] == 1.0
+
+def test_live_monitor_labels_next_day_and_windows():
+    from monitoring import LiveMonitor, average_precision
+    assert average_precision(np.array([0.9, 0.8, 0.1]), np.array([1.0, 0.0, 1.0])) == pytest.approx((1 + 2 / 3) / 2)
+
+    mon = LiveMonitor("ID", "test", ks=[1, 2], bins=2)
+    next_day = lambda d: d + pd.Timedelta(days=1)
+    closes = {"AAAA.JK": 100.0, "BBBB.JK": 1000.0, "CCCC.JK": 500.0}
+    mon.snapshot(date(2025, 1, 6), list(closes), [0.9, 0.6, 0.2], list(closes.values()))
+    day = pd.DataFrame({"Date": ["2025-01-07"] * 3, "Ticker": list(closes), "Close": [135.0, 1000.0, 625.0]})
+    assert mon.label(day, next_day) == date(2025, 1, 7)
+    assert mon.label(day, next_day) is None
+
+    mon.snapshot(date(2025, 1, 7), list(closes), [0.2, 0.9, 0.6], [135.0, 1000.0, 625.0])
+    mon.label(pd.DataFrame({"Date": ["2025-01-08"] * 3, "Ticker": list(closes), "Close": [135.0, 1000.0, 625.0]}), next_day)
+
+    last = mon.window(1)
+    assert last["days"] == 1 and last["positives"] == 0 and last["average_precision"] is None
+    both = mon.window(20)
+    assert both["days"] == 2
+    assert both["precision_at_k"] == {"1": 0.5, "2": 0.25}
+    assert both["average_precision"] == pytest.approx((1 + 2 / 3) / 2)
+    assert sum(b["count"] for b in both["calibration"]) == 6
+
+def test_live_monitor_grows_in_place_and_shares_file(tmp_path, monkeypatch):
+    import monitoring
+    from monitoring import LiveMonitor
+    monkeypatch.setattr(monitoring, "MONITOR_DIR", str(tmp_path))
+    a, b = LiveMonitor("ID", "test", ks=[1], bins=2), LiveMonitor("ID", "test", ks=[1], bins=2)
+    days = pd.bdate_range("2025-01-06", periods=40).date
+    for i, d in enumerate(days[:-1]):
+        # alternate workers: each one has to pick up the other's last save
+        with (a if i % 2 else b).exclusive() as mon:
+            mon.snapshot(d, ["AAAA.JK"], [0.9], [100.0])
+            mon.label(pd.DataFrame({"Date": [days[i + 1]], "Ticker": ["AAAA.JK"], "Close": [135.0]}), lambda x: days[i + 1])
+    with b.exclusive() as mon:
+        mon.snapshot(days[-1], ["AAAA.JK"], [0.9], [135.0])
+    a.refresh()
+    assert len(a.days) == 39 and a.window(100)["positives"] == 39
+    assert a.cum_scalar[-1][0] == 39 and a.pending["tickers"].tolist() == ["AAAA.JK"]
+    assert np.load(a.path(), allow_pickle=False)["pending_tickers"].dtype.kind == "U"
+
+    mon = LiveMonitor("ID", "grow", ks=[1], bins=2)
+    caps = set()
+    for i in range(40):
+        mon._append(20000 + i, np.array([0.5]), np.array([1.0]))
+        caps.add(len(mon._days))
+    assert caps == {16, 32, 64} and mon.window(5)["rows"] == 5 and mon.cum_scalar[-1][0] == 40
+
+def test_score_store_history(tmp_path, monkeypatch):
+    import os, score_store
+    import app as app_module
+    from score_store import ScoreStore
+    store = ScoreStore("ID", "test", root=str(tmp_path))
+    assert store.write(date(2025, 1, 6), ["AAAA.JK", "BBBB.JK"], [0.1, 0.2])
+    assert store.write(date(2025, 1, 8), ["CCCC.JK", "AAAA.JK"], [0.3, 0.4])
+    assert not store.write(date(2025, 1, 8), ["CCCC.JK", "AAAA.JK"], [0.3, 0.4])
+    assert store.write(date(2025, 1, 7), ["BBBB.JK"], [0.5])
+
+    reader = ScoreStore("ID", "test", root=str(tmp_path))
+    dates, proba = reader.history("AAAA.JK")
+    assert dates == ["2025-01-06", "2025-01-08"]
+    assert proba == pytest.approx([0.1, 0.4])
+    assert reader.history("BBBB.JK", start=date(2025, 1, 7))[0] == ["2025-01-07"]
+    assert reader.history("ZZZZ.JK") == ([], [])
+
+    monkeypatch.setattr(score_store, "SCORE_STORE_DIR", str(tmp_path / "app"))
+    response = client.get("/ticker/AAAA.JK/history?days=30")
+    assert response.status_code == 200
+    assert response.json()["ticker"] == "AAAA.JK"
+    assert not os.path.exists(tmp_path / "app")
+
+    # a stored dataset is recorded once per bundle, not on every poll
+    bundle = app_module.DEFAULT_BUNDLE
+    df = pd.DataFrame(np.random.default_rng(4).normal(size=(5, len(bundle.feature_cols))), columns=bundle.feature_cols).assign(
+        Date=date(2025, 1, 6), Ticker=[f"T{i}.JK" for i in range(5)])
+    writes = []
+    monkeypatch.setattr(ScoreStore, "write", lambda self, *a: writes.append(self.dir) or True)
+    for _ in range(3):
+        app_module.score_frame(df, "ID", bundle, "ds-history")
+    app_module.score_frame(df, "ID", bundle)
+    assert len(writes) == 2 and writes[0].startswith(str(tmp_path / "app"))
+
+def test_drift_sketch_merge_and_scores():
+    from drift import FeatureSketch, ks_distance, drift_scores
+    rng = np.random.default_rng(0)
+    x = np.r_[rng.normal(size=20000), [np.nan] * 100, [0.0] * 50]
+    whole = FeatureSketch().update(x)
+    halves = FeatureSketch().update(x[:7000]).merge(FeatureSketch().update(x[7000:]))
+    assert halves.pos == whole.pos and halves.neg == whole.neg and halves.zeros == 50
+    assert halves.mean == pytest.approx(np.nanmean(x)) and halves.variance == pytest.approx(np.nanvar(x, ddof=1))
+    assert whole.null_rate == pytest.approx(100 / len(x))
+    assert whole.quantile(0.9) == pytest.approx(np.nanquantile(x, 0.9), rel=0.05)
+
+    ref = FeatureSketch.from_dict(whole.to_dict())
+    same = FeatureSketch().update(rng.normal(size=20000))
+    shifted = FeatureSketch().update(rng.normal(1.0, 1.0, size=20000))
+    assert ks_distance(same, ref) < 0.05 and ks_distance(shifted, ref) > 0.3
+    report = drift_scores({"f": shifted, "g": same}, {"f": ref, "g": ref})
+    assert report["drifted"] == ["f"]
+    assert report["features"]["f"]["mean_shift"] == pytest.approx(1.0, abs=0.05)
+
+def test_explain_top_rows_cached_and_trimmed():
+    import app as app_module
+    import xgboost as xgb
+    from utils import contributions_mean
+    feats = app_module.DEFAULT_BUNDLE.feature_cols
+    rng = np.random.default_rng(0)
+    top = pd.DataFrame(rng.normal(size=(3, len(feats))), columns=feats).assign(Ticker=["AAAA.JK", "BBBB.JK", "CCCC.JK"])
+
+    contribs = contributions_mean(app_module.DEFAULT_BUNDLE.models, top[feats].astype(np.float32))
+    dm = xgb.DMatrix(top[feats].astype(np.float32))
+    margin = np.mean([m.predict(dm, output_margin=True) for m in app_module.DEFAULT_BUNDLE.models], axis=0)
+    assert contribs.sum(axis=1) == pytest.approx(margin, abs=1e-4)
+
+    first = app_module.explain_rows(top, "ds-explain", 2, app_module.DEFAULT_BUNDLE)
+    assert len(first) == 3 and all(len(e["contributions"]) == 2 for e in first)
+    hits = app_module.explain_cache.hits
+    assert app_module.explain_rows(top, "ds-explain", 2, app_module.DEFAULT_BUNDLE) == first
+    assert app_module.explain_cache.hits == hits + 3
+
+def test_serialize_projection_and_formats():
+    from serialize import select_fields, ndjson_lines, frame_response, dumps
+    df = pd.DataFrame({
+        "Date": [date(2025, 1, 6)] * 3, "Ticker": ["AAAA.JK", "BBBB.JK", "CCCC.JK"], "Papan": ["Utama"] * 3,
+        "ret_5": [0.1, 0.2, 0.3], "proba_ARA_t1": [0.9, float("nan"), 0.1], "vol_rank_day": [1.0, 0.5, 0.2],
+        "avgvol_rank_20": [0.3, 0.2, 0.1]
+    })
+    assert list(select_fields(df, None, ["avgvol_rank_20"]).columns) == ["Date", "Ticker", "Papan", "proba_ARA_t1", "vol_rank_day", "avgvol_rank_20"]
+    assert list(select_fields(df, "Ticker,ret_5", []).columns) == ["Ticker", "ret_5"]
+    assert select_fields(df, "*", []) is df
+    with pytest.raises(ValueError):
+        select_fields(df, "Ticker,nope", [])
+
+    lines = b"".join(ndjson_lines(select_fields(df, "Ticker,proba_ARA_t1"), chunk=2)).splitlines()
+    assert len(lines) == 3 and b'"proba_ARA_t1":null' in lines[1]
+    assert dumps({"d": date(2025, 1, 6)}) == b'{"d":"2025-01-06"}'
+    import serialize
+    row = [{"Date": pd.Timestamp("2025-01-06"), "Listed": pd.NaT, "Papan": pd.NA}]
+    expected = b'[{"Date":"2025-01-06 00:00:00","Listed":null,"Papan":null}]'
+    assert dumps(row) == expected
+    serialize.orjson, fast = None, serialize.orjson
+    try:
+        assert dumps(row).replace(b" ", b"") == expected.replace(b" ", b"")
+    finally:
+        serialize.orjson = fast
+    csv = frame_response(select_fields(df, "Ticker"), "csv", {"market": "ID"})
+    assert csv.body.decode().splitlines() == ["Ticker", "AAAA.JK", "BBBB.JK", "CCCC.JK"]
+    assert csv.headers["X-Market"] == "ID"
+    with pytest.raises(ValueError):
+        frame_response(df, "xml", {})
+
+    import app as app_module
+    app_module.ARROW_AVAILABLE, available = False, app_module.ARROW_AVAILABLE
+    try:
+        assert client.get("/score_latest", params={"format": "arrow", "k": 5}).status_code == 406
+    finally:
+        app_module.ARROW_AVAILABLE = available
+
+def test_conditional_requests_and_compression():
+    from http_cache import make_etag, etag_matches
+    etag = make_etag("x", 1)
+    assert etag_matches(etag, etag) and etag_matches(f'W/{etag[:-1]}-gz", "other"', etag)
+    assert not etag_matches('"other"', etag) and not etag_matches(None, etag)
+
+    first = client.get("/meta")
+    assert first.headers["Cache-Control"].startswith("public")
+    again = client.get("/meta", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.content == b""
+
+    cal = client.get("/calendar?from_date=2024-01-01&to_date=2024-12-31", headers={"Accept-Encoding": "gzip"})
+    assert cal.headers["Content-Encoding"] == "gzip" and cal.headers["ETag"].endswith('-gz"')
+    assert cal.json()["count"] > 200
+    assert client.get("/calendar?from_date=2024-01-01&to_date=2024-12-31",
+                      headers={"If-None-Match": cal.headers["ETag"]}).status_code == 304
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers and "Accept-Encoding" in small.headers["Vary"]
+    plain = client.get("/calendar?from_date=2024-01-01&to_date=2024-12-31", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers and "Accept-Encoding" in plain.headers["Vary"]
+
+def test_runtime_metrics_prometheus_text():
+    from telemetry import span
+    with span("unit_test_stage"):
+        pass
+    client.get("/meta")
+    body = client.get("/metrics/runtime").text
+    assert 'ara_stage_seconds_count{stage="unit_test_stage"} 1' in body
+    assert 'ara_http_request_seconds_bucket{method="GET",route="/meta",status="200",le="+Inf"}' in body
+    assert 'ara_cache_hits_total{cache="datasets"}' in body
+    assert "ara_sse_subscribers 0" in body
+    assert client.get("/metrics").json()["model_version"]
+
+def test_profile_request_on_demand(tmp_path, monkeypatch):
+    import os, profiling
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    assert "x-profile-id" not in client.get("/meta").headers
+    assert client.get("/meta", headers={"X-Profile": "wrong"}).status_code == 403
+    r = client.get("/bundle/info?__profile=secret")
+    assert r.status_code == 200
+    profile_id = r.headers["x-profile-id"]
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 403
+    body = client.get(f"/debug/profiles/{profile_id}", headers={"X-Profile-Token": "secret"}).text
+    for line in body.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+    assert client.get("/debug/profiles/..%2Fetc", headers={"X-Profile-Token": "secret"}).status_code == 404
+    assert r.headers["x-profile-scope"] == "process"
+    monkeypatch.setattr(profiling, "PROFILE_KEEP", 2)
+    ids = [client.get("/meta", headers={"X-Profile": "secret"}).headers["x-profile-id"] for _ in range(3)]
+    kept = os.listdir(tmp_path)
+    assert len(kept) == 2 and f"{ids[-1]}.collapsed" in kept
+
+def test_bench_fake_supabase_and_regression_gate():
+    import db
+    from bench.synthetic import FakeSupabase, FakeQuery, make_universe, make_spec
+    from bench.bench_suite import compare
+    assert len({f["name"] for f in make_spec(30)}) == 30
+    builders = pytest.importorskip("postgrest._sync.request_builder")
+    for name in [n for n in vars(FakeQuery) if not n.startswith("_")]:
+        assert hasattr(builders.SyncRequestBuilder, name) or hasattr(builders.SyncSelectRequestBuilder, name), name
+    real, db.supabase = db.supabase, FakeSupabase()
+    try:
+        df = make_universe(n_tickers=20, n_days=5)
+        first = db.save_dataset(df, "csv", "a.csv", "ID", "valid", {})
+        second = db.save_dataset(df.head(40), "csv", "b.csv", "ID", "error", {})
+        assert db.get_latest_dataset_info("ID")["id"] == second
+        assert [r["id"] for r in db.get_dataset_index("ID")] == [first]
+        got = db.get_dataset(first)
+        assert got.shape == df.shape and got["Date"].max() == df["Date"].max()
+        assert db.get_dataset_notes(second)["validation_status"] == "error"
+        assert db.get_dataset("missing") is None and db.get_dataset_notes("missing") is None
+    finally:
+        db.supabase = real
+    base = {"results": {"a": {"median_ms": 10.0}, "b": {"median_ms": 10.0}, "c": {"skipped": "x"}}}
+    cur = {"results": {"a": {"median_ms": 14.0}, "b": {"median_ms": 11.0}, "c": {"skipped": "x"}}}
+    assert [r["name"] for r in compare(cur, base, threshold=0.25)] == ["a"]
+
+def test_score_by_date_checks_dataset_before_304(monkeypatch):
+    import db
+    from bench.synthetic import FakeSupabase, make_universe
+    fake = FakeSupabase()
+    monkeypatch.setattr(db, "supabase", fake)
+    universe = make_universe(n_tickers=20, n_days=80)
+    dataset_id = db.save_dataset(universe, "csv", "u.csv", "ID", "valid", {})
+    params = {"asof": str(universe["Date"].max()), "dataset_id": dataset_id, "k": 5}
+    first = client.get("/score", params=params)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get("/score", params=params, headers={"If-None-Match": etag}).status_code == 304
+    fake.tables["datasets"].clear()
+    assert client.get("/score", params=params, headers={"If-None-Match": etag}).status_code == 404
+
+def test_equity_scores_each_upload_separately(monkeypatch):
+    import db
+    import app as app_module
+    from bench.synthetic import FakeSupabase, make_universe
+    monkeypatch.setattr(db, "supabase", FakeSupabase())
+    universe = make_universe(n_tickers=20, n_days=90)
+    days = sorted(universe["Date"].unique())
+    db.save_dataset(universe[universe["Date"] <= days[70]], "csv", "a.csv", "ID", "valid", {})
+    db.save_dataset(universe, "csv", "b.csv", "ID", "valid", {})
+    app_module.panel_cache.clear()
+    _, panel = app_module.backtest_panel("ID", app_module.DEFAULT_BUNDLE)
+    assert len(panel.dates) == len(days) and panel.tickers.size == 20
+    assert set(panel.ranks) >= {"vol_rank_day", "turnover_rank_day"}
+    assert client.get("/equity", params={"k": 5}).json()["dates"]
+
+def test_ingestors_import_lazily():
+    import os, subprocess, sys
+    from ingest import Ingestor
+    code = "import sys, ingest; print(sorted(m for m in ('pdfplumber', 'pytesseract', 'docx', 'faster_whisper', 'yfinance') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=os.path.dirname(__file__) or ".")
+    assert out.stdout.strip() == "[]", out.stderr
+    missing = Ingestor("fake", lambda: 1, modules=("json", "no_such_module_xyz"), binaries=("no-such-binary-xyz",))
+    assert not missing.available() and missing.missing() == ["no_such_module_xyz", "no-such-binary-xyz"]
+    ready = Ingestor("fake", lambda: 1, modules=("json",))
+    assert ready() == 1 and ready.import_seconds is not None
+    status = client.get("/ingest/sources").json()
+    assert status["csv"]["available"] and status["paste"]["missing"] == []
+    routes = {r.path for r in app.routes}
+    assert all((f"/ingest/{s}" in routes) == status[s]["available"] for s in ("csv", "excel", "pdf", "image", "docx", "paste", "scrape"))
+
+def test_model_registry_lru_by_bytes_and_failures(tmp_path, monkeypatch):
+    import app as app_module
+    from bench.synthetic import make_bundle
+    from model_registry import ModelRegistry
+    from model_loader import _zip_asset
+    small = make_bundle(n_seeds=1, n_features=4, rounds=5, depth=2, train_rows=500)
+    fetched, now = [], [0.0]
+    def fetch(market):
+        fetched.append(market)
+        if market == "XX":
+            raise RuntimeError("no release")
+        return small
+    reg = ModelRegistry(fetch, max_bytes=float("inf"), pinned=("ID",), root=str(tmp_path), clock=lambda: now[0],
+                        markets=("US", "SG", "MY", "XX"))
+    size = reg.get("id").nbytes
+    reg.max_bytes = size * 3.5
+    reg.get("US"), reg.get("SG")
+    assert [b["market"] for b in reg.resident()] == ["ID", "US", "SG"] and reg.get("us").feature_cols
+    reg.get("MY")
+    assert [b["market"] for b in reg.resident()] == ["ID", "US", "MY"] and reg.evictions == 1
+    with pytest.raises(LookupError):
+        reg.get("XX")
+    with pytest.raises(LookupError):
+        reg.get("XX")
+    assert fetched.count("XX") == 1 and reg.stats()["failed"] == ["XX"]
+    now[0] += reg.retry_seconds + 1
+    with pytest.raises(LookupError):
+        reg.get("XX")
+    assert fetched.count("XX") == 2
+    with pytest.raises(LookupError):
+        reg.get("../ZZ")
+    assert "../ZZ" not in fetched and "../ZZ" not in reg.loading
+    monkeypatch.setattr(app_module.model_registry, "fetch", lambda market: pytest.fail(f"fetched {market}"))
+    assert client.get("/meta", params={"market": "XX"}).status_code == 404
+    assert client.get("/bundle/registry").json()["resident"] >= 1
+    assets = [{"name": "ara_model_bundle_20251016.zip", "browser_download_url": "legacy"},
+              {"name": "ara_model_bundle_us_20251016.zip", "browser_download_url": "us"}]
+    assert _zip_asset({"tag_name": "v3", "assets": assets}, "US") == "us"
+    assert _zip_asset({"tag_name": "v3", "assets": assets}, "ID") is None
+    assert _zip_asset({"tag_name": "id-v3", "assets": assets}, "ID") == "legacy"
+    assert _zip_asset({"tag_name": "v3", "assets": assets}) == "legacy"
+    us_first = assets[::-1]
+    assert _zip_asset({"tag_name": "v3", "assets": us_first}) == "us"
+    assert _zip_asset({"tag_name": "v3", "assets": us_first}, exclude=["US"]) == "legacy"
+    assert _zip_asset({"tag_name": "v3", "assets": us_first[:1]}, exclude=["US"]) is None
+    assert _zip_asset({"tag_name": "us-v3", "assets": assets}, exclude=["US"]) is None
+
+def test_feature_block_cached_contiguous_and_slim_scores():
+    import app as app_module
+    from utils import feature_block, predict_mean
+    bundle = app_module.DEFAULT_BUNDLE
+    feats = bundle.feature_cols
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame(rng.normal(size=(40, len(feats))), columns=feats).assign(
+        Date=date(2025, 1, 6), Ticker=[f"T{i:03d}.JK" for i in range(40)], Papan="Utama",
+        Close=100.0, Volume=rng.integers(1, 1000, 40), vol_rank_day=rng.random(40))
+    df[feats[0]] = df[feats[0]].astype(object).where(df.index % 7 != 0, None)
+
+    X = feature_block(df, feats)
+    assert X.dtype == np.float32 and X.flags.c_contiguous and np.isnan(X[0, 0])
+    expected = predict_mean(bundle.models, df[feats].astype(np.float32), bundle.calib)
+    assert predict_mean(bundle.models, X, bundle.calib) == pytest.approx(expected, abs=1e-6)
+
+    out = app_module.score_frame(df, "ID", bundle, "ds-block")
+    assert feats[0] not in out.columns and {"Ticker", "vol_rank_day", "proba_ARA_t1"} <= set(out.columns)
+    assert out["proba_ARA_t1"].is_monotonic_decreasing
+    assert (out["Ticker"].to_numpy() == df["Ticker"].to_numpy()[out.index]).all()
+    hits = app_module.matrix_cache.hits
+    rows, cached = app_module.dataset_features(df, bundle, "ID", "ds-block")
+    assert app_module.matrix_cache.hits == hits + 1 and rows is df
+    top = out.head(3)
+    explained = app_module.score_rows(top, None, "vol_rank_day", None, True, 2, bundle, cached)
+    assert [r["explanation"] for r in explained] == app_module.explain_rows(df.loc[top.index], None, 2, bundle)
+    assert feats[1] in app_module.score_frame(df, "ID", bundle, "ds-block", None).columns
+    bad = df.assign(**{feats[1]: df[feats[1]].astype(object).where(df.index != 3, "n/a")})
+    with pytest.raises(ValueError):
+        feature_block(bad, feats)
+    with pytest.raises(app_module.HTTPException) as err:
+        app_module.feature_matrix(bad, bundle)
+    assert err.value.status_code == 400
+
+def test_bundle_feature_order_follows_booster(tmp_path):
+    import io, json, zipfile
+    from bench.synthetic import make_bundle
+    from model_registry import ModelBundle
+    raw = make_bundle(n_seeds=1, n_features=4, rounds=5, depth=2, train_rows=500)
+    def relist(cols):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(raw)) as src, zipfile.ZipFile(buf, "w") as dst:
+            for item in src.infolist():
+                dst.writestr(item, json.dumps(cols) if item.filename == "feature_cols_final.json" else src.read(item))
+        return buf.getvalue()
+    bundle = ModelBundle("ID", raw, str(tmp_path / "a"))
+    names = bundle.models[0].feature_names
+    assert bundle.feature_cols == names
+    assert ModelBundle("ID", relist(names[::-1]), str(tmp_path / "b")).feature_cols == names
+    with pytest.raises(ValueError):
+        ModelBundle("ID", relist(names[:-1] + ["other"]), str(tmp_path / "c"))
+
+def test_isotonic_table_matches_sklearn():
+    import json
+    from sklearn.isotonic import IsotonicRegression
+    from calibration import IsotonicTable, compile_calibrator
+    from utils import norm01
+    rng = np.random.default_rng(5)
+    x = rng.random(3000) * 0.9 + 0.05
+    y = (rng.random(3000) < x ** 2).astype(float)
+    grid = np.concatenate([np.linspace(0, 1, 10001), x, [-0.5, 1.5]])
+    raw = rng.normal(size=900) * 3 + 1
+    for mode in ("clip", "nan"):
+        iso = IsotonicRegression(out_of_bounds=mode).fit(x, y)
+        table = IsotonicTable.from_dict(json.loads(json.dumps(compile_calibrator(iso).to_dict())))
+        np.testing.assert_allclose(table.transform(grid), iso.transform(grid), atol=1e-12)
+        np.testing.assert_allclose(table.transform_norm01(raw), iso.transform(norm01(raw)), atol=1e-9)
+        np.testing.assert_allclose(table.transform_norm01(np.full(4, 2.0)), iso.transform(np.zeros(4)))
+    with pytest.raises(ValueError):
+        compile_calibrator(IsotonicRegression(out_of_bounds="raise").fit(x, y)).transform([2.0])
+    import app as app_module
+    assert isinstance(app_module.DEFAULT_BUNDLE.calib, IsotonicTable)
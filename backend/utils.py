@@ -1,25 +1,75 @@
+import os
 import numpy as np, pandas as pd, xgboost as xgb
+from features import group_layout, window_mean
+from calibration import IsotonicTable
+
+SCREEN_AVG_WINDOWS = [int(w) for w in os.getenv("SCREEN_AVG_WINDOWS", "5,20").split(",") if w.strip()]
 
 def norm01(a):
     lo = float(np.min(a)); hi = float(np.max(a))
     return (a - lo) / (hi - lo + 1e-12) if hi > lo else np.zeros_like(a, dtype=float)
 
+def feature_block(df: pd.DataFrame, cols) -> np.ndarray:
+    # filled column by column into one C-contiguous float32 array, skipping the gathered-frame copy
+    X = np.empty((len(df), len(cols)), dtype=np.float32)
+    for j, c in enumerate(cols):
+        # missing values become NaN; anything else that is not numeric raises instead of scoring as missing
+        X[:, j] = df[c].to_numpy(dtype=np.float32, na_value=np.nan)
+    return X
+
 def predict_mean(models, X, calibrator=None):
-    dm = xgb.DMatrix(X)
-    p = np.mean(np.vstack([m.predict(dm) for m in models]), axis=0)
+    # inplace_predict reads a float32 array as is; a DMatrix would copy it once per call
+    p = models[0].inplace_predict(X).astype(np.float64)
+    for m in models[1:]:
+        p += m.inplace_predict(X)
+    p /= len(models)
+    if isinstance(calibrator, IsotonicTable):
+        return calibrator.transform_norm01(p)
     p = norm01(p)
     if calibrator is not None:
         p = calibrator.transform(p)
     return p
 
+def contributions_mean(models, X):
+    # one pred_contribs call per seed over the rows being explained; last column is the bias
+    dm = xgb.DMatrix(X, feature_names=models[0].feature_names)
+    return np.mean([m.predict(dm, pred_contribs=True) for m in models], axis=0)
+
 def enrich_vol_rank(raw_latest: pd.DataFrame) -> pd.DataFrame:
     vr = raw_latest[["Ticker","Volume"]].copy()
     vr["vol_rank_day"] = vr["Volume"].rank(pct=True)
     return vr[["Ticker","vol_rank_day"]]
 
-def screen(out: pd.DataFrame, exclude_pemantauan: bool, liq_floor: float) -> pd.DataFrame:
-    mask_board = True
+def _rank_by_date(values: np.ndarray, date_codes: np.ndarray) -> np.ndarray:
+    return pd.Series(values).groupby(date_codes).rank(pct=True).to_numpy()
+
+def enrich_screen_features(df: pd.DataFrame, avg_windows=None) -> pd.DataFrame:
+    if "Volume" not in df.columns or "Date" not in df.columns:
+        return df
+    avg_windows = SCREEN_AVG_WINDOWS if avg_windows is None else avg_windows
+    dcodes, _ = pd.factorize(df["Date"])
+    vol = pd.to_numeric(df["Volume"], errors="coerce").to_numpy(dtype=np.float64)
+    ranks = {}
+    if "vol_rank_day" not in df.columns or df["vol_rank_day"].isna().all():
+        ranks["vol_rank_day"] = _rank_by_date(vol, dcodes)
+    if "Close" in df.columns:
+        close = pd.to_numeric(df["Close"], errors="coerce").to_numpy(dtype=np.float64)
+        ranks["turnover_rank_day"] = _rank_by_date(close * vol, dcodes)
+    if avg_windows and "Ticker" in df.columns:
+        order, pos = group_layout(df)
+        inv = np.empty_like(order)
+        inv[order] = np.arange(len(order))
+        for w in avg_windows:
+            avg = window_mean(vol[order], w, pos)[inv]
+            ranks[f"avgvol_rank_{w}"] = _rank_by_date(avg, dcodes)
+    return df.assign(**ranks)
+
+def screen(out: pd.DataFrame, exclude_pemantauan: bool, liq_floor: float, rank_col: str = "vol_rank_day") -> pd.DataFrame:
+    if rank_col not in out.columns:
+        out = enrich_screen_features(out)
+    if rank_col not in out.columns:
+        raise ValueError(f"Unknown liquidity rank column: {rank_col}")
+    mask = np.nan_to_num(out[rank_col].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0) >= float(liq_floor)
     if "Papan" in out.columns and exclude_pemantauan:
-        mask_board = out["Papan"].fillna("").str.lower().ne("pemantauan khusus")
-    mask_liq = out["vol_rank_day"].fillna(0) >= float(liq_floor)
-    return out[mask_board & mask_liq]
+        mask &= out["Papan"].fillna("").str.lower().ne("pemantauan khusus").to_numpy()
+    return out[mask]
@@ -0,0 +1,92 @@
+import os, time
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+VALIDATION_SAMPLE_ROWS = int(os.getenv("VALIDATION_SAMPLE_ROWS", "0"))
+PRICE_COLS = ["Open", "High", "Low", "Close"]
+
+class _Timer:
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def run(self, name, fn):
+        t0 = time.perf_counter()
+        out = fn()
+        self.timings[name] = round((time.perf_counter() - t0) * 1000, 3)
+        return out
+
+def _numeric(s: pd.Series) -> np.ndarray:
+    if s.dtype.kind in "fiu":
+        return s.to_numpy(dtype=np.float64, copy=False)
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64)
+
+def _sample_rows(ticker_codes: np.ndarray, n_tickers: int, max_rows: int, seed: int = 0) -> np.ndarray:
+    # sample whole tickers so duplicate and monotonicity checks stay exact per ticker
+    frac = max_rows / len(ticker_codes)
+    rng = np.random.default_rng(seed)
+    keep = rng.random(n_tickers + 1) < frac
+    return np.flatnonzero(keep[ticker_codes])
+
+def run_checks(df: pd.DataFrame, sample_rows: Optional[int] = None) -> Dict:
+    timer = _Timer()
+    n = len(df)
+    limit = VALIDATION_SAMPLE_ROWS if sample_rows is None else sample_rows
+
+    tcodes, tuniq = timer.run("factorize_ticker", lambda: pd.factorize(df["Ticker"], sort=False))
+    dcodes, duniq = timer.run("factorize_date", lambda: pd.factorize(df["Date"], sort=True))
+
+    idx = None
+    if limit and n > limit:
+        idx = _sample_rows(tcodes, len(tuniq), limit)
+        tcodes, dcodes = tcodes[idx], dcodes[idx]
+    rows = n if idx is None else len(idx)
+
+    def col(name):
+        a = _numeric(df[name])
+        return a if idx is None else a[idx]
+
+    prices = timer.run("to_numeric", lambda: {c: col(c) for c in PRICE_COLS + ["Volume"]})
+
+    nulls = timer.run("nulls", lambda: {
+        "Date": int((dcodes < 0).sum()),
+        "Ticker": int((tcodes < 0).sum()),
+        **{c: int(np.isnan(prices[c]).sum()) for c in PRICE_COLS + ["Volume"]},
+    })
+
+    def order():
+        valid = (tcodes >= 0) & (dcodes >= 0)
+        pos = np.flatnonzero(valid)
+        perm = pos[np.lexsort((dcodes[pos], tcodes[pos]))]
+        same_t = tcodes[perm[1:]] == tcodes[perm[:-1]]
+        dupes = int((same_t & (dcodes[perm[1:]] == dcodes[perm[:-1]])).sum())
+        # lexsort is stable: rows of a ticker come back in file order iff dates never go backwards
+        unordered = int((same_t & (perm[1:] < perm[:-1])).sum())
+        return dupes, unordered
+
+    dupes, unordered = timer.run("duplicates_monotonic", order)
+
+    def ohlc():
+        h, l, c, v = prices["High"], prices["Low"], prices["Close"], prices["Volume"]
+        with np.errstate(invalid="ignore"):
+            return {
+                "high_lt_low": int((h < l).sum()),
+                "close_out_of_band": int(((c < l) | (c > h)).sum()),
+                "negative_volume": int((v < 0).sum()),
+            }
+
+    bands = timer.run("ohlc", ohlc)
+
+    return {
+        "rows": n,
+        "checked_rows": rows,
+        "sampled": idx is not None,
+        "nulls": nulls,
+        "duplicates": dupes,
+        "non_monotonic_dates": unordered,
+        **bands,
+        "ticker_count": len(tuniq),
+        "date_min": str(duniq[0]) if len(duniq) else None,
+        "date_max": str(duniq[-1]) if len(duniq) else None,
+        "timings_ms": timer.timings,
+    }
@@ -0,0 +1,157 @@
+import os, json, time, random, asyncio, logging, sqlite3, threading
+from typing import Dict, List, Optional
+import httpx
+
+WEBHOOK_OUTBOX_PATH = os.getenv("WEBHOOK_OUTBOX_PATH", "/tmp/ara_webhook_outbox.db")
+WEBHOOK_URLS = [u.strip() for u in os.getenv("ALERT_WEBHOOK_URLS", "").split(",") if u.strip()]
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_BACKOFF_BASE = float(os.getenv("WEBHOOK_BACKOFF_BASE", "1.0"))
+WEBHOOK_BACKOFF_MAX = float(os.getenv("WEBHOOK_BACKOFF_MAX", "300"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+WEBHOOK_LEASE_SECONDS = float(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+
+logger = logging.getLogger(__name__)
+
+def webhook_targets(channels: Optional[List[str]]) -> List[str]:
+    return [c.split(":", 1)[1] for c in channels or [] if c.startswith("webhook:")]
+
+def valid_channel(channel: str) -> bool:
+    return channel == "sse" or channel.startswith(("webhook:http://", "webhook:https://"))
+
+def backoff_delay(attempts: int, base: float = WEBHOOK_BACKOFF_BASE, cap: float = WEBHOOK_BACKOFF_MAX) -> float:
+    # full jitter keeps retries from many workers from synchronising
+    return random.uniform(0, min(cap, base * (2 ** attempts)))
+
+class WebhookOutbox:
+    def __init__(self, path: str = WEBHOOK_OUTBOX_PATH, batch_size: int = WEBHOOK_BATCH_SIZE,
+                 max_attempts: int = WEBHOOK_MAX_ATTEMPTS, clock=time.time):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL,
+            dead INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT
+        )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(dead, next_attempt)")
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.wake: Optional[asyncio.Event] = None
+        self.sent = 0
+        self.failed = 0
+
+    def enqueue(self, url: str, alerts: List[Dict]) -> int:
+        if not alerts:
+            return 0
+        now = self.clock()
+        rows = [(url, json.dumps(a, default=str), now) for a in alerts]
+        with self.lock:
+            self.db.executemany("INSERT INTO outbox (url, payload, next_attempt) VALUES (?, ?, ?)", rows)
+        if self.loop is not None and self.wake is not None:
+            self.loop.call_soon_threadsafe(self.wake.set)
+        return len(rows)
+
+    def claim(self) -> Dict[str, List[tuple]]:
+        # one batch per url, so every leased row goes out in a single POST well inside the lease
+        now = self.clock()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute(
+                    "SELECT id, url, payload, attempts FROM ("
+                    "SELECT *, ROW_NUMBER() OVER (PARTITION BY url ORDER BY id) AS n FROM outbox "
+                    "WHERE dead = 0 AND next_attempt <= ?) WHERE n <= ? ORDER BY id",
+                    (now, self.batch_size)).fetchall()
+                if rows:
+                    self.db.executemany("UPDATE outbox SET next_attempt = ? WHERE id = ?",
+                                        [(now + WEBHOOK_LEASE_SECONDS, r[0]) for r in rows])
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        batches: Dict[str, List[tuple]] = {}
+        for r in rows:
+            batches.setdefault(r[1], []).append(r)
+        return batches
+
+    def next_due(self) -> Optional[float]:
+        with self.lock:
+            row = self.db.execute("SELECT MIN(next_attempt) FROM outbox WHERE dead = 0").fetchone()
+        return row[0] if row else None
+
+    def _done(self, ids: List[int]):
+        with self.lock:
+            self.db.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i in ids])
+
+    def _retry(self, rows: List[tuple], error: str):
+        now = self.clock()
+        updates = []
+        for r in rows:
+            attempts = r[3] + 1
+            updates.append((attempts, now + backoff_delay(attempts), int(attempts >= self.max_attempts), error[:500], r[0]))
+        with self.lock:
+            self.db.executemany("UPDATE outbox SET attempts = ?, next_attempt = ?, dead = ?, last_error = ? WHERE id = ?", updates)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            pending, dead = self.db.execute(
+                "SELECT COALESCE(SUM(dead = 0), 0), COALESCE(SUM(dead = 1), 0) FROM outbox").fetchone()
+        return {"pending": pending, "dead": dead, "sent": self.sent, "failed": self.failed}
+
+    def _client(self) -> httpx.AsyncClient:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=WEBHOOK_TIMEOUT,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60)
+            )
+        return self.client
+
+    async def _send(self, url: str, rows: List[tuple]):
+        body = '{"alerts":[' + ",".join(r[2] for r in rows) + "]}"
+        try:
+            resp = await self._client().post(url, content=body, headers={"Content-Type": "application/json"})
+            if resp.status_code >= 300:
+                raise httpx.HTTPStatusError(f"HTTP {resp.status_code}", request=resp.request, response=resp)
+            await asyncio.to_thread(self._done, [r[0] for r in rows])
+            self.sent += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            logger.warning(f"Webhook delivery to {url} failed: {e}")
+            await asyncio.to_thread(self._retry, rows, str(e))
+
+    async def dispatch_once(self) -> int:
+        batches = await asyncio.to_thread(self.claim)
+        if batches:
+            await asyncio.gather(*(self._send(url, rows) for url, rows in batches.items()))
+        return sum(len(r) for r in batches.values())
+
+    async def run_forever(self):
+        self.loop = asyncio.get_running_loop()
+        self.wake = asyncio.Event()
+        while True:
+            self.wake.clear()
+            try:
+                if await self.dispatch_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Webhook dispatch error: {e}")
+            due = await asyncio.to_thread(self.next_due)
+            timeout = None if due is None else max(due - self.clock(), 0.05)
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
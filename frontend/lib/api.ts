@@ -76,7 +76,11 @@ export function createSSEConnection(onMessage: (data: any) => void) {
   eventSource.onmessage = (event) => {
     try {
       const data = JSON.parse(event.data);
-      onMessage(data);
+      if (data.type === "ara_batch") {
+        data.alerts.forEach(onMessage);
+      } else {
+        onMessage(data);
+      }
     } catch (e) {
       console.error("Failed to parse SSE message", e);
     }